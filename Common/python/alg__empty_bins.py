@@ -94,15 +94,15 @@ class alg__empty_bins(pAlarmBaseAlgorithm):
         numNeigh = self.getParameter('num_neighbours', 3)
         outLoCut = self.getParameter('out_low_cut', 0.0)
         outHiCut = self.getParameter('out_high_cut', 0.25)
+        contents = self.getBinContents()
+        averages = self.getNeighbouringAverages(numNeigh, outLoCut, outHiCut)
         maxSignificance = -1
         maxBadness = MINUS_INFINITY
         for i in range(1, self.RootObject.GetNbinsX() + 1):
-            if self.RootObject.GetBinContent(i) != 0:
+            if contents[i] != 0:
                 significance = 0
             else:
-                exp = self.getNeighbouringAverage(i, numNeigh,\
-                                                      outLoCut, outHiCut)
-                significance = sqrt(exp)
+                significance = sqrt(averages[i])
             if significance > maxSignificance:
                 maxSignificance = significance
             badness = self.checkStatus(i, significance, 'significance')
@@ -118,16 +118,16 @@ class alg__empty_bins(pAlarmBaseAlgorithm):
         numNeigh = self.getParameter('num_neighbours', 2)
         outLoCut = self.getParameter('out_low_cut', 0.0)
         outHiCut = self.getParameter('out_high_cut', 0.25)
+        contents = self.getBinContents()
+        averages = self.getNeighbouringAverages(numNeigh, outLoCut, outHiCut)
         maxSignificance = -1
         maxBadness = MINUS_INFINITY
         for i in range(1, self.RootObject.GetNbinsX() + 1):
             for j in range(1, self.RootObject.GetNbinsY() + 1):
-                if self.RootObject.GetBinContent(i, j) != 0:
+                if contents[i, j] != 0:
                     significance = 0
                 else:
-                    exp = self.getNeighbouringAverage((i, j), numNeigh,\
-                                                          outLoCut, outHiCut)
-                    significance = sqrt(exp)
+                    significance = sqrt(averages[i, j])
                 if significance > maxSignificance:
                     maxSignificance = significance
                 badness = self.checkStatus((i, j), significance,\
@@ -137,7 +137,6 @@ class alg__empty_bins(pAlarmBaseAlgorithm):
         self.Output.setValue(maxSignificance, None, maxBadness)
 
 
-
 if __name__ == '__main__':
     from pAlarmLimits import pAlarmLimits
     canvas = ROOT.TCanvas('Test canvas', 'Test canvas', 600, 300)
@@ -34,8 +34,9 @@ class alg__empty_bins_simple(pAlarmBaseAlgorithm):
 
     def runTH1F(self):
         numEmptyBins = 0
+        contents = self.getBinContents()
         for i in range(1, self.RootObject.GetNbinsX() + 1):
-            if self.RootObject.GetBinContent(i) == 0:
+            if contents[i] == 0:
                 numEmptyBins += 1
                 self.Output.appendDictValue('empty_bins',\
                             self.getDetailedLabel(i, 0))
@@ -47,9 +48,10 @@ class alg__empty_bins_simple(pAlarmBaseAlgorithm):
 
     def runTH2F(self):
         numEmptyBins = 0
+        contents = self.getBinContents()
         for i in range(1, self.RootObject.GetNbinsX() + 1):
             for j in range(1, self.RootObject.GetNbinsY() + 1):
-                if self.RootObject.GetBinContent(i, j) == 0:
+                if contents[i, j] == 0:
                     numEmptyBins += 1
                     self.Output.appendDictValue('empty_bins',\
                                 self.getDetailedLabel((i, j), 0))
@@ -31,7 +31,8 @@ class alg__leftmost_edge_slices(pAlarmBaseAlgorithm):
         return 'slice centered at %s = %s' %\
             (self.getAxisLabel('x'), self.getFormattedX(index))
 
-    def getDetailedLabel(self, index, value, valueLabel = None, error = None):
+    def getDetailedLabel(self, index, value, valueLabel = None, error = None,
+                         timeStamp = None):
         return '%s, edge position = %s' %\
                (self.getDetailedXLabel(index), value)
 
@@ -33,8 +33,9 @@ class alg__num_empty_bins(pAlarmBaseAlgorithm):
 
     def runTH1F(self):
         numEmptyBins = 0
+        contents = self.getBinContents()
         for i in range(1, self.RootObject.GetNbinsX() + 1):
-            if self.RootObject.GetBinContent(i) == 0:
+            if contents[i] == 0:
                 numEmptyBins += 1
         self.Output.setValue(numEmptyBins)
 
@@ -44,9 +45,10 @@ class alg__num_empty_bins(pAlarmBaseAlgorithm):
 
     def runTH2F(self):
         numEmptyBins = 0
+        contents = self.getBinContents()
         for i in range(1, self.RootObject.GetNbinsX() + 1):
             for j in range(1, self.RootObject.GetNbinsY() + 1):
-                if self.RootObject.GetBinContent(i, j) == 0:
+                if contents[i, j] == 0:
                     numEmptyBins += 1
         self.Output.setValue(numEmptyBins)
 
@@ -4,6 +4,7 @@ import math
 
 from pSafeROOT           import ROOT
 from pAlarmBaseAlgorithm import pAlarmBaseAlgorithm, logger
+from pAlarmBaseAlgorithm import getBinContents, getBinErrors
 from pUtils              import formatNumber
 from pGlobals            import MINUS_INFINITY
 
@@ -105,16 +106,27 @@ class alg__reference_histogram(pAlarmBaseAlgorithm):
         self.ReferenceHistogramsDict = referenceDict
         
     def getExpectedValue(self, bin):
-        return self.ReferenceObject.GetBinContent(bin)*self.ScaleFactor
+        return self.ReferenceContents[bin]*self.ScaleFactor
 
     def getExpectedError(self, bin):
-        return self.ReferenceObject.GetBinError(bin)*self.ScaleFactor
+        return self.ReferenceErrors[bin]*self.ScaleFactor
 
     def getObservedValue(self, bin):
-        return self.RootObject.GetBinContent(bin)
+        return self.ObservedContents[bin]
 
     def getObservedError(self, bin):
-        return self.RootObject.GetBinError(bin)
+        return self.ObservedErrors[bin]
+
+    ## @brief Read the bin contents and errors of both the histograms
+    #  into lists of floats, once.
+    ## @param self
+    #  The class instance.
+
+    def readBins(self):
+        self.ReferenceContents = getBinContents(self.ReferenceObject).tolist()
+        self.ReferenceErrors = getBinErrors(self.ReferenceObject).tolist()
+        self.ObservedContents = self.getBinContents().tolist()
+        self.ObservedErrors = self.getBinErrors().tolist()
 
     def setupReference(self):
         if self.ReferenceFileName is None:
@@ -158,6 +170,7 @@ class alg__reference_histogram(pAlarmBaseAlgorithm):
             logger.error('Mismatch in bins while comparing histograms.')
             self.Output.setError('Histogram bins mismatch.')
             return
+        self.readBins()
         chiSquare = 0
         numDof = 0
         maxBadness = MINUS_INFINITY
@@ -1,5 +1,6 @@
 
 import pUtils
+import numpy
 
 from pSafeROOT           import ROOT
 from math                import sqrt
@@ -84,15 +85,11 @@ class alg__spikes_and_holes(pAlarmBaseAlgorithm):
         numNeigh = self.getParameter('num_neighbours', 4)
         outLoCut = self.getParameter('out_low_cut', 0.3)
         outHiCut = self.getParameter('out_high_cut', 0.3)
+        significances = self.getSignificances(numNeigh, outLoCut, outHiCut)
         maxSignificance = -1
         maxBadness = MINUS_INFINITY
         for i in range(1, self.RootObject.GetNbinsX() + 1):
-            obs = self.RootObject.GetBinContent(i)
-            exp = self.getNeighbouringAverage(i, numNeigh, outLoCut, outHiCut)
-            if exp > 0:
-                significance = abs(obs - exp)/sqrt(exp)
-            else:
-                significance = 0.0
+            significance = float(significances[i])
             if significance > maxSignificance:
                 maxSignificance = significance
             badness = self.checkStatus(i, significance, 'significance')
@@ -108,17 +105,12 @@ class alg__spikes_and_holes(pAlarmBaseAlgorithm):
         numNeigh = self.getParameter('num_neighbours', 2)
         outLoCut = self.getParameter('out_low_cut', 0.25)
         outHiCut = self.getParameter('out_high_cut', 0.25)
+        significances = self.getSignificances(numNeigh, outLoCut, outHiCut)
         maxSignificance = -1
         maxBadness = MINUS_INFINITY
         for i in range(1, self.RootObject.GetNbinsX() + 1):
             for j in range(1, self.RootObject.GetNbinsY() + 1):
-                obs = self.RootObject.GetBinContent(i, j)
-                exp = self.getNeighbouringAverage((i, j), numNeigh, outLoCut,
-                                                  outHiCut)
-                if exp > 0:
-                    significance = abs(obs - exp)/sqrt(exp)
-                else:
-                    significance = 0.0
+                significance = float(significances[i, j])
                 if significance > maxSignificance:
                     maxSignificance = significance
                 badness = self.checkStatus((i, j), significance,
@@ -127,6 +119,23 @@ class alg__spikes_and_holes(pAlarmBaseAlgorithm):
                     maxBadness = badness
         self.Output.setValue(maxSignificance, None, maxBadness)
 
+    ## @brief Return the array of the significances of all the bins
+    #  (indexed as the bin contents).
+    ## @param self
+    #  The class instance.
+    ## @param numNeigh
+    #  The number of neighbours.
+    ## @param outLoCut
+    #  The fraction of neighbours with the lowest content to be excluded.
+    ## @param outHiCut
+    #  The fraction of neighbours with the highest content to be excluded.
+
+    def getSignificances(self, numNeigh, outLoCut, outHiCut):
+        obs = self.getBinContents()
+        exp = self.getNeighbouringAverages(numNeigh, outLoCut, outHiCut)
+        positive = exp > 0
+        return numpy.where(positive, numpy.abs(obs - exp)/\
+                           numpy.sqrt(numpy.where(positive, exp, 1.)), 0.0)
 
 
 if __name__ == '__main__':
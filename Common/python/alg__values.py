@@ -15,6 +15,7 @@ from pAlarmBaseAlgorithm import ROOT2NUMPYDICT
 from pAlarmBaseAlgorithm import MET_OFFSET
 from pGlobals            import MINUS_INFINITY
 from pAlarmLimits        import WARNING_BADNESS
+from pTreeBlockReader    import pTreeBlockReader, getBranchLayout
 
 
 VAR_LABELS_DICT = {
@@ -102,31 +103,17 @@ class alg__values(pAlarmBaseAlgorithm):
                                      conditionsDict)
         self.LinksDict = {}
 
-    ## @brief Create all the necessary arrays for the loop over the
-    #  TBranch entries.
+    ## @brief Create the reader for the branches needed by the algorithm
+    #  (i.e. the value, error and number of entries branches, along with the
+    #  time information).
     ## @param self
     #  The class instance.
-    ## @param timestampBranchName
-    #  The name of the branch identifying the timestamp (used in the output
-    #  detailed dictionary).
 
-    def __createArrays(self):
+    def __createReader(self):
         self.RootTree = self.RootObject.GetTree()
         self.NumTreeEntries = self.RootObject.GetEntries()
         valueBranchName = self.RootObject.GetName()
         errorBranchName = '%s_err' % valueBranchName
-        self.RootTree.SetBranchStatus('*', 0)
-        self.RootTree.SetBranchStatus(valueBranchName, 1)
-        self.RootTree.SetBranchStatus('Bin_Start', 1)
-        self.RootTree.SetBranchStatus('Bin_End', 1)
-        self.RootTree.SetBranchStatus('TrueTimeInterval', 1)
-        self.BinStartArray = numpy.zeros((1), 'l')
-        self.BinEndArray = numpy.zeros((1), 'l')
-        self.TimeIntervalArray = numpy.zeros((1), 'd')
-        self.RootTree.SetBranchAddress('Bin_Start', self.BinStartArray)
-        self.RootTree.SetBranchAddress('Bin_End', self.BinEndArray)
-        self.RootTree.SetBranchAddress('TrueTimeInterval',
-                                       self.TimeIntervalArray)
         (branchName, branchType) = self.RootObject.GetTitle().split('/')
         if '[' not in branchName:
             shape = (1)
@@ -149,32 +136,32 @@ class alg__values(pAlarmBaseAlgorithm):
             except KeyError:
                 self.IndexLabels =\
                     ['index %d' % i for (i, dim) in enumerate(shape)]
-	self.BranchArray = numpy.zeros(shape, ROOT2NUMPYDICT[branchType])
-        self.RootTree.SetBranchAddress(self.RootObject.GetName(),\
-                                       self.BranchArray)
-        if self.RootTree.GetBranch(errorBranchName) is not None:
-            self.ErrorArray = numpy.zeros(shape, ROOT2NUMPYDICT[branchType])
-            self.RootTree.SetBranchStatus(errorBranchName, 1)
-            self.RootTree.SetBranchAddress(errorBranchName, self.ErrorArray)
-            self.__HasErrors = True
+        # Only used for the shape of the branch, from now on.
+        self.BranchArray = numpy.zeros(shape, ROOT2NUMPYDICT[branchType])
+        branchNames = [valueBranchName, 'Bin_Start', 'Bin_End',
+                       'TrueTimeInterval']
+        self.ValueBranchName = valueBranchName
+        if getBranchLayout(self.RootTree, errorBranchName) is not None:
+            self.ErrorBranchName = errorBranchName
+            branchNames.append(errorBranchName)
         else:
             logger.debug('%s has no associated errors.' % branchName)
-            self.__HasErrors = False
+            self.ErrorBranchName = None
+        self.NumEntriesBranchName = None
         self.__MinEntries = self.getParameter('min_n', None)
         if self.__MinEntries is not None:
             self.__MinEntries = int(self.__MinEntries)
             numEntriesBranchName = '%s_n' % valueBranchName
-            if self.RootTree.GetBranch(numEntriesBranchName) is not None:
-                self.NumEntriesArray = numpy.zeros(shape, ROOT2NUMPYDICT['I'])
-                self.RootTree.SetBranchStatus(numEntriesBranchName, 1)
-                self.RootTree.SetBranchAddress(numEntriesBranchName,
-                                               self.NumEntriesArray)
-                logger.debug('Condition on min_n found, array(s) identified.')
+            if getBranchLayout(self.RootTree, numEntriesBranchName) is not None:
+                self.NumEntriesBranchName = numEntriesBranchName
+                branchNames.append(numEntriesBranchName)
+                logger.debug('Condition on min_n found, branch identified.')
             else:
                 logger.error('Could not locate branch %s.' %\
                              numEntriesBranchName)
                 self.__MinEntries = None
         self.__MaxRelError = self.getParameter('max_rel_err', None)
+        self.Reader = pTreeBlockReader(self.RootTree, branchNames)
 
     ## @brief Setup the list of indexes to loop over, taking into account
     #  the optional "exclude" and "only" parameters.
@@ -196,20 +183,76 @@ class alg__values(pAlarmBaseAlgorithm):
             except KeyError:
                 pass
             
-    ## @brief Get a given entry of the ROOT tree and set the timestamp.
+    ## @brief Return the array of the timestamps for a block of entries.
+    #
+    #  The timestamp is the center of the time bin, the first and last bins
+    #  being defined by the true time interval.
+    ## @param self
+    #  The class instance.
+    ## @param firstEntry
+    #  The first entry of the block.
+    ## @param arrays
+    #  The dictionary of the branch arrays for the block.
 
-    def getEntry(self, index):
-        self.RootTree.GetEntry(index)
-        if index == 0:
-            binStart = self.BinEndArray[0] - self.TimeIntervalArray[0]
-            binEnd = self.BinEndArray[0]
-        elif index == self.NumTreeEntries - 1:
-            binStart = self.BinStartArray[0]
-            binEnd = self.BinStartArray[0] + self.TimeIntervalArray[0]
-        else:
-            binStart = self.BinStartArray[0]
-            binEnd = self.BinEndArray[0]
-        self.TimeStamp = (binStart + binEnd)/2.0
+    def getTimeStamps(self, firstEntry, arrays):
+        binStart = arrays['Bin_Start'].astype('int64')
+        binEnd = arrays['Bin_End'].astype('int64')
+        timeInterval = arrays['TrueTimeInterval'].astype('d')
+        timeStamps = (binStart + binEnd)/2.0
+        entries = numpy.arange(firstEntry, firstEntry + len(timeStamps))
+        last = entries == self.NumTreeEntries - 1
+        timeStamps[last] = (binStart[last] + (binStart[last] +\
+                                              timeInterval[last]))/2.0
+        first = entries == 0
+        timeStamps[first] = ((binEnd[first] - timeInterval[first]) +\
+                             binEnd[first])/2.0
+        return timeStamps
+
+    ## @brief Return the (2-dimensional) array of the elements to be checked
+    #  for a block of entries, i.e. the entries on the rows and the elements
+    #  in the index list on the columns.
+    ## @param self
+    #  The class instance.
+    ## @param array
+    #  The branch array for the block.
+
+    def getBlockColumns(self, array):
+        return array.reshape((len(array), -1))[:, self.IndexList]
+
+    ## @brief Return the mask of the elements ignored because of the min_n
+    #  and max_rel_err conditions for a block of entries, adding the
+    #  corresponding messages to the output detailed dictionary.
+    ## @param self
+    #  The class instance.
+    ## @param entries
+    #  The array of the entry numbers (i.e. the rows of the block).
+    ## @param values
+    #  The block array of the values.
+    ## @param errors
+    #  The block array of the errors (None if there are no errors).
+    ## @param numEntries
+    #  The block array of the number of entries (None if there's no
+    #  condition on min_n).
+
+    def filterBlock(self, entries, values, errors, numEntries):
+        ignored = numpy.zeros(values.shape, 'bool')
+        if numEntries is not None:
+            ignored |= numEntries < self.__MinEntries
+        if errors is not None and self.__MaxRelError is not None:
+            with numpy.errstate(all = 'ignore'):
+                relErrors = errors/abs(values)
+            ignored |= (values != 0) & (relErrors > self.__MaxRelError)
+        for (i, k) in zip(*numpy.nonzero(ignored)):
+            j = self.IndexList[k]
+            if numEntries is not None and numEntries[i, k] < self.__MinEntries:
+                message = MIN_N_MESSAGE %\
+                    (entries[i], j, numEntries[i, k], self.__MinEntries)
+            else:
+                message = MAX_REL_ERR_MESSAGE %\
+                    (entries[i], j, relErrors[i, k], self.__MaxRelError)
+            logger.info(message)
+            self.Output.appendDictValue('messages', message)
+        return ignored
 
     ## @brief Convert the indexes of the alarm exception (if any) from tuple
     #  to flat numbers, in such a way that the opposite conversion does not
@@ -224,69 +267,98 @@ class alg__values(pAlarmBaseAlgorithm):
                     key = self.tuple2Index(key, self.BranchArray.shape)
                     self.Exception.ExceptionsDict[key] = value
 
+    def getResults(self):
+        results = pAlarmBaseAlgorithm.getResults(self)
+        results['LinksDict'] = self.LinksDict
+        return results
+
+    def setResults(self, results):
+        pAlarmBaseAlgorithm.setResults(self, results)
+        self.LinksDict = results['LinksDict']
+
+    ## @brief Return the mask of the elements in the index list the alarm
+    #  exception (if any) refers to.
+    ## @param self
+    #  The class instance.
+
+    def getExceptionMask(self):
+        if self.Exception is None:
+            return numpy.zeros(len(self.IndexList), 'bool')
+        return numpy.array([self.Exception.refersTo(j) for j in\
+                            self.IndexList], 'bool')
+
+    ## @brief Algorithm implementation.
+    #
+    #  The branches are read in blocks of entries; the min_n and max_rel_err
+    #  conditions and the badness are evaluated on the whole block, and only
+    #  the elements which are out of the limits (or which the exception
+    #  refers to) go through checkStatus().
+    ## @param self
+    #  The class instance.
+
     def run(self):
         linkIndexes = []
         self.setNumSigma()
         maxBadness = MINUS_INFINITY
-        self.__createArrays()
+        self.__createReader()
         self.__setupIndexList()
         self.setupException()
-        for i in range(self.NumTreeEntries):
-            self.getEntry(i)
-            if self.TimeIntervalArray[0] > MIN_TRUE_TIME_INTERVAL:
-                valueFlatArray = self.BranchArray.flatten()
-                if self.__HasErrors:
-                    errorFlatArray = self.ErrorArray.flatten()
-                if self.__MinEntries is not None:
-                    numEntriesFlatArray = self.NumEntriesArray.flatten()
-                for j in self.IndexList:
-                    value = valueFlatArray[j]
-                    if self.__HasErrors:
-                        error = errorFlatArray[j]*self.NumSigma
-                        if value != 0:
-                            relError = error/abs(value)
-                        else:
-                            relError = None
-                    else:
-                        error = None
-                        relError = None
-                    if self.__MinEntries is not None:
-                        entries = numEntriesFlatArray[j]
-                    else:
-                        entries = None
-                    # Check the condition on the number of entries.
-                    if self.__MinEntries is not None and\
-                            entries is not None and\
-                            entries < self.__MinEntries:
-                        message = MIN_N_MESSAGE %\
-                            (i, j, entries, self.__MinEntries)
-                        logger.info(message)
-                        self.Output.appendDictValue('messages', message)
-                    # Check the condition on the relative error.
-                    elif self.__MaxRelError is not None and\
-                            relError is not None and\
-                            relError > self.__MaxRelError:
-                        message = MAX_REL_ERR_MESSAGE %\
-                            (i, j, relError, self.__MaxRelError)
-                        logger.info(message)
-                        self.Output.appendDictValue('messages', message)
-                    # Go ahead and check the limits.
-                    else:
-                        badness = self.checkStatus(j, value, 'value', error)
-                        if badness > WARNING_BADNESS:
-                            if j not in linkIndexes:
-                                linkIndexes.append(j)
-                        if badness > maxBadness:
-                            maxBadness = badness
-                            (outputEntry, outputIndex,
-                             outputValue, outputError) =\
-                             (i, j, value, error)
-            else:
+        exceptionMask = self.getExceptionMask()
+        for (firstEntry, arrays) in self.Reader.getBlocks(self.NumTreeEntries):
+            timeStamps = self.getTimeStamps(firstEntry, arrays)
+            timeIntervals = arrays['TrueTimeInterval']
+            for i in numpy.nonzero(timeIntervals <= MIN_TRUE_TIME_INTERVAL)[0]:
                 logger.info('Skipping entry %d (TrueTimeInterval = %f)...' %\
-                                (i, self.TimeIntervalArray[0]))
+                                (firstEntry + i, timeIntervals[i]))
+            good = timeIntervals > MIN_TRUE_TIME_INTERVAL
+            if not good.any():
+                continue
+            timeStamps = timeStamps[good]
+            entries = numpy.arange(firstEntry, firstEntry + len(good))[good]
+            values = self.getBlockColumns(arrays[self.ValueBranchName][good])
+            if self.ErrorBranchName is not None:
+                errors = self.getBlockColumns(\
+                    arrays[self.ErrorBranchName][good]).astype('d')*\
+                    self.NumSigma
+            else:
+                errors = None
+            if self.__MinEntries is not None:
+                numEntries = self.getBlockColumns(\
+                    arrays[self.NumEntriesBranchName][good])
+            else:
+                numEntries = None
+            checked = ~self.filterBlock(entries, values, errors, numEntries)
+            # Go ahead and check the limits.
+            badness = self.Limits.getBadnessArray(values, errors)
+            offending = checked & (~(badness <= WARNING_BADNESS) |\
+                                   exceptionMask)
+            for (i, k) in zip(*numpy.nonzero(offending)):
+                j = self.IndexList[k]
+                if errors is not None:
+                    error = errors[i, k]
+                else:
+                    error = None
+                self.TimeStamp = timeStamps[i]
+                badness[i, k] = self.checkStatus(j, values[i, k], 'value',\
+                                                 error)
+                if badness[i, k] > WARNING_BADNESS:
+                    if j not in linkIndexes:
+                        linkIndexes.append(j)
+            badness[~checked | numpy.isnan(badness)] = -numpy.inf
+            if badness.size:
+                (i, k) = numpy.unravel_index(numpy.argmax(badness),\
+                                             badness.shape)
+                if badness[i, k] > maxBadness:
+                    maxBadness = badness[i, k]
+                    if errors is not None:
+                        outputError = errors[i, k]
+                    else:
+                        outputError = None
+                    (outputIndex, outputValue, outputTimeStamp) =\
+                        (self.IndexList[k], values[i, k], timeStamps[i])
         try:
             self.Output.setValue(outputValue, outputError, maxBadness)
-            self.getEntry(outputEntry)
+            self.TimeStamp = outputTimeStamp
             label = self.getDetailedLabel(outputIndex, outputValue, 'value',\
                                               outputError)
             label = '%s, badness = %s' % (label,\
@@ -306,7 +378,6 @@ class alg__values(pAlarmBaseAlgorithm):
                     self.LinksDict[label].sort()
         except:
             pass
-        self.RootTree.SetBranchStatus('*', 1)
 
             
 
@@ -32,7 +32,8 @@ class alg__x_min_bin_slices(pAlarmBaseAlgorithm):
     SUPPORTED_PARAMETERS = ['num_adjacent_bins', 'slice_width']
     OUTPUT_LABEL         = 'Bin center of the leftmost bin for the worst slice'
 
-    def getDetailedLabel(self, i, value, valueLabel = None, error = None):
+    def getDetailedLabel(self, i, value, valueLabel = None, error = None,
+                         timeStamp = None):
         return 'slice centered at %s = %s, minimum bin center = %s' %\
             (self.getAxisLabel('x'), self.getFormattedX(i), value)
 
@@ -7,6 +7,7 @@ logger = pSafeLogger.getLogger('pAlarm')
 import sys
 import re
 import pUtils
+import pAlarmOutput
 
 from pXmlBaseElement import pXmlBaseElement
 from pAlarmLimits    import pAlarmLimits
@@ -50,6 +51,10 @@ class pAlarm(pXmlBaseElement):
         ## @brief The name of the specific algorithm that the alarm is
         #  supposed to apply.
 
+        ## @var MaxDetailEntries
+        ## @brief The maximum number of entries (e.g. bins exceeding the
+        #  limits) listed in each field of the output detailed dictionary.
+
         ## @var Algorithm
         ## @brief The actual algorithm the alarm is applying. 
  
@@ -61,12 +66,14 @@ class pAlarm(pXmlBaseElement):
 	self.ConditionsDict = self.__extractConditionsDict()
         self.FunctionName = self.getAttribute('function')
         self.Severity = self.__extractSeverity()
+        self.MaxDetailEntries = self.__extractMaxDetailEntries()
         try:
             exec('from alg__%s import alg__%s' % (self.FunctionName,\
                                                   self.FunctionName))
             self.Algorithm = eval(('alg__%s' % self.FunctionName)       +\
                                       '(self.Limits, self.RootObject, ' +\
                                       'self.ParamsDict, self.ConditionsDict)')
+            self.Algorithm.Output.MaxDetailEntries = self.MaxDetailEntries
         except ImportError:
             logger.error('Could not import alg__%s. ' % self.FunctionName +\
                           'The alarm will be ignored.')
@@ -148,6 +155,29 @@ class pAlarm(pXmlBaseElement):
             severity = MIN_SEVERITY
         return severity
 
+    ## @brief Extract the maximum number of entries listed in each field of
+    #  the output detailed dictionary from the underlying dom element.
+    #
+    #  All the entries are counted anyway, but only the first ones are
+    #  stored and written out (see pAlarmOutput.pDetailedEntryList). The
+    #  value is by default @ref pAlarmOutput.MAX_DETAIL_ENTRIES.
+    ## @param self
+    #  The class instance.
+
+    def __extractMaxDetailEntries(self):
+        defaultValue = pAlarmOutput.MAX_DETAIL_ENTRIES
+        try:
+            maxDetailEntries = int(self.getTagValue('max_detail_entries',\
+                                                    defaultValue))
+        except ValueError:
+            maxDetailEntries = -1
+        if maxDetailEntries < 0:
+            logger.warn('Invalid max_detail_entries for alarm %s %s.' %\
+                        (self.getPlotName(), self.FunctionName))
+            logger.info('Setting it to %d...' % defaultValue)
+            maxDetailEntries = defaultValue
+        return maxDetailEntries
+
     ## @brief Extract the dictionary of conditions from the underlying
     #  dom element.
     ## @param self
@@ -8,6 +8,7 @@ import pUtils
 import types
 import numpy
 import time
+import itertools
 
 from pAlarmOutput import pAlarmOutput
 from pAlarmOutput import STATUS_CLEAN, STATUS_WARNING, STATUS_ERROR
@@ -29,6 +30,130 @@ ROOT2NUMPYDICT = {'C' : 'c',      #a character string terminated by the 0 char
                   'L' : 'int64',  #a 64 bit signed integer (Long64_t)
                   'l' : 'uint64'  #a 64 bit unsigned integer (ULong64_t)
 		  }
+
+
+## @brief Return the bin contents of a (1 or 2-dimensional) histogram as a
+#  numpy array of doubles, including the underflow and overflow bins.
+#
+#  The array has shape (nx + 2,) or (nx + 2, ny + 2), so that it is indexed
+#  exactly as GetBinContent(i) and GetBinContent(i, j). The contents are
+#  read from the histogram buffer in one go when possible.
+## @param histogram
+#  The ROOT histogram.
+
+def getBinContents(histogram):
+    shape = getBinArrayShape(histogram)
+    numCells = int(numpy.prod(shape))
+    try:
+        buffer = histogram.GetArray()
+        buffer.SetSize(numCells)
+        contents = numpy.frombuffer(buffer, ROOT2NUMPYDICT[\
+            histogram.Class().GetName()[-1]], numCells).astype('d')
+    except:
+        contents = numpy.array([histogram.GetBinContent(i) for i in\
+                                xrange(numCells)], 'd')
+    return reshapeBinArray(contents, shape)
+
+## @brief Return the bin errors of a (1 or 2-dimensional) histogram as a
+#  numpy array of doubles, including the underflow and overflow bins (see
+#  getBinContents()).
+#
+#  The errors are evaluated as in TH1::GetBinError(), i.e. from the sum of
+#  the squares of weights, if any, or from the bin contents otherwise. The
+#  histograms with non-standard error options are read bin by bin.
+## @param histogram
+#  The ROOT histogram.
+
+def getBinErrors(histogram):
+    shape = getBinArrayShape(histogram)
+    numCells = int(numpy.prod(shape))
+    try:
+        if histogram.GetBinErrorOption() != ROOT.TH1.kNormal:
+            raise RuntimeError, 'Non standard error option.'
+        if histogram.GetSumw2N():
+            buffer = histogram.GetSumw2().GetArray()
+            buffer.SetSize(numCells)
+            errors = numpy.sqrt(numpy.frombuffer(buffer, 'd', numCells))
+        else:
+            errors = numpy.sqrt(numpy.abs(getBinContents(histogram).T.ravel()))
+    except:
+        errors = numpy.array([histogram.GetBinError(i) for i in\
+                              xrange(numCells)], 'd')
+    return reshapeBinArray(errors, shape)
+
+## @brief Return the shape, in the ROOT global bin layout (i.e. y-major), of
+#  the bin array of a histogram.
+## @param histogram
+#  The ROOT histogram.
+
+def getBinArrayShape(histogram):
+    if histogram.GetDimension() == 2:
+        return (histogram.GetNbinsY() + 2, histogram.GetNbinsX() + 2)
+    return (histogram.GetNbinsX() + 2,)
+
+## @brief Reshape a flat array in the ROOT global bin layout so that it can
+#  be indexed as [i] or [i, j].
+## @param array
+#  The flat array.
+## @param shape
+#  The shape returned by getBinArrayShape().
+
+def reshapeBinArray(array, shape):
+    return array.reshape(shape).transpose()
+
+## @brief Return the trimmed averages of the neighbours of all the bins of
+#  an array of bin contents.
+#
+#  This is the vectorized version of
+#  pAlarmBaseAlgorithm.getNeighbouringAverage(), giving exactly the same
+#  results: for each bin the neighbours (within the histogram range,
+#  excluding the bin itself) are sorted, the lowCut and highCut fractions
+#  are removed (along with the highest bin, as in the original
+#  implementation) and the remaining ones are summed in increasing order.
+#  The average is zero where no neighbours are left. The underflow and
+#  overflow bins of the output array are zero.
+## @param contents
+#  The array of bin contents, as returned by getBinContents().
+## @param numNeighbours
+#  The number of neighbours on each side (and on top and bottom).
+## @param lowCut
+#  The fraction of bins with the lowest content to be excluded.
+## @param highCut
+#  The fraction of bins with the highest content to be excluded.
+
+def getNeighbouringAverages(contents, numNeighbours, lowCut, highCut):
+    innerSlice = (slice(1, -1),)*contents.ndim
+    inner = contents[innerSlice]
+    padded = numpy.empty([size + 2*numNeighbours for size in inner.shape])
+    padded.fill(numpy.nan)
+    padded[tuple([slice(numNeighbours, numNeighbours + size) for size in\
+                  inner.shape])] = inner
+    windows = []
+    for offsets in itertools.product(range(-numNeighbours,\
+                                           numNeighbours + 1),\
+                                     repeat = contents.ndim):
+        if offsets != (0,)*contents.ndim:
+            windows.append(padded[tuple([slice(numNeighbours + offset,\
+                                               numNeighbours + offset + size)\
+                                         for (offset, size) in\
+                                         zip(offsets, inner.shape)])])
+    averages = numpy.zeros(contents.shape)
+    if not len(windows):
+        return averages
+    # NaN (i.e. outside the histogram range) are sorted last.
+    windows = numpy.sort(numpy.array(windows), axis = 0)
+    numBins = (~numpy.isnan(windows)).sum(axis = 0)
+    numCutBinsLow = numpy.floor(numBins*lowCut).astype('l')
+    numCutBinsHigh = numpy.floor(numBins*highCut).astype('l')
+    lastBin = numBins - (numCutBinsHigh + 1)
+    total = numpy.zeros(inner.shape)
+    for (k, window) in enumerate(windows):
+        total += numpy.where((k >= numCutBinsLow) & (k < lastBin), window, 0.)
+    numAveraged = lastBin - numCutBinsLow
+    averages[innerSlice] = numpy.where(numAveraged > 0, total/\
+                                       numpy.maximum(numAveraged, 1), 0.)
+    return averages
+
 	    
 ## @brief Base class for alarm algorithms. Look at the inheritance diagram for
 #  the list of implemented algorithms.
@@ -107,6 +232,12 @@ class pAlarmBaseAlgorithm:
         ## @var Output
         ## @brief The alarm output (initialized to an undefined pAlarmOutput
         #  object in the constructor).
+
+        ## @var BinContents
+        ## @brief The bin contents of the ROOT object (see getBinContents()).
+
+        ## @var BinErrors
+        ## @brief The bin errors of the ROOT object (see getBinErrors()).
      
         self.Limits = limits
         self.RootObject = obj
@@ -118,12 +249,35 @@ class pAlarmBaseAlgorithm:
         self.Output.Label = copy(self.OUTPUT_LABEL)
         self.Output.DetailedDict = {}
         self.Exception = None
+        self.BinContents = None
+        self.BinErrors = None
+        self.TimeStamp = None
         self.checkObjectType()
         self.checkParameters()
 
     def hasDetails(self):
         return self.Output.DetailedDict != {}
 
+    ## @brief Return the bin contents of the underlying histogram as a numpy
+    #  array indexed as GetBinContent() (the histogram is only read once).
+    ## @param self
+    #  The class instance.
+
+    def getBinContents(self):
+        if self.BinContents is None:
+            self.BinContents = getBinContents(self.RootObject)
+        return self.BinContents
+
+    ## @brief Return the bin errors of the underlying histogram as a numpy
+    #  array indexed as GetBinError() (the histogram is only read once).
+    ## @param self
+    #  The class instance.
+
+    def getBinErrors(self):
+        if self.BinErrors is None:
+            self.BinErrors = getBinErrors(self.RootObject)
+        return self.BinErrors
+
     ## @brief Return True if the algorithm is valid (i.e. both the ROOT
     #  object type and the parameters type are supported).
     ## @param self
@@ -272,6 +426,37 @@ class pAlarmBaseAlgorithm:
     def run(self):
         logger.error('Method run() not implemented for %s.' % self.getName())
 
+    ## @brief Return the results of the algorithm, i.e. everything the xml
+    #  summary and the report need once the algorithm has been applied.
+    #
+    #  The results can be pickled, so that the algorithm can be applied in
+    #  a worker process (see pAlarmHandler.activateAlarmSets()) and the
+    #  results moved back to the corresponding algorithm in the parent
+    #  process through setResults(). Derived classes storing additional
+    #  output must extend both methods.
+    ## @param self
+    #  The class instance.
+
+    def getResults(self):
+        self.Output.freezeDetails()
+        return {'Output'    : self.Output,
+                'ParamsDict': self.ParamsDict}
+
+    ## @brief Set the results of the algorithm (as returned by getResults()).
+    #
+    #  The parameters dictionary is updated in place, as it is shared with
+    #  the parent pAlarm object.
+    ## @param self
+    #  The class instance.
+    ## @param results
+    #  The results dictionary.
+
+    def setResults(self, results):
+        self.Output = results['Output']
+        self.Output.Limits = self.Limits
+        self.Output.Parent = self
+        self.ParamsDict.update(results['ParamsDict'])
+
     ## @brief Return the bin center for a given bin index on the x axis.
     ## @param self
     #  The class instance.
@@ -373,7 +558,9 @@ class pAlarmBaseAlgorithm:
     #  The value.
     
     def getDetailedLabel(self, index, value, valueLabel = 'value',\
-                             error = None):
+                             error = None, timeStamp = None):
+        if timeStamp is None:
+            timeStamp = self.TimeStamp
         objectType = self.getObjectType()
         value = pUtils.formatNumber(value)
         if error is not None:
@@ -386,7 +573,7 @@ class pAlarmBaseAlgorithm:
             value = '%s +- %s' % (value, error)
         position = self.getFormattedPosition(index)
         if objectType == 'TBranch':
-            timestamp = time.gmtime(self.TimeStamp + MET_OFFSET)
+            timestamp = time.gmtime(timeStamp + MET_OFFSET)
             label = '%s, ' % time.strftime('%d-%b-%Y %H:%M:%S', timestamp)
             if self.BranchArray.size > 1:
                 index = self.index2Tuple(index, self.BranchArray.shape)
@@ -410,39 +597,51 @@ class pAlarmBaseAlgorithm:
     #  
     #  This is under deep restructuring and needs documentation.
     #
+    #  The offending entries are stored as (index, value, valueLabel, error,
+    #  badness, timeStamp) records, and only formatted into labels when the
+    #  output is written (see pAlarmOutput.pDetailedEntryList).
+    #
     ## @param self
     #  The class instance
 
     def checkStatus(self, index, value, valueLabel, error = None):
-        position = self.getPosition(index)
         if self.Exception is None:
             flipLogic = False
         else:
+            position = self.getPosition(index)
             flipLogic = self.Exception.refersTo(position)
         badness = self.Limits.getBadness(value, error)
         status  = self.Output.getStatus(badness)
         if status == STATUS_CLEAN and flipLogic:
-            label = self.getDetailedLabel(index, value, valueLabel, error)
-            self.Output.appendDictValue('exception_violations', label)
             badness = self.Exception.getBadness(position)
-        elif status == STATUS_ERROR:
-            label = self.getDetailedLabel(index, value, valueLabel, error)
+            self.Output.appendDictRecord('exception_violations',\
+                (index, value, valueLabel, error, badness, self.TimeStamp))
+        elif status == STATUS_ERROR or status == STATUS_WARNING:
             if flipLogic:
-                self.Output.appendDictValue('known_issues', label)
                 badness *= -1.0
-            else:
+                key = 'known_issues'
+            elif status == STATUS_ERROR:
                 self.Output.incrementDictValue('num_error_entries')
-                self.Output.appendDictValue('error_entries', label)
-        elif status == STATUS_WARNING:
-            label = self.getDetailedLabel(index, value, valueLabel, error)
-            if flipLogic:
-                self.Output.appendDictValue('known_issues', label)
-                badness *= -1.0
+                key = 'error_entries'
             else:
                 self.Output.incrementDictValue('num_warning_entries')
-                self.Output.appendDictValue('warning_entries', label)
+                key = 'warning_entries'
+            self.Output.appendDictRecord(key, (index, value, valueLabel,\
+                                               error, badness, self.TimeStamp))
         return badness
 
+    ## @brief Format a record stored by checkStatus() into the corresponding
+    #  label (see getDetailedLabel()).
+    ## @param self
+    #  The class instance.
+    ## @param record
+    #  The (index, value, valueLabel, error, badness, timeStamp) tuple.
+
+    def formatDetailedRecord(self, record):
+        (index, value, valueLabel, error, badness, timeStamp) = record
+        return self.getDetailedLabel(index, value, valueLabel, error,\
+                                     timeStamp)
+
     ## @brief Convert a flat index to a multi-dimensional array position.
     ## @param self
     #  The class instance.
@@ -639,13 +838,9 @@ class pAlarmBaseAlgorithm:
     def getNeighbouringAverage(self, bin, numNeighbours, lowCut, highCut):
         binsContent = []
         binsList = self.getNeighbouringBinsList(bin, numNeighbours)
-        firstBin = binsList[0]
-        if type(firstBin) == types.IntType:
-            for i in binsList:
-                binsContent.append(self.RootObject.GetBinContent(i))
-        elif len(firstBin) == 2:
-            for (i, j) in binsList:
-                binsContent.append(self.RootObject.GetBinContent(i, j))
+        contents = self.getBinContents()
+        for index in binsList:
+            binsContent.append(float(contents[index]))
         binsContent.sort()
         numBins = len(binsContent)
         numCutBinsLow = int(numBins*lowCut)
@@ -653,6 +848,26 @@ class pAlarmBaseAlgorithm:
         binsContent =  binsContent[numCutBinsLow:-(numCutBinsHigh + 1)]
         return self.getAverage(binsContent)
 
+    ## @brief Return the average content of the neighbours of all the
+    #  histogram bins, as an array indexed as getBinContents().
+    #
+    #  Same as getNeighbouringAverage(), for all the bins at once.
+    ## @param self
+    #  The class instance.
+    ## @param numNeighbours
+    #  The number of bins on the left and right---as well as top and bottom,
+    #  for the 2-dimensional histograms---which are considered neighbours.
+    ## @param lowCut
+    #  The <em>fraction</em> of bins with the lowest content to be excluded in
+    #  the average evaluation.
+    ## @param highCut
+    #  The <em>fraction</em> of bins with the highest content to be excluded in
+    #  the average evaluation.
+
+    def getNeighbouringAverages(self, numNeighbours, lowCut, highCut):
+        return getNeighbouringAverages(self.getBinContents(), numNeighbours,\
+                                       lowCut, highCut)
+
 
 
 if __name__ == '__main__':
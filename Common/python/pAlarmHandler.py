@@ -10,6 +10,7 @@ import os
 import sys
 import pUtils
 import time
+import multiprocessing
 
 from pXmlElement               import pXmlElement
 from pXmlAlarmParser           import pXmlAlarmParser
@@ -40,9 +41,13 @@ class pAlarmHandler:
     #  The path to the input xml configuration file.
     ## @param xmlSummaryFilePath
     #  The path to the output xml summary path.
+    ## @param referenceFolderPath
+    #  The path to the folder containing the reference ROOT files.
+    ## @param numJobs
+    #  The number of worker processes the alarms are activated in.
     
     def __init__(self, rootFilePath, xmlConfigFilePath, xmlExceptionsFilePath,\
-                     xmlSummaryFilePath, referenceFolderPath):
+                     xmlSummaryFilePath, referenceFolderPath, numJobs = 1):
 
         ## @var XmlParser
         ## @brief The pXmlAlarmParser object responsible for parsing the
@@ -60,11 +65,18 @@ class pAlarmHandler:
 
         ## @var AlarmStats
         ## @brief Basic alarm handler statistics.
+
+        ## @var RootFilePath, XmlConfigFilePath, XmlExceptionsFilePath
+        ## @brief The input file paths (needed by the worker processes).
+
+        ## @var NumJobs
+        ## @brief The number of worker processes the alarms are activated in.
         
-        self.AlarmExceptionsDict = {}
-        if xmlExceptionsFilePath is not None:
-            xmlExceptionParser = pXmlExceptionParser(xmlExceptionsFilePath)
-            self.AlarmExceptionsDict = xmlExceptionParser.AlarmExceptionsDict
+        self.RootFilePath = rootFilePath
+        self.XmlConfigFilePath = xmlConfigFilePath
+        self.XmlExceptionsFilePath = xmlExceptionsFilePath
+        self.NumJobs = numJobs
+        self.AlarmExceptionsDict = getAlarmExceptionsDict(xmlExceptionsFilePath)
         self.XmlParser = pXmlAlarmParser(xmlConfigFilePath)
         if xmlSummaryFilePath == None:
             xmlSummaryFilePath = rootFilePath.replace('.root', '.alarms.xml')
@@ -95,39 +107,13 @@ class pAlarmHandler:
     #  dictionary \ref ReferenceHistogramsDict.
 
     def loadReferenceHistograms(self):
-        if self.ReferenceFolderPath is None:
-            logger.info('Path to the reference histograms folder not set.')
-            logger.info('Reference histograms will not be loaded.')
-        else:
-            logger.info('Loading reference histograms into memory...')
-            if not os.path.exists(self.ReferenceFolderPath):
-                logger.error('%s does not exist. References not loaded.' %\
-                             self.ReferenceFolderPath)
-                return
-            if not os.path.isdir(self.ReferenceFolderPath):
-                logger.error('%s is not a directory. References not loaded.' %\
-                             self.ReferenceFolderPath)
-                return
-            fileNameList = os.listdir(self.ReferenceFolderPath)
-            for fileName in fileNameList:
-                if fileName.endswith('.root'):
-                    filePath = os.path.join(self.ReferenceFolderPath, fileName)
-                    logger.info('Loading %s...' % filePath)
-                    rootFile = ROOT.TFile(filePath)
-                    if rootFile.IsZombie():
-                        logger.error('Problems loading %s.' % filePath)
-                    else:
-                        self.ReferenceHistogramsDict[fileName] = rootFile
-                        logger.info('Done.')
+        self.ReferenceHistogramsDict =\
+            loadReferenceHistograms(self.ReferenceFolderPath)
 
     ## @brief Close the reference files.
 
     def closeReferenceFiles(self):
-        logger.info('Closing reference files...')
-        for rootFile in self.ReferenceHistogramsDict.values():
-            logger.info('Closing %s...' % rootFile.GetPath())
-            rootFile.Close()
-        logger.info('Done.')
+        closeReferenceFiles(self.ReferenceHistogramsDict)
 
     ## @brief Assing the ROOT objects to the alarm sets.
     #
@@ -146,23 +132,84 @@ class pAlarmHandler:
                     len(self.XmlParser.getEnabledAlarmSets()))
 
     ## @brief Activate the alarms.
+    #
+    #  If more than one job is requested, the alarm sets are activated in
+    #  parallel (see activateAlarmsParallel()).
     ## @param self
     #  The class instance.
 
     def activateAlarms(self):
         logger.info('Activating the alarms...')
-        for alarm in self.XmlParser.getEnabledAlarms():
-            logger.debug('Activating alarm on "%s"' % alarm.getPlotName())
-            alarmTuple = (alarm.getPlotName(), alarm.FunctionName)
-            if alarmTuple in self.AlarmExceptionsDict.keys():
-                logger.info('Setting exception(s) on %s %s...' % alarmTuple)
-                logger.info('Details:\n%s' %\
-                            self.AlarmExceptionsDict[alarmTuple])
-                alarm.Algorithm.Exception =\
-                                          self.AlarmExceptionsDict[alarmTuple]
-	    alarm.activate()
+        numJobs = min(self.NumJobs, len(self.XmlParser.getEnabledAlarmSets()))
+        if numJobs > 1:
+            self.activateAlarmsParallel(numJobs)
+        else:
+            for alarm in self.XmlParser.getEnabledAlarms():
+                activateAlarm(alarm, self.AlarmExceptionsDict)
         logger.info('Done. %d enabled alarm(s) found.\n' %\
                      len(self.XmlParser.getEnabledAlarms()))
+
+    ## @brief Partition the enabled alarm sets among a given number of jobs.
+    #
+    #  The sets are assigned, largest first, to the job with the smallest
+    #  number of alarms so far. Return the list of the lists of alarm set
+    #  indices (in the parser list) for each job.
+    ## @param self
+    #  The class instance.
+    ## @param numJobs
+    #  The number of jobs.
+
+    def partitionAlarmSets(self, numJobs):
+        alarmSets = self.XmlParser.getEnabledAlarmSets()
+        indices = range(len(alarmSets))
+        indices.sort(key = lambda i: len(alarmSets[i].EnabledAlarmsList),\
+                     reverse = True)
+        partitions = [[] for i in range(numJobs)]
+        loads = [0]*numJobs
+        for i in indices:
+            job = loads.index(min(loads))
+            partitions[job].append(i)
+            loads[job] += max(1, len(alarmSets[i].EnabledAlarmsList))
+        return [sorted(partition) for partition in partitions if partition]
+
+    ## @brief Activate the alarms in a pool of worker processes.
+    #
+    #  Each worker opens the ROOT file (read-only) through its own
+    #  pRootFileManager, activates the alarms of its alarm sets and sends
+    #  back the results, which are then moved into the corresponding alarms
+    #  of this process, so that the xml summary and the report are the same
+    #  as in a serial run.
+    ## @param self
+    #  The class instance.
+    ## @param numJobs
+    #  The number of worker processes.
+
+    def activateAlarmsParallel(self, numJobs):
+        partitions = self.partitionAlarmSets(numJobs)
+        logger.info('Splitting %d alarm set(s) into %d job(s)...' %\
+                    (len(self.XmlParser.getEnabledAlarmSets()),\
+                     len(partitions)))
+        argsList = [(self.RootFilePath, self.XmlConfigFilePath,\
+                     self.XmlExceptionsFilePath, self.ReferenceFolderPath,\
+                     partition) for partition in partitions]
+        pool = multiprocessing.Pool(len(partitions))
+        results = pool.map(activateAlarmSets, argsList)
+        pool.close()
+        pool.join()
+        alarmSets = self.XmlParser.getEnabledAlarmSets()
+        for jobResults in results:
+            for (index, resultsList) in jobResults:
+                alarmSet = alarmSets[index]
+                if len(resultsList) != len(alarmSet.EnabledAlarmsList):
+                    logger.error('Alarm mismatch for set "%s" in worker. ' %\
+                                 alarmSet.Name +\
+                                 'Activating the alarms here...')
+                    for alarm in alarmSet.EnabledAlarmsList:
+                        activateAlarm(alarm, self.AlarmExceptionsDict)
+                    continue
+                for (alarm, result) in zip(alarmSet.EnabledAlarmsList,\
+                                           resultsList):
+                    alarm.Algorithm.setResults(result)
         
     ## @brief Evaluation of alarm statistics to be written
     #  at the beginning of the output .xml file anf .html report
@@ -181,17 +228,121 @@ class pAlarmHandler:
         return self.AlarmStats
 
 
+## @brief Return the dictionary of the alarm exceptions, indexed by
+#  (plot name, function name).
+## @param xmlExceptionsFilePath
+#  The path to the xml exceptions file (None for no exceptions).
+
+def getAlarmExceptionsDict(xmlExceptionsFilePath):
+    if xmlExceptionsFilePath is None:
+        return {}
+    return pXmlExceptionParser(xmlExceptionsFilePath).AlarmExceptionsDict
+
+## @brief Load the reference histograms into memory.
+#
+#  If referenceFolderPath is None, then the function does not actually do
+#  anything. Otherwise it loops over the root files in the specified
+#  folder, opens them and returns a dictionary of them, indexed by file name.
+## @param referenceFolderPath
+#  The path to the folder containing the reference ROOT files.
+
+def loadReferenceHistograms(referenceFolderPath):
+    referenceHistogramsDict = {}
+    if referenceFolderPath is None:
+        logger.info('Path to the reference histograms folder not set.')
+        logger.info('Reference histograms will not be loaded.')
+        return referenceHistogramsDict
+    logger.info('Loading reference histograms into memory...')
+    if not os.path.exists(referenceFolderPath):
+        logger.error('%s does not exist. References not loaded.' %\
+                     referenceFolderPath)
+        return referenceHistogramsDict
+    if not os.path.isdir(referenceFolderPath):
+        logger.error('%s is not a directory. References not loaded.' %\
+                     referenceFolderPath)
+        return referenceHistogramsDict
+    fileNameList = os.listdir(referenceFolderPath)
+    for fileName in fileNameList:
+        if fileName.endswith('.root'):
+            filePath = os.path.join(referenceFolderPath, fileName)
+            logger.info('Loading %s...' % filePath)
+            rootFile = ROOT.TFile(filePath)
+            if rootFile.IsZombie():
+                logger.error('Problems loading %s.' % filePath)
+            else:
+                referenceHistogramsDict[fileName] = rootFile
+                logger.info('Done.')
+    return referenceHistogramsDict
+
+## @brief Close the reference files.
+## @param referenceHistogramsDict
+#  The dictionary of the reference files.
+
+def closeReferenceFiles(referenceHistogramsDict):
+    logger.info('Closing reference files...')
+    for rootFile in referenceHistogramsDict.values():
+        logger.info('Closing %s...' % rootFile.GetPath())
+        rootFile.Close()
+    logger.info('Done.')
+
+## @brief Activate an alarm, setting the exceptions first (if any).
+## @param alarm
+#  The pAlarm object.
+## @param alarmExceptionsDict
+#  The dictionary of the alarm exceptions.
+
+def activateAlarm(alarm, alarmExceptionsDict):
+    logger.debug('Activating alarm on "%s"' % alarm.getPlotName())
+    alarmTuple = (alarm.getPlotName(), alarm.FunctionName)
+    if alarmTuple in alarmExceptionsDict.keys():
+        logger.info('Setting exception(s) on %s %s...' % alarmTuple)
+        logger.info('Details:\n%s' % alarmExceptionsDict[alarmTuple])
+        alarm.Algorithm.Exception = alarmExceptionsDict[alarmTuple]
+    alarm.activate()
+
+## @brief Activate the alarms of a subset of the alarm sets.
+#
+#  This is the function executed by the worker processes in a parallel run
+#  (see pAlarmHandler.activateAlarmsParallel()); it is defined at the module
+#  level so that it can be dispatched through a multiprocessing pool.
+#  Return the list of (alarm set index, list of the alarm results), the
+#  results being in the same order as the enabled alarms of the set.
+## @param args
+#  Tuple (rootFilePath, xmlConfigFilePath, xmlExceptionsFilePath,
+#  referenceFolderPath, alarmSetIndices).
+
+def activateAlarmSets(args):
+    (rootFilePath, xmlConfigFilePath, xmlExceptionsFilePath,\
+     referenceFolderPath, alarmSetIndices) = args
+    alarmExceptionsDict = getAlarmExceptionsDict(xmlExceptionsFilePath)
+    xmlParser = pXmlAlarmParser(xmlConfigFilePath)
+    referenceHistogramsDict = loadReferenceHistograms(referenceFolderPath)
+    rootFileManager = pRootFileManager(rootFilePath)
+    results = []
+    for index in alarmSetIndices:
+        alarmSet = xmlParser.getEnabledAlarmSets()[index]
+        plotList = rootFileManager.find(alarmSet.Name, alarmSet.Selection)
+        alarmSet.setPlotsList(plotList, referenceHistogramsDict)
+        resultsList = []
+        for alarm in alarmSet.EnabledAlarmsList:
+            activateAlarm(alarm, alarmExceptionsDict)
+            resultsList.append(alarm.Algorithm.getResults())
+        results.append((index, resultsList))
+    closeReferenceFiles(referenceHistogramsDict)
+    rootFileManager.closeFile()
+    return results
+
 
 if __name__ == '__main__':
     from pOptionParser import pOptionParser
-    optparser = pOptionParser('corVxwR',1,1,False)
+    optparser = pOptionParser('corVxwRj',1,1,False)
     if optparser.Options.c is None:
         optparser.error('Please supply an xml configuration file.')
     if optparser.Options.V and not optparser.Options.r:
         logger.warning('Without the -r option the -V option will be ignored!')
     alarmHandler = pAlarmHandler(optparser.Argument, optparser.Options.c,\
                                  optparser.Options.x, optparser.Options.o,
-                                 optparser.Options.R)
+                                 optparser.Options.R, optparser.Options.j)
     if optparser.Options.r:
         ReportGenerator = pAlarmReportGenerator(alarmHandler)
         ReportGenerator.run(False, optparser.Options.w)
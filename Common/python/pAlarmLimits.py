@@ -5,6 +5,7 @@ import pSafeLogger
 logger = pSafeLogger.getLogger('pAlarmLimits')
 
 import pUtils
+import numpy
 
 WARNING_BADNESS = 1.0
 ERROR_BADNESS   = 2.0
@@ -162,6 +163,81 @@ class pAlarmLimits:
                     badness = ERROR_BADNESS + DELTA_BADNESS + db
         return badness
 
+    ## @brief Return the badness of an array of numbers (possibly with their
+    #  errors).
+    #
+    #  The calculation is the very same as in getBadness(), carried out
+    #  element by element (and in double precision).
+    ## @param self
+    #  The class instance.
+    ## @param values
+    #  The array of values.
+    ## @param errors
+    #  The array of errors (None means zero errors).
+
+    def getBadnessArray(self, values, errors = None):
+        values = numpy.asarray(values, 'd')
+        if errors is None:
+            errors = numpy.zeros(values.shape)
+        else:
+            errors = numpy.asarray(errors, 'd')
+        center = (self.WarningMin + self.WarningMax)/2.0
+        with numpy.errstate(all = 'ignore'):
+            bestValues = numpy.where(values - errors >= center, values - errors,
+                                     numpy.where(values + errors <= center,
+                                                 values + errors, center))
+            # Case 1: the best value is between warning min and warning max.
+            clean = (bestValues >= self.WarningMin) &\
+                    (bestValues <= self.WarningMax)
+            if self.WarningMax - center != 0:
+                badness = WARNING_BADNESS*abs(bestValues - center)/\
+                          (self.WarningMax - center)
+            else:
+                badness = numpy.zeros(values.shape)
+            # Case 2: the best value is below the warning min.
+            low = ~clean & (bestValues < self.WarningMin)
+            if self.WarningMin - self.ErrorMin != 0:
+                lowBadness = WARNING_BADNESS + DELTA_BADNESS*\
+                    (self.WarningMin - bestValues)/\
+                    (self.WarningMin - self.ErrorMin)
+            elif center - self.ErrorMin != 0:
+                lowBadness = WARNING_BADNESS + DELTA_BADNESS*\
+                    (center - bestValues)/(center - self.ErrorMin)
+            else:
+                lowBadness = ERROR_BADNESS + DELTA_BADNESS +\
+                    self.__getDegenerateDistance(center, bestValues, errors)
+            # Case 3: the best value is above the warning max.
+            high = ~clean & ~low
+            if self.ErrorMax - self.WarningMax != 0:
+                highBadness = WARNING_BADNESS + DELTA_BADNESS*\
+                    (bestValues - self.WarningMax)/\
+                    (self.ErrorMax - self.WarningMax)
+            elif self.ErrorMax - center != 0:
+                highBadness = WARNING_BADNESS + DELTA_BADNESS*\
+                    (bestValues - center)/(self.ErrorMax - center)
+            else:
+                highBadness = ERROR_BADNESS + DELTA_BADNESS +\
+                    self.__getDegenerateDistance(center, bestValues, errors)
+        badness = numpy.where(low, lowBadness, badness)
+        badness = numpy.where(high, highBadness, badness)
+        return badness
+
+    ## @brief Return the distance between the center and the best values
+    #  (divided by the errors, where positive) used for the badness when all
+    #  the limits coincide (see getBadness()).
+    ## @param self
+    #  The class instance.
+    ## @param center
+    #  The center of the warning limits.
+    ## @param bestValues
+    #  The array of best values.
+    ## @param errors
+    #  The array of errors.
+
+    def __getDegenerateDistance(self, center, bestValues, errors):
+        distances = abs(center - bestValues)
+        return numpy.where(errors > 0.0, distances/errors, distances)
+
     ## @brief Return a formatted representation of the limits.
     ## @param self
     #  The class instance.
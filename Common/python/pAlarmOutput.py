@@ -6,6 +6,7 @@ logger = pSafeLogger.getLogger('pAlarmOutput')
 
 import pUtils
 import pAlarm
+import types
 
 from pAlarmLimits import WARNING_BADNESS, ERROR_BADNESS
 
@@ -21,6 +22,125 @@ STATUS_DICT = {STATUS_CLEAN    : 'CLEAN',
                }
 
 MAX_DETAIL_SIZE  = 1500
+MAX_DETAIL_ENTRIES = 1000
+
+
+## @brief Class describing a list of entries (e.g. the bins exceeding the
+#  limits) of the output detailed dictionary, formatted on demand.
+#
+#  The entries are stored as compact records, which are formatted into
+#  labels (by the parent algorithm) only when the list is converted to a
+#  string, i.e. when the xml summary or the report are written---and only
+#  as many as fit into MAX_DETAIL_SIZE characters. The string is the
+#  same as the one of the list of the labels, truncated as in
+#  pAlarmOutput.compress(). Only the first maxNumEntries entries are
+#  stored (all are counted).
+
+class pDetailedEntryList:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param formatter
+    #  The function formatting a record into a label.
+    ## @param maxNumEntries
+    #  The maximum number of entries to be stored.
+
+    def __init__(self, formatter, maxNumEntries = MAX_DETAIL_ENTRIES):
+
+        ## @var Formatter
+        ## @brief The function formatting a record into a label.
+
+        ## @var MaxNumEntries
+        ## @brief The maximum number of entries to be stored.
+
+        ## @var Entries
+        ## @brief The list of the stored entries (either records, i.e.
+        #  tuples, or labels).
+
+        ## @var NumEntries
+        ## @brief The total number of entries.
+
+        ## @var Text
+        ## @brief The string representation (cached).
+
+        self.Formatter     = formatter
+        self.MaxNumEntries = maxNumEntries
+        self.Entries       = []
+        self.NumEntries    = 0
+        self.Text          = None
+
+    ## @brief Append a record (to be formatted by the formatter).
+    ## @param self
+    #  The class instance.
+    ## @param record
+    #  The record (a tuple).
+
+    def appendRecord(self, record):
+        self.NumEntries += 1
+        if len(self.Entries) < self.MaxNumEntries:
+            self.Entries.append(record)
+            self.Text = None
+
+    ## @brief Append an entry which is already formatted.
+    ## @param self
+    #  The class instance.
+    ## @param label
+    #  The label.
+
+    def append(self, label):
+        self.appendRecord(label)
+
+    ## @brief Return the label for a given entry.
+    ## @param self
+    #  The class instance.
+    ## @param entry
+    #  The entry.
+
+    def getLabel(self, entry):
+        if type(entry) == types.TupleType:
+            return self.Formatter(entry)
+        return entry
+
+    ## @brief Format the string representation once and for all and drop
+    #  the records (and the formatter).
+    #
+    #  This must be done while the ROOT objects the records refer to are
+    #  still available, and before pickling.
+    ## @param self
+    #  The class instance.
+
+    def freeze(self):
+        self.Text = self.__str__()
+        self.Entries = []
+        self.Formatter = None
+
+    def __len__(self):
+        return self.NumEntries
+
+    def __str__(self):
+        if self.Text is not None:
+            return self.Text
+        text = '['
+        for (i, entry) in enumerate(self.Entries):
+            if i > 0:
+                text += ', '
+            text += repr(self.getLabel(entry))
+            if len(text) > MAX_DETAIL_SIZE:
+                break
+        else:
+            numDroppedEntries = self.NumEntries - len(self.Entries)
+            if numDroppedEntries > 0:
+                text += ', ... %d more' % numDroppedEntries
+            text += ']'
+        if len(text) > MAX_DETAIL_SIZE:
+            text = '%s... too much garbage following]' % text[:MAX_DETAIL_SIZE]
+        self.Text = text
+        return text
+
+    def __repr__(self):
+        return self.__str__()
+
 
 ## @brief Class describing the output of an alarm.
 #
@@ -36,14 +156,28 @@ MAX_DETAIL_SIZE  = 1500
 
 class pAlarmOutput:
     
-    def __init__(self, limits, parent = None):
-        self.Limits       = limits
-        self.Parent       = parent
-        self.Value        = None
-        self.Error        = None
-        self.Label        = None
-        self.Status       = STATUS_UNDEFINED
-        self.DetailedDict = {}
+    def __init__(self, limits, parent = None,
+                 maxDetailEntries = MAX_DETAIL_ENTRIES):
+        self.Limits           = limits
+        self.Parent           = parent
+        self.Value            = None
+        self.Error            = None
+        self.Label            = None
+        self.Status           = STATUS_UNDEFINED
+        self.DetailedDict     = {}
+        self.MaxDetailEntries = maxDetailEntries
+
+    ## @brief Return the state to be pickled.
+    #
+    #  The parent algorithm (which holds a reference to the ROOT object) is
+    #  left out and must be set again after unpickling.
+    ## @param self
+    #  The class instance.
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['Parent'] = None
+        return state
 
     def getStatusAsText(self):
         return STATUS_DICT[self.Status]
@@ -157,6 +291,37 @@ class pAlarmOutput:
         except KeyError:
             self.DetailedDict[key] = [value]
 
+    ## @brief Append a record to a specific key of the detailed dictionary.
+    #
+    #  The record is formatted (through the formatDetailedRecord() method of
+    #  the parent algorithm) only when the corresponding entry is written out
+    #  (see pDetailedEntryList).
+    ## @param self
+    #  The class instance.
+    ## @param key
+    #  The dictionary key.
+    ## @param record
+    #  The record to append.
+
+    def appendDictRecord(self, key, record):
+        try:
+            self.DetailedDict[key].appendRecord(record)
+        except KeyError:
+            entries = pDetailedEntryList(self.Parent.formatDetailedRecord,\
+                                         self.MaxDetailEntries)
+            entries.appendRecord(record)
+            self.DetailedDict[key] = entries
+
+    ## @brief Format all the entry lists of the detailed dictionary once and
+    #  for all (see pDetailedEntryList.freeze()).
+    ## @param self
+    #  The class instance.
+
+    def freezeDetails(self):
+        for value in self.DetailedDict.values():
+            if isinstance(value, pDetailedEntryList):
+                value.freeze()
+
     ## @brief Return the output value, nicely formatted as a string.
     ## @param self
     #  The class instance. 
@@ -178,11 +343,16 @@ class pAlarmOutput:
 
     ## @brief Compress the output detailed dictionary in order to avoid too
     #  much verbosity in the output xml file.
+    #
+    #  The pDetailedEntryList objects are left alone, as they are truncated
+    #  in the very same way when they are written out.
     ## @param self
     #  The class instance. 
 
     def compress(self):
         for (key, value) in self.DetailedDict.items():
+            if isinstance(value, pDetailedEntryList):
+                continue
             if len(str(value)) > MAX_DETAIL_SIZE:
                 self.DetailedDict[key] = '%s... too much garbage following]' %\
                     str(value)[:MAX_DETAIL_SIZE]
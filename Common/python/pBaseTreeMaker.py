@@ -4,8 +4,15 @@
 
 from pSafeROOT import ROOT
 
+import numpy
 import pGlobals
 
+
+## @brief Alignment (in bytes) of the variables in the event buffer.
+
+EVENT_BUFFER_ALIGNMENT = 8
+
+
 ## @brief Implementation of the ROOT tree maker.
 #
 #  The things it needs as an input are:
@@ -14,6 +21,10 @@ import pGlobals
 #  It is responability of the program using this class to set the value
 #  of the variables and call the fillTree() method for writing them
 #  to the output file
+#
+#  All the variables are views into a single contiguous event buffer (the
+#  ones to be reset at each event come first), so that resetting the
+#  variables is a single operation.
 
 class pBaseTreeMaker:
 
@@ -43,11 +54,21 @@ class pBaseTreeMaker:
         ## @brief The dictionary containing the tree variables
         #  (which are numpy.array objects).
 
+        ## @var EventBuffer
+        ## @brief The (uint8) numpy array the variables are views into.
+
+        ## @var ResetSize
+        ## @brief The size (in bytes) of the part of the event buffer
+        #  containing the variables to be reset at each event.
+
         self.XmlParser      = xmlParser
         self.OutputFilePath = outputFilePath
         self.OutputFile     = ROOT.TFile(self.OutputFilePath, 'recreate')
         self.RootTree       = ROOT.TTree(treeName, treeName)
         self.VariablesDictionary = {}
+        self.EventBuffer    = None
+        self.ResetSize      = 0
+        self.__createEventBuffer()
         self.__createBranches()
 
     ## @brief Close the output ROOT file.
@@ -58,6 +79,29 @@ class pBaseTreeMaker:
         self.OutputFile.Write()
         self.OutputFile.Close()
 
+    ## @brief Allocate the event buffer and turn the arrays of all the
+    #  enabled variables into views into it.
+    ## @param self
+    #  The class instance.
+
+    def __createEventBuffer(self):
+        variables = self.XmlParser.EnabledVariablesDict.values()
+        variables.sort(key = lambda variable: not variable.Reset)
+        offsets = []
+        size = 0
+        for variable in variables:
+            offsets.append(size)
+            size += variable.Array.nbytes
+            if variable.Reset:
+                self.ResetSize = size
+            size += -size % EVENT_BUFFER_ALIGNMENT
+        self.EventBuffer = numpy.zeros(size, 'uint8')
+        for (variable, offset) in zip(variables, offsets):
+            view = numpy.ndarray(variable.Array.shape, variable.Array.dtype,\
+                                 self.EventBuffer, offset)
+            view[...] = variable.Array
+            variable.Array = view
+
     ## @brief Create all the tree branches, based on the information
     #  from the xml parser.
     ## @param self
@@ -100,8 +144,7 @@ class pBaseTreeMaker:
     #  The class instance.
 
     def resetVariables(self):
-        for variable in self.XmlParser.EnabledVariablesDict.values():
-            variable.reset()
+        self.EventBuffer[:self.ResetSize] = 0
 
     ## @brief Check if a specific variable is defined in the VariablesDictionary
     ## @param self
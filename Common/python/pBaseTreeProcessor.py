@@ -10,7 +10,8 @@ import time
 import sys
 import pUtils
 
-from pSafeROOT import ROOT
+from pSafeROOT             import ROOT
+from pMultiHistogramFiller import pMultiHistogramFiller
 
 
 ## @brief Implementation of the ROOT tree processor.
@@ -71,10 +72,15 @@ class pBaseTreeProcessor:
 
     ## @brief Create the ROOT objects defined in the enabled output lists
     #  of the xml configuration file.
+    #
+    #  The histograms are filled all together by a pMultiHistogramFiller,
+    #  reading the tree once; the optimize flag only affects the objects
+    #  which are still created reading the tree on their own.
     ## @param self
     #  The class instance.
 
     def createObjects(self, numEntries, optimize = False):
+        filler = pMultiHistogramFiller(self.RootTree, numEntries)
         for rep in self.XmlParser.EnabledPlotRepsList:
             if optimize:
                 self.RootTree.SetBranchStatus('*', 0)
@@ -83,7 +89,10 @@ class pBaseTreeProcessor:
                 for branchName in pUtils.getCutVariables(rep.Cut):
                     self.RootTree.SetBranchStatus(branchName, 1)
             try:
-                rep.createRootObject(self.RootTree, numEntries)
+                rep.createRootObject(self.RootTree, numEntries, filler)
             except:
                 logger.error('Could not create %s.' % rep.Name)
+        if optimize:
+            self.RootTree.SetBranchStatus('*', 1)
+        filler.run()
             
@@ -11,7 +11,7 @@ from xml.dom                   import minidom
 from pXmlBaseElement           import pXmlBaseElement
 from pXmlElement               import pXmlElement
 from pAlarm                    import pAlarm
-from pAlarmOutput              import pAlarmOutput
+from pAlarmOutput              import pAlarmOutput, MAX_DETAIL_ENTRIES
 from pAlarmXmlSummaryGenerator import pAlarmXmlSummaryGenerator
 from pAlarmHandler             import pAlarmHandler
 from pAlarmBaseAlgorithm       import pAlarmBaseAlgorithm
@@ -27,9 +27,9 @@ LABEL_DICT = {
 
 class pErrorAlarmBaseAlgorithm(pAlarmBaseAlgorithm):
 
-    def __init__(self, limits):
+    def __init__(self, limits, maxDetailEntries = MAX_DETAIL_ENTRIES):
         self.Limits = limits
-        self.Output = pAlarmOutput(limits, self)
+        self.Output = pAlarmOutput(limits, self, maxDetailEntries)
         self.Exception = None
 
 
@@ -44,7 +44,9 @@ class pErrorAlarm(pAlarm):
 	self.ConditionsDict = self._pAlarm__extractConditionsDict()
         self.FunctionName = self.getAttribute('function')
         self.Severity = self._pAlarm__extractSeverity()
-        self.Algorithm = pErrorAlarmBaseAlgorithm(self.Limits)
+        self.MaxDetailEntries = self._pAlarm__extractMaxDetailEntries()
+        self.Algorithm = pErrorAlarmBaseAlgorithm(self.Limits,\
+                                                  self.MaxDetailEntries)
 
     def checkConditions(self, eventSummary):
         for (key, value) in self.ConditionsDict.items():
@@ -20,9 +20,17 @@ NUM_ACD_CHANNELS_PER_CABLE= 18
 FASTMON_DUMP_ERRORS_TO_FILE = False
 FASTMON_DIR_VAR_NAME        = 'FAST_MON_DIR'
 XML_CONFIG_DIR_VAR_NAME     = 'XML_CONFIG_DIR'
+# Interval (in s) between two updates of the spacecraft position, with the
+# full IGRF model and with the (much cheaper) precomputed geomagnetic grid.
+FASTMON_SC_POSITION_UPDATE_INTERVAL      = 5
+FASTMON_SC_POSITION_UPDATE_INTERVAL_GRID = 1
+# Fill the TKR strip histograms once per contribution rather than per strip.
+TKR_VECTORIZED_STRIPS       = True
 
 # ROOT related variables.
 ROOT_BASKET_SIZE          = 1000000 
+# Number of entries read at a time when filling histograms from a tree.
+ROOT_READ_BLOCK_SIZE      = 10000
 
 PLUS_INFINITY = 1.e10
 MINUS_INFINITY = -1.e10
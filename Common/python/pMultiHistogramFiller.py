@@ -0,0 +1,294 @@
+## @package pMultiHistogramFiller
+## @brief Filling of many histograms in a single pass over a ROOT tree.
+#
+#  Instead of one TTree::Project() per histogram (i.e. one full read of the
+#  tree each), the histograms are registered with their expressions and
+#  cuts, and all of them are filled at the end reading only the needed
+#  branches, once, in blocks of entries (see pTreeBlockReader). The
+#  expressions and cuts are evaluated on the blocks with numpy (see
+#  pTreeFormula) and the histograms are filled with TH1::FillN(), which is
+#  exactly what TTree::Project() ends up doing, so that the output is the
+#  same. Histograms whose expressions are not supported are projected right
+#  away, as before.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pMultiHistogramFiller')
+
+import time
+import numpy
+import pGlobals
+
+from pTreeFormula     import pTreeFormula, splitExpression, broadcastInstances
+from pTreeBlockReader import pTreeBlockReader, getBranchLayout
+
+
+## @brief Implementation of the multi-histogram filler.
+
+class pMultiHistogramFiller:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param rootTree
+    #  The ROOT tree.
+    ## @param numEntries
+    #  The number of entries to be processed (all if negative).
+    ## @param blockSize
+    #  The number of entries read (and evaluated) at a time.
+
+    def __init__(self, rootTree, numEntries = -1,
+                 blockSize = pGlobals.ROOT_READ_BLOCK_SIZE):
+
+        ## @var RootTree
+        ## @brief The ROOT tree.
+
+        ## @var NumEntries
+        ## @brief The number of entries to be processed.
+
+        ## @var BlockSize
+        ## @brief The number of entries read at a time.
+
+        ## @var Requests
+        ## @brief The list of (histogram, formulas, cut formula) to be filled.
+
+        ## @var BranchLayouts
+        ## @brief Dictionary of the (type, shape) of the branches, indexed by
+        #  branch name (None for the unsupported ones).
+
+        ## @var PostFillActions
+        ## @brief The functions to be called after the histograms are filled.
+
+        ## @var Ranges
+        ## @brief Dictionary of the (minimum, maximum) of the tree variables
+        #  (see getRange()), indexed by variable name.
+
+        self.RootTree        = rootTree
+        self.NumEntries      = numEntries
+        self.BlockSize       = blockSize
+        self.Requests        = []
+        self.BranchLayouts   = {}
+        self.PostFillActions = []
+        self.Ranges          = {}
+
+    ## @brief Return the (numpy type, shape) of a branch, or None if the
+    #  branch can't be read into a fixed-size buffer.
+    ## @param self
+    #  The class instance.
+    ## @param branchName
+    #  The branch name.
+
+    def getBranchLayout(self, branchName):
+        try:
+            return self.BranchLayouts[branchName]
+        except KeyError:
+            layout = getBranchLayout(self.RootTree, branchName)
+            self.BranchLayouts[branchName] = layout
+            return layout
+
+    ## @brief Return the tuple (minimum, maximum) of a tree variable.
+    #
+    #  Same as TTree::GetMinimum() and TTree::GetMaximum(), but the branch is
+    #  read once (in blocks) for both and the result is cached, so that all
+    #  the plots using the same variable share a single read. Variables which
+    #  are not plain fixed-size branches are left to ROOT.
+    ## @param self
+    #  The class instance.
+    ## @param varName
+    #  The variable (i.e. leaf) name.
+
+    def getRange(self, varName):
+        try:
+            return self.Ranges[varName]
+        except KeyError:
+            pass
+        (minimum, maximum) = (None, None)
+        if self.getBranchLayout(varName) is not None:
+            reader = pTreeBlockReader(self.RootTree, [varName], self.BlockSize)
+            for (firstEntry, arrays) in reader.getBlocks():
+                array = arrays[varName]
+                if array.size == 0:
+                    continue
+                (blockMinimum, blockMaximum) = (array.min(), array.max())
+                if minimum is None or blockMinimum < minimum:
+                    minimum = blockMinimum
+                if maximum is None or blockMaximum > maximum:
+                    maximum = blockMaximum
+        if minimum is None:
+            (minimum, maximum) = (self.RootTree.GetMinimum(varName),\
+                                  self.RootTree.GetMaximum(varName))
+        self.Ranges[varName] = (float(minimum), float(maximum))
+        return self.Ranges[varName]
+
+    ## @brief Return whether a list of formulas can be evaluated.
+    #
+    #  The formulas are evaluated on empty arrays, so that unknown branches,
+    #  wrong indices and incompatible dimensions are all caught here.
+    ## @param self
+    #  The class instance.
+    ## @param formulas
+    #  The pTreeFormula objects.
+
+    def isSupported(self, formulas):
+        arrays = {}
+        for formula in formulas:
+            for branchName in formula.BranchNames:
+                layout = self.getBranchLayout(branchName)
+                if layout is None:
+                    return False
+                arrays[branchName] = numpy.zeros((0,) + layout[1], layout[0])
+        try:
+            broadcastInstances(*[numpy.atleast_1d(formula.evaluate(arrays))\
+                                 for formula in formulas])
+        except Exception, e:
+            logger.debug('%s' % e)
+            return False
+        return True
+
+    ## @brief Register a histogram to be filled.
+    #
+    #  If the expression or the cut are not supported the histogram is filled
+    #  immediately with TTree::Project().
+    ## @param self
+    #  The class instance.
+    ## @param histogram
+    #  The (empty) ROOT TH1 or TH2 object.
+    ## @param expression
+    #  The expression (in the TTree::Draw() format, e.g. "y:x" for a TH2).
+    ## @param cut
+    #  The cut (i.e. the weight).
+
+    def addHistogram(self, histogram, expression, cut = ''):
+        formulas = None
+        try:
+            formulas = [pTreeFormula(item) for item in\
+                        splitExpression(expression)]
+            if cut.strip() != '':
+                formulas.append(pTreeFormula(cut))
+            else:
+                formulas.append(None)
+        except RuntimeError, e:
+            logger.debug('%s' % e)
+            formulas = None
+        if formulas is None or len(formulas) not in [2, 3] or\
+           not self.isSupported([formula for formula in formulas if\
+                                 formula is not None]):
+            logger.debug('Projecting %s (%s, cut "%s").' %\
+                         (histogram.GetName(), expression, cut))
+            self.project(histogram, expression, cut)
+            return False
+        self.Requests.append((histogram, formulas[:-1], formulas[-1]))
+        return True
+
+    ## @brief Fill a histogram with TTree::Project().
+    ## @param self
+    #  The class instance.
+    ## @param histogram
+    #  The ROOT histogram.
+    ## @param expression
+    #  The expression.
+    ## @param cut
+    #  The cut.
+
+    def project(self, histogram, expression, cut):
+        numEntries = self.NumEntries
+        if numEntries < 0:
+            numEntries = 1000000000
+        self.RootTree.Project(histogram.GetName(), expression, cut, '',\
+                              numEntries)
+
+    ## @brief Register a function to be called once all the histograms are
+    #  filled.
+    ## @param self
+    #  The class instance.
+    ## @param action
+    #  The function (taking no arguments).
+
+    def addPostFillAction(self, action):
+        self.PostFillActions.append(action)
+
+    ## @brief Return the names of all the branches to be read.
+    ## @param self
+    #  The class instance.
+
+    def getBranchNames(self):
+        branchNames = []
+        for (histogram, formulas, cut) in self.Requests:
+            for formula in formulas + [cut]:
+                if formula is not None:
+                    for branchName in formula.BranchNames:
+                        if branchName not in branchNames:
+                            branchNames.append(branchName)
+        return branchNames
+
+    ## @brief Fill a histogram with a block of values.
+    ## @param self
+    #  The class instance.
+    ## @param histogram
+    #  The ROOT histogram.
+    ## @param values
+    #  The list of the arrays of values (y, x for a TH2).
+    ## @param weights
+    #  The array of the weights.
+
+    def fillHistogram(self, histogram, values, weights):
+        arrays = [numpy.ravel(array) for array in\
+                  broadcastInstances(*(values + [weights]))]
+        mask = arrays[-1] != 0
+        if not mask.all():
+            arrays = [array[mask] for array in arrays]
+        arrays = [numpy.ascontiguousarray(array, 'd') for array in arrays]
+        numValues = len(arrays[-1])
+        if numValues == 0:
+            return
+        if len(arrays) == 2:
+            histogram.FillN(numValues, arrays[0], arrays[1])
+        else:
+            histogram.FillN(numValues, arrays[1], arrays[0], arrays[2], 1)
+
+    ## @brief Read the tree and fill all the registered histograms.
+    ## @param self
+    #  The class instance.
+
+    def run(self):
+        if len(self.Requests):
+            startTime = time.time()
+            reader = pTreeBlockReader(self.RootTree, self.getBranchNames(),\
+                                      self.BlockSize)
+            logger.info('Filling %d histograms from %d branches...' %\
+                        (len(self.Requests), len(reader.BranchNames)))
+            numEntries = reader.getNumEntries(self.NumEntries)
+            for (firstEntry, arrays) in reader.getBlocks(numEntries):
+                self.fillBlock(arrays, min(self.BlockSize,\
+                                           numEntries - firstEntry))
+            logger.info('Done in %.2f s.' % (time.time() - startTime))
+        for action in self.PostFillActions:
+            action()
+        self.Requests = []
+        self.PostFillActions = []
+
+    ## @brief Fill all the histograms with a block of entries.
+    #
+    #  Each distinct expression (or cut) is evaluated once per block.
+    ## @param self
+    #  The class instance.
+    ## @param arrays
+    #  Dictionary of the branch arrays, indexed by branch name.
+    ## @param numEntries
+    #  The number of entries in the block.
+
+    def fillBlock(self, arrays, numEntries):
+        values = {}
+        def evaluate(formula):
+            if formula is None:
+                return numpy.ones(numEntries)
+            try:
+                return values[formula.Expression]
+            except KeyError:
+                value = formula.evaluate(arrays)
+                if value.ndim == 0:
+                    value = numpy.repeat(value, numEntries)
+                values[formula.Expression] = value
+                return value
+        for (histogram, formulas, cut) in self.Requests:
+            self.fillHistogram(histogram, [evaluate(formula) for formula in\
+                                           formulas], evaluate(cut))
@@ -110,3 +110,23 @@ class pOptionParser:
         self.Parser.add_option('-s', '--saa-def-file-path', dest = 's',
                                default = None, type = str,
                                help = 'path to the SAA definition file')
+
+    def add_j(self):
+        self.Parser.add_option('-j', '--num-jobs', dest = 'j',
+                               default = 1, type = int,
+                               help = 'number of parallel worker processes')
+
+    def add_P(self):
+        self.Parser.add_option('-P', '--profile', dest = 'P',
+                               default = False, action = 'store_true',
+                               help = 'profile the processing stages')
+
+    def add_g(self):
+        self.Parser.add_option('-g', '--geomag-grid-file-path', dest = 'g',
+                               default = None, type = str,
+                               help = 'path to the precomputed geomagnetic grid')
+
+    def add_M(self):
+        self.Parser.add_option('-M', '--magic7-cache-file', dest = 'M',
+                               default = None, type = str,
+                               help = 'path to the binary magic7 cache file')
@@ -41,9 +41,10 @@ class pRootDiffer:
             self.Canvas = ROOT.TCanvas('Diff', 'Diff', 1000, 600)
             self.Canvas.Divide(2, 1)
             self.Canvas.Update()
+        secondPlotsDict = self.SecondFileManager.getPlotsDict()
         for (name, first) in self.FirstFileManager.getPlotsDict().items():
-            if name in self.SecondFileManager.getPlotsDict().keys():
-                second = self.SecondFileManager.getPlotsDict()[name]
+            if name in secondPlotsDict:
+                second = secondPlotsDict[name]
                 logger.debug('Comparing %s...' % name)
                 pair = pHistogramPair(firstHisto = first, secondHisto = second)
                 pair.compare()
@@ -6,6 +6,7 @@ logger = pSafeLogger.getLogger('pRootFileManager')
 
 import sys
 import os
+import re
 import time
 
 from pSafeROOT import ROOT
@@ -14,6 +15,38 @@ from pSafeROOT import ROOT
 
 TREE_BRANCH_SEPARATOR = '::'
 
+## @brief Regular expression matching the numbers within the object names.
+
+NUMBER_REGEX = re.compile('\d+')
+
+
+## @brief Return the template of an object name, i.e. the name with all the
+#  numbers replaced by a placeholder (e.g. 'CalXAdcPed_#_#' for
+#  'CalXAdcPed_3_12').
+## @param name
+#  The object name.
+
+def getNameTemplate(name):
+    return NUMBER_REGEX.sub('#', name)
+
+## @brief Return the template of a name pattern, i.e. the template (see
+#  getNameTemplate()) of all the names differing from the pattern by
+#  numbers only.
+## @param pattern
+#  The pattern (with wildcards).
+
+def getPatternTemplate(pattern):
+    return getNameTemplate(pattern.replace('*', '0'))
+
+## @brief Return the regular expression matching the names which differ from
+#  a pattern by numbers only.
+## @param pattern
+#  The pattern (with wildcards).
+
+def getPatternRegex(pattern):
+    return re.compile('^%s$' % '\d+'.join([re.escape(piece) for piece in\
+                                           pattern.split('*')]))
+
 ## @brief Class for ROOT file handling.
 
 class pRootFileManager:
@@ -28,8 +61,21 @@ class pRootFileManager:
 
         ## @var RootFile
         ## @brief The underlying ROOT file.
+
+        ## @var KeyIndex
+        ## @brief The index of the keys of the ROOT file: a dictionary of
+        #  lists of (key position, key name), indexed by name template (see
+        #  getNameTemplate()). Built the first time it's needed.
+
+        ## @var KeyNames
+        ## @brief The list of the key names (in the file order).
+
+        ## @var ObjectsCache
+        ## @brief Dictionary of the objects already retrieved, indexed by
+        #  (method, name).
         
         self.RootFile = None
+        self.resetIndex()
         if rootFilePath is not None:
             self.openFile(rootFilePath)
 
@@ -43,6 +89,7 @@ class pRootFileManager:
         logger.info('Opening file %s...' % rootFilePath)
         if not os.path.exists(rootFilePath):
             sys.exit('File %s does not exist.' % rootFilePath)
+        self.resetIndex()
         self.RootFile = ROOT.TFile(rootFilePath)
         if self.RootFile.GetFd() == -1:
             sys.exit('Could not open file %s.' % rootFilePath)
@@ -58,8 +105,78 @@ class pRootFileManager:
         if self.RootFile is not None:
             self.RootFile.Close()
             self.RootFile = None
+        self.resetIndex()
         logger.info('Done.')
 
+    ## @brief Reset the key index and the objects cache.
+    ## @param self
+    #  The class instance.
+
+    def resetIndex(self):
+        self.KeyIndex = None
+        self.KeyNames = None
+        self.ObjectsCache = {}
+
+    ## @brief Build the index of the keys of the ROOT file, reading the list
+    #  of keys once.
+    ## @param self
+    #  The class instance.
+
+    def buildIndex(self):
+        startTime = time.time()
+        self.KeyIndex = {}
+        self.KeyNames = []
+        for key in self.RootFile.GetListOfKeys():
+            name = key.GetName()
+            position = len(self.KeyNames)
+            self.KeyNames.append(name)
+            try:
+                self.KeyIndex[getNameTemplate(name)].append((position, name))
+            except KeyError:
+                self.KeyIndex[getNameTemplate(name)] = [(position, name)]
+        logger.debug('%d keys (%d templates) indexed in %.3f s.' %\
+                     (len(self.KeyNames), len(self.KeyIndex),\
+                      time.time() - startTime))
+
+    ## @brief Return the list of the key names of the ROOT file (in the
+    #  file order).
+    ## @param self
+    #  The class instance.
+
+    def getKeyNames(self):
+        if self.KeyNames is None:
+            self.buildIndex()
+        return self.KeyNames
+
+    ## @brief Return the list of (key position, key name) of the ROOT file
+    #  sharing a given name template.
+    ## @param self
+    #  The class instance.
+    ## @param template
+    #  The template.
+
+    def getIndexedKeys(self, template):
+        if self.KeyIndex is None:
+            self.buildIndex()
+        return self.KeyIndex.get(template, [])
+
+    ## @brief Return the object found by a given method of the ROOT file
+    #  (i.e. 'Get' or 'FindObjectAny'), caching the result.
+    ## @param self
+    #  The class instance.
+    ## @param method
+    #  The name of the TFile method.
+    ## @param name
+    #  The object name.
+
+    def getCachedObject(self, method, name):
+        try:
+            return self.ObjectsCache[(method, name)]
+        except KeyError:
+            obj = getattr(self.RootFile, method)(name)
+            self.ObjectsCache[(method, name)] = obj
+            return obj
+
     ## @brief Get a ROOT object from the ROOT File (by object name).
     ## @param self
     #  The class instance.
@@ -68,17 +185,20 @@ class pRootFileManager:
 
     def get(self, name):
         try:
-            return self.RootFile.Get(name)
+            return self.getCachedObject('Get', name)
         except:
             logger.error('Could not find %s in ROOT file %s.' %\
                          (name, self.RootFile.GetName()))
             return None
 
+    ## @brief Return a dictionary of all the objects in the ROOT file,
+    #  indexed by name.
+    ## @param self
+    #  The class instance.
+
     def getPlotsDict(self):
         plotsDict = {}
-        keys = self.RootFile.GetListOfKeys()
-        for key in keys:
-            plotName = key.GetName()
+        for plotName in self.getKeyNames():
             plotsDict[plotName] = self.get(plotName)
         return plotsDict
 
@@ -124,7 +244,7 @@ class pRootFileManager:
             return self.findTreeBranches(pattern)
         else:
             if '*' not in pattern:
-                obj = self.RootFile.FindObjectAny(pattern)
+                obj = self.getCachedObject('FindObjectAny', pattern)
                 if obj is not None:
                     return [obj]
                 else:
@@ -134,18 +254,28 @@ class pRootFileManager:
 
     ## @brief Find ROOT objects whose name matches a certain pattern in a
     #  ROOT file.
+    #
+    #  Only the keys sharing the pattern template (see getPatternTemplate())
+    #  are looked at, through the key index. The objects are returned in the
+    #  order of the keys in the file.
     ## @param self
     #  The class instance
     ## @param pattern
     #  The name pattern.
 
     def findObjects(self, pattern, selection):
-        objects = []
-        for i in range(self.RootFile.GetListOfKeys().LastIndex() + 1):
-	    key = self.RootFile.GetListOfKeys().At(i).GetName()
-            if key == pattern or self.__match(key, pattern, selection):
-                objects.append(self.RootFile.FindObjectAny(key))
-        return objects
+        regex = getPatternRegex(pattern)
+        matches = []
+        for (position, key) in self.getIndexedKeys(getPatternTemplate(pattern)):
+            if regex.match(key) and self.__match(key, pattern, selection):
+                matches.append(position)
+        for (position, key) in self.getIndexedKeys(getNameTemplate(pattern)):
+            if key == pattern:
+                matches.append(position)
+        matches.sort()
+        keyNames = self.getKeyNames()
+        return [self.getCachedObject('FindObjectAny', keyNames[position])\
+                for position in matches]
 
     ## @brief Find ROOT branches whose name matches a certain pattern in a
     #  ROOT file.
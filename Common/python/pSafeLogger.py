@@ -20,3 +20,5 @@ if 'logging' not in sys.modules:
     import logging
     setLevel()
     logger = logging.getLogger('pSafeLogger')
+else:
+    import logging
@@ -6,7 +6,8 @@ import numpy
 import array
 import time
 
-from pXmlPlotRep import pXmlTH2FRep
+from pXmlPlotRep      import pXmlTH2FRep
+from pTreeBlockReader import pTreeBlockReader
 
 from pSafeROOT import ROOT
 
@@ -26,6 +27,19 @@ def getCanvasCoordinates(l, b):
     y  = kPiDeg*math.sin(b)/(2.0*d)
     return (x, y)
 
+# Same as getCanvasCoordinates(), for arrays of points.
+
+def getCanvasCoordinatesArrays(l, b):
+    l = numpy.asarray(l, 'd')
+    b = numpy.asarray(b, 'd')
+    l = numpy.where(l > 180, l - 360, l)
+    b = b/kRadToDeg
+    l = l/(2*kRadToDeg)
+    d = numpy.sqrt(1.0 + numpy.cos(b)*numpy.cos(l))
+    x = kPiDeg*numpy.sin(l)*numpy.cos(b)/d
+    y = kPiDeg*numpy.sin(b)/(2.0*d)
+    return (x, y)
+
 
 class pSkyMapGrid:
 
@@ -68,7 +82,8 @@ class pSkyMapGrid:
             self.PolyLineY[i].Draw()
 
 
-## Can be faster by setting addresses!!!
+## The branches are read in bulk (see pTreeBlockReader) and the
+#  coordinates transformed and filled as whole arrays.
 
 class pXmlSkyMapRep(pXmlTH2FRep):
 
@@ -76,21 +91,25 @@ class pXmlSkyMapRep(pXmlTH2FRep):
         pXmlTH2FRep.__init__(self, element)
         self.SkyMapGrid = pSkyMapGrid()
 
-    def createRootObject(self, rootTree, numEntries):
+    def createRootObject(self, rootTree, numEntries, filler = None):
         startTime = time.time()
         logger.debug('Creating SkyMap %s' % self.Name)
         self.RootObject = ROOT.TH2F(self.Name, self.Title, self.NumXBins,\
                                     self.XMin, self.XMax, self.NumYBins,\
                                     self.YMin, self.YMax)
         self.formatAxes()
-        (varX, varY) = self.Expression.split(':')
-        if numEntries < 0:
-            numEntries = rootTree.GetEntriesFast()
-        for i in range(numEntries):
-            rootTree.GetEntry(i)
-            (x, y) = getCanvasCoordinates(eval('rootTree.%s' % varX),\
-                                          eval('rootTree.%s' % varY))
-            self.RootObject.Fill(x, y)
+        (varX, varY) = [var.strip() for var in self.Expression.split(':')]
+        try:
+            arrays = pTreeBlockReader(rootTree, [varX, varY]).\
+                     readArrays(numEntries)
+        except RuntimeError, e:
+            logger.error('Cannot create %s (%s).' % (self.Name, e))
+            return None
+        (x, y) = getCanvasCoordinatesArrays(arrays[varX], arrays[varY])
+        if len(x):
+            self.RootObject.FillN(len(x), numpy.ascontiguousarray(x),\
+                                  numpy.ascontiguousarray(y),\
+                                  numpy.ones(len(x)), 1)
         logger.debug('Done in %.2f s.' % (time.time() - startTime))
 
     def draw(self, rootObject):
@@ -12,9 +12,10 @@ class pXmlTimeSeriesRep(pXmlTGraphRep):
     def __init__(self, element):
         pXmlTGraphRep.__init__(self, element)
 
-    def addPoint(self, i):
-        x = (self.ArrayX[0] - self.FirstValueX)/86400.
-        self.RootObject.SetPoint(i, x, self.ArrayY[0])
+    def getPoints(self, arrayX, arrayY):
+        if not len(arrayX):
+            return (arrayX, arrayY)
+        return ((arrayX - arrayX[0])/86400., arrayY)
 
         
 
@@ -0,0 +1,221 @@
+## @package pTreeBlockReader
+## @brief Bulk reading of ROOT tree branches into numpy arrays.
+#
+#  The branches are read, in blocks of entries, into a single event buffer
+#  (the branch addresses are views into it) which is copied into a 2-d block
+#  after each entry, all in compiled code when possible. Only fixed-size
+#  branches with a single leaf of basic type can be read this way.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pTreeBlockReader')
+
+import re
+import numpy
+import pGlobals
+
+from pSafeROOT import ROOT
+
+
+## @brief C++ helper reading a block of entries.
+#
+#  Each entry is read into the buffer the branches point to and copied into
+#  the block, all in compiled code.
+
+READ_BLOCK_CODE = '''
+void pTreeBlockReaderReadBlock(TTree* tree, void* eventBuffer, void* block,
+                               Long64_t firstEntry, Long64_t numEntries,
+                               Long64_t eventSize)
+{
+  for (Long64_t i = 0; i < numEntries; i++) {
+    tree->GetEntry(firstEntry + i);
+    memcpy((char*)block + i*eventSize, eventBuffer, eventSize);
+  }
+}
+'''
+
+## @brief Map between the ROOT leaf types and the numpy types.
+
+ROOT_TO_NUMPY_TYPE_MAP = {'Char_t'   : 'int8',
+                          'UChar_t'  : 'uint8',
+                          'Short_t'  : 'int16',
+                          'UShort_t' : 'uint16',
+                          'Int_t'    : 'int32',
+                          'UInt_t'   : 'uint32',
+                          'Float_t'  : 'float32',
+                          'Double_t' : 'float64',
+                          'Long64_t' : 'int64',
+                          'ULong64_t': 'uint64',
+                          'Bool_t'   : 'bool'
+                          }
+
+## @brief Alignment (in bytes) of the branches in the event buffer.
+
+EVENT_BUFFER_ALIGNMENT = 8
+
+
+## @brief Return the (numpy type, shape) of a branch, or None if the
+#  branch can't be read into a fixed-size buffer.
+## @param rootTree
+#  The ROOT tree.
+## @param branchName
+#  The branch name.
+
+def getBranchLayout(rootTree, branchName):
+    branch = rootTree.GetBranch(branchName)
+    if not branch or branch.ClassName() != 'TBranch':
+        return None
+    leaves = branch.GetListOfLeaves()
+    if leaves.GetEntries() != 1:
+        return None
+    leaf = leaves.At(0)
+    if leaf.GetLeafCount() or leaf.GetTypeName() not in ROOT_TO_NUMPY_TYPE_MAP:
+        return None
+    shape = tuple([int(dimension) for dimension in\
+                   re.findall('\[(\d+)\]', leaf.GetTitle())])
+    return (ROOT_TO_NUMPY_TYPE_MAP[leaf.GetTypeName()], shape)
+
+
+## @brief Implementation of the block reader.
+
+class pTreeBlockReader:
+
+    ## @brief Constructor.
+    #
+    #  A RuntimeError is raised if any of the branches can't be read.
+    ## @param self
+    #  The class instance.
+    ## @param rootTree
+    #  The ROOT tree.
+    ## @param branchNames
+    #  The names of the branches to be read.
+    ## @param blockSize
+    #  The number of entries read at a time.
+
+    def __init__(self, rootTree, branchNames,
+                 blockSize = pGlobals.ROOT_READ_BLOCK_SIZE):
+
+        ## @var RootTree
+        ## @brief The ROOT tree.
+
+        ## @var BranchNames
+        ## @brief The names of the branches to be read.
+
+        ## @var BranchLayouts
+        ## @brief Dictionary of the (type, shape) of the branches, indexed by
+        #  branch name.
+
+        ## @var BlockSize
+        ## @brief The number of entries read at a time.
+
+        self.RootTree      = rootTree
+        self.BranchNames   = list(branchNames)
+        self.BranchLayouts = {}
+        self.BlockSize     = blockSize
+        for branchName in self.BranchNames:
+            layout = getBranchLayout(rootTree, branchName)
+            if layout is None:
+                raise RuntimeError, 'Cannot read branch %s.' % branchName
+            self.BranchLayouts[branchName] = layout
+
+    ## @brief Return the number of entries to be read.
+    ## @param self
+    #  The class instance.
+    ## @param numEntries
+    #  The maximum number of entries (all if negative).
+
+    def getNumEntries(self, numEntries = -1):
+        numTreeEntries = int(self.RootTree.GetEntries())
+        if numEntries < 0:
+            return numTreeEntries
+        return min(numEntries, numTreeEntries)
+
+    ## @brief Return the function reading a block of entries.
+    #
+    #  The compiled helper is used when the ROOT interpreter can compile it,
+    #  otherwise the entries are read from python.
+    ## @param self
+    #  The class instance.
+    ## @param eventBuffer
+    #  The (uint8) buffer the branches point to.
+
+    def getBlockReader(self, eventBuffer):
+        def readBlock(block, firstEntry, numEntries):
+            for i in xrange(numEntries):
+                self.RootTree.GetEntry(firstEntry + i)
+                block[i] = eventBuffer
+        try:
+            if not hasattr(ROOT, 'pTreeBlockReaderReadBlock'):
+                ROOT.gInterpreter.Declare(READ_BLOCK_CODE)
+            readBlockCompiled = ROOT.pTreeBlockReaderReadBlock
+        except:
+            return readBlock
+        return lambda block, firstEntry, numEntries:\
+               readBlockCompiled(self.RootTree, eventBuffer, block,\
+                                 firstEntry, numEntries, len(eventBuffer))
+
+    ## @brief Iterate over the blocks of entries.
+    #
+    #  Yield the tuples (firstEntry, arrays), arrays being a dictionary of
+    #  the branch arrays (of shape (n,) + the branch shape) indexed by branch
+    #  name. The arrays are views into a block which is overwritten at
+    #  each iteration. Only the branches to be read are enabled while
+    #  reading.
+    ## @param self
+    #  The class instance.
+    ## @param numEntries
+    #  The number of entries to be read (all if negative).
+
+    def getBlocks(self, numEntries = -1):
+        numEntries = self.getNumEntries(numEntries)
+        offsets = []
+        size = 0
+        for branchName in self.BranchNames:
+            (dtype, shape) = self.BranchLayouts[branchName]
+            offsets.append(size)
+            size += numpy.zeros(shape, dtype).nbytes
+            size += -size % EVENT_BUFFER_ALIGNMENT
+        eventBuffer = numpy.zeros(max(size, EVENT_BUFFER_ALIGNMENT), 'uint8')
+        block = numpy.zeros((self.BlockSize, len(eventBuffer)), 'uint8')
+        views = {}
+        self.RootTree.SetBranchStatus('*', 0)
+        try:
+            for (branchName, offset) in zip(self.BranchNames, offsets):
+                (dtype, shape) = self.BranchLayouts[branchName]
+                view = numpy.ndarray(shape, dtype, eventBuffer, offset)
+                self.RootTree.SetBranchStatus(branchName, 1)
+                self.RootTree.SetBranchAddress(branchName, view)
+                views[branchName] = numpy.ndarray((self.BlockSize,) + shape,\
+                                                  dtype, block, offset,\
+                                                  (len(eventBuffer),) +\
+                                                  view.strides)
+            readBlock = self.getBlockReader(eventBuffer)
+            for firstEntry in xrange(0, numEntries, self.BlockSize):
+                numBlockEntries = min(self.BlockSize, numEntries - firstEntry)
+                readBlock(block, firstEntry, numBlockEntries)
+                arrays = {}
+                for (branchName, view) in views.items():
+                    arrays[branchName] = view[:numBlockEntries]
+                yield (firstEntry, arrays)
+        finally:
+            self.RootTree.ResetBranchAddresses()
+            self.RootTree.SetBranchStatus('*', 1)
+
+    ## @brief Read the branches in one go.
+    #
+    #  Return a dictionary of the branch arrays (of shape (n,) + the branch
+    #  shape), indexed by branch name.
+    ## @param self
+    #  The class instance.
+    ## @param numEntries
+    #  The number of entries to be read (all if negative).
+
+    def readArrays(self, numEntries = -1):
+        numEntries = self.getNumEntries(numEntries)
+        arrays = {}
+        for branchName in self.BranchNames:
+            (dtype, shape) = self.BranchLayouts[branchName]
+            arrays[branchName] = numpy.zeros((numEntries,) + shape, dtype)
+        for (firstEntry, blockArrays) in self.getBlocks(numEntries):
+            for (branchName, array) in blockArrays.items():
+                arrays[branchName][firstEntry:firstEntry + len(array)] = array
+        return arrays
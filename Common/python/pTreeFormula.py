@@ -0,0 +1,275 @@
+## @package pTreeFormula
+## @brief Evaluation of (simple) ROOT tree formulas on numpy arrays.
+#
+#  A subset of the TTreeFormula syntax is supported: numbers, branch names
+#  (optionally with constant indices, e.g. tkr_layer_hit_count[3][12]),
+#  parentheses and the C operators (+ - * / % == != < <= > >= && || ! & | ~
+#  << >>) with the C precedence. The evaluation follows the TTreeFormula
+#  conventions (everything is a double, the bitwise operators work on
+#  Long64_t, a division by zero yields zero, non-fully indexed arrays
+#  give multiple instances per entry), so that filling a histogram
+#  with the result is equivalent to TTree::Project(). Anything else (functions,
+#  aliases, variable-size arrays...) raises a RuntimeError, so that the
+#  caller can fall back to ROOT.
+
+import re
+import numpy
+
+
+## @brief Regular expression for the tokens: numbers, names and operators.
+
+TOKEN_REGEX = re.compile(r'\s*(?:'
+                         r'(?P<number>0[xX][0-9a-fA-F]+|'
+                         r'(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)|'
+                         r'(?P<name>[A-Za-z_][A-Za-z0-9_]*)|'
+                         r'(?P<operator>\|\||&&|==|!=|<=|>=|<<|>>|'
+                         r'[-+*/%()\[\]<>!~&|]))')
+
+## @brief Precedence of the binary operators (the higher, the tighter).
+
+BINARY_OPERATORS = {'||': 1,
+                    '&&': 2,
+                    '|' : 3,
+                    '&' : 4,
+                    '==': 5, '!=': 5,
+                    '<' : 6, '<=': 6, '>': 6, '>=': 6,
+                    '<<': 7, '>>': 7,
+                    '+' : 8, '-' : 8,
+                    '*' : 9, '/' : 9, '%': 9
+                    }
+
+UNARY_OPERATORS = ['-', '+', '!', '~']
+
+
+## @brief Split a formula into tokens.
+## @param expression
+#  The formula.
+
+def tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_REGEX.match(expression, position)
+        if match is None:
+            raise RuntimeError, 'Cannot parse "%s".' % expression[position:]
+        for kind in ['number', 'name', 'operator']:
+            if match.group(kind) is not None:
+                tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+## @brief Split a TTree::Draw() expression into its components (i.e. "y:x"
+#  into ["y", "x"]).
+## @param expression
+#  The expression.
+
+def splitExpression(expression):
+    return [item.strip() for item in expression.split(':')]
+
+## @brief Broadcast arrays of shape (n,) (one instance per entry) or
+#  (n, ...) (multiple instances per entry) against each other.
+#
+#  Arrays with multiple instances must have the same shape.
+## @param arrays
+#  The arrays.
+
+def broadcastInstances(*arrays):
+    shape = ()
+    for array in arrays:
+        if array.ndim > 1:
+            if shape != () and array.shape[1:] != shape:
+                raise RuntimeError, 'Arrays with different dimensions (%s, %s).'\
+                      % (shape, array.shape[1:])
+            shape = array.shape[1:]
+    if shape == ():
+        return arrays
+    padding = (1,)*len(shape)
+    return numpy.broadcast_arrays(*[array.reshape(array.shape + padding)\
+                                    if array.ndim == 1 else array\
+                                    for array in arrays])
+
+## @brief Convert a double to the Long64_t used by the bitwise operators.
+
+def toLong(array):
+    return array.astype('int64')
+
+
+## @brief Implementation of a formula.
+
+class pTreeFormula:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param expression
+    #  The formula.
+
+    def __init__(self, expression):
+
+        ## @var Expression
+        ## @brief The formula.
+
+        ## @var BranchNames
+        ## @brief The list of the names of the branches the formula reads.
+
+        ## @var Tree
+        ## @brief The parsed formula, as nested tuples.
+
+        self.Expression = expression
+        self.BranchNames = []
+        self.Tokens = tokenize(expression)
+        self.Position = 0
+        if not len(self.Tokens):
+            raise RuntimeError, 'Empty formula.'
+        self.Tree = self.parseExpression(0)
+        if self.Position != len(self.Tokens):
+            raise RuntimeError, 'Unexpected "%s" in "%s".' %\
+                  (self.Tokens[self.Position][1], expression)
+
+    def peek(self):
+        try:
+            return self.Tokens[self.Position]
+        except IndexError:
+            return (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise RuntimeError, 'Unexpected end of "%s".' % self.Expression
+        self.Position += 1
+        return token
+
+    def expect(self, value):
+        if self.next()[1] != value:
+            raise RuntimeError, '"%s" expected in "%s".' %\
+                  (value, self.Expression)
+
+    ## @brief Parse a (sub)expression with binary operators binding at least
+    #  as tight as minPrecedence.
+
+    def parseExpression(self, minPrecedence):
+        node = self.parseUnary()
+        while True:
+            (kind, value) = self.peek()
+            if kind != 'operator' or value not in BINARY_OPERATORS or\
+               BINARY_OPERATORS[value] < minPrecedence:
+                return node
+            self.next()
+            right = self.parseExpression(BINARY_OPERATORS[value] + 1)
+            node = ('binary', value, node, right)
+
+    def parseUnary(self):
+        (kind, value) = self.peek()
+        if kind == 'operator' and value in UNARY_OPERATORS:
+            self.next()
+            return ('unary', value, self.parseUnary())
+        return self.parsePrimary()
+
+    def parsePrimary(self):
+        (kind, value) = self.next()
+        if kind == 'number':
+            if value.lower().startswith('0x'):
+                return ('number', float(int(value, 16)))
+            return ('number', float(value))
+        if kind == 'name':
+            if self.peek()[1] == '(':
+                raise RuntimeError, 'Function %s() not supported.' % value
+            indices = []
+            while self.peek()[1] == '[':
+                self.next()
+                (indexKind, index) = self.next()
+                if indexKind != 'number' or not index.isdigit():
+                    raise RuntimeError, 'Non constant index in "%s".' %\
+                          self.Expression
+                indices.append(int(index))
+                self.expect(']')
+            if value not in self.BranchNames:
+                self.BranchNames.append(value)
+            return ('branch', value, tuple(indices))
+        if value == '(':
+            node = self.parseExpression(0)
+            self.expect(')')
+            return node
+        raise RuntimeError, 'Unexpected "%s" in "%s".' % (value, self.Expression)
+
+    ## @brief Evaluate the formula.
+    #
+    #  Return an array of doubles of shape (n,), or (n, ...) for formulas
+    #  with multiple instances per entry.
+    ## @param self
+    #  The class instance.
+    ## @param arrays
+    #  Dictionary of the branch arrays (of shape (n,) + the branch shape),
+    #  indexed by branch name.
+
+    def evaluate(self, arrays):
+        return self.evaluateNode(self.Tree, arrays)
+
+    def evaluateNode(self, node, arrays):
+        if node[0] == 'number':
+            return numpy.array(node[1])
+        if node[0] == 'branch':
+            array = arrays[node[1]]
+            if len(node[2]) > array.ndim - 1:
+                raise RuntimeError, 'Too many indices for %s.' % node[1]
+            for (dimension, index) in enumerate(node[2]):
+                if index >= array.shape[dimension + 1]:
+                    raise RuntimeError, 'Index out of range for %s.' % node[1]
+            return numpy.asarray(array[(slice(None),) + node[2]], 'd')
+        if node[0] == 'unary':
+            value = self.evaluateNode(node[2], arrays)
+            if node[1] == '-':
+                return -value
+            if node[1] == '+':
+                return value
+            if node[1] == '!':
+                return (value == 0).astype('d')
+            return (~toLong(value)).astype('d')
+        left = self.evaluateNode(node[2], arrays)
+        right = self.evaluateNode(node[3], arrays)
+        if left.ndim and right.ndim:
+            (left, right) = broadcastInstances(left, right)
+        operator = node[1]
+        if operator == '+':
+            return left + right
+        if operator == '-':
+            return left - right
+        if operator == '*':
+            return left*right
+        if operator == '/':
+            zero = (right == 0)
+            return numpy.where(zero, 0., left/numpy.where(zero, 1., right))
+        if operator == '%':
+            right = toLong(right)
+            zero = (right == 0)
+            return numpy.where(zero, 0, numpy.fmod(toLong(left),\
+                               numpy.where(zero, 1, right))).astype('d')
+        if operator == '&':
+            return (toLong(left) & toLong(right)).astype('d')
+        if operator == '|':
+            return (toLong(left) | toLong(right)).astype('d')
+        if operator == '<<':
+            return (toLong(left) << toLong(right)).astype('d')
+        if operator == '>>':
+            return (toLong(left) >> toLong(right)).astype('d')
+        if operator == '&&':
+            return ((left != 0) & (right != 0)).astype('d')
+        if operator == '||':
+            return ((left != 0) | (right != 0)).astype('d')
+        if operator == '==':
+            return (left == right).astype('d')
+        if operator == '!=':
+            return (left != right).astype('d')
+        if operator == '<':
+            return (left < right).astype('d')
+        if operator == '<=':
+            return (left <= right).astype('d')
+        if operator == '>':
+            return (left > right).astype('d')
+        if operator == '>=':
+            return (left >= right).astype('d')
+        raise RuntimeError, 'Unknown operator %s.' % operator
+
+    def __str__(self):
+        return self.Expression
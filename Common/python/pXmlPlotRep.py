@@ -2,11 +2,12 @@
 import pSafeLogger
 logger = pSafeLogger.getLogger('pXmlPlotRep')
 
-import array
+import numpy
 
-from pXmlElement  import pXmlElement
-from pXmlList     import pXmlList
-from pSafeROOT    import ROOT
+from pXmlElement      import pXmlElement
+from pXmlList         import pXmlList
+from pTreeBlockReader import pTreeBlockReader
+from pSafeROOT        import ROOT
 
 
 class pXmlBasePlotRep(pXmlElement):
@@ -49,7 +50,13 @@ class pXmlBasePlotRep(pXmlElement):
                          branchName)
             return None
 
-    def projectTree(self, rootTree, numEntries):
+    # If a pMultiHistogramFiller is given the histogram is just registered
+    # with it, and filled along with all the others in one pass.
+
+    def projectTree(self, rootTree, numEntries, filler = None):
+        if filler is not None:
+            filler.addHistogram(self.RootObject, self.Expression, self.Cut)
+            return
         if numEntries < 0:
             numEntries = 1000000000
         rootTree.Project(self.Name, self.Expression, self.Cut, '', numEntries)
@@ -69,12 +76,12 @@ class pXmlTH1FRep(pXmlBasePlotRep):
         if self.YLabel == '':
             self.YLabel = 'entries/bin'
 
-    def createRootObject(self, rootTree, numEntries):
+    def createRootObject(self, rootTree, numEntries, filler = None):
         logger.debug('Creating TH1F %s' % self.Name)
         self.RootObject = ROOT.TH1F(self.Name, self.Title, self.NumXBins,\
                                     self.XMin, self.XMax)
         self.formatAxes()
-        self.projectTree(rootTree, numEntries)
+        self.projectTree(rootTree, numEntries, filler)
 
 
 class pXmlTGraphRep(pXmlBasePlotRep):
@@ -89,30 +96,40 @@ class pXmlTGraphRep(pXmlBasePlotRep):
         if self.YLabel == '':
             self.YLabel = yExpression
 
-    def addPoint(self, i):
-        self.RootObject.SetPoint(i, self.ArrayX[0], self.ArrayY[0])
+    # Return the arrays of the graph points, given the arrays of the branch
+    # values (meant to be overloaded by the subclasses transforming the
+    # values).
+
+    def getPoints(self, arrayX, arrayY):
+        return (arrayX, arrayY)
+
+    def readBranches(self, rootTree, branchNames, numEntries):
+        try:
+            return pTreeBlockReader(rootTree, branchNames).readArrays(numEntries)
+        except RuntimeError, e:
+            logger.error('%s' % e)
+            return None
 
-    def createRootObject(self, rootTree, numEntries):
+    def createRootObject(self, rootTree, numEntries, filler = None):
         logger.debug('Creating TGraph %s' % self.Name)
         (xBranchName, yBranchName) = self.Expression.split(':')
-        xBranchType = self.getBranchType(rootTree, xBranchName)
-        yBranchType = self.getBranchType(rootTree, yBranchName)
-        if (xBranchType is None) or (yBranchType is None):
+        arrays = self.readBranches(rootTree, [xBranchName, yBranchName],\
+                                   numEntries)
+        if arrays is None:
             logger.error('Cannot create %s.' % self.Name)
             return None
-        self.ArrayX = array.array(xBranchType, [0])
-        self.ArrayY = array.array(yBranchType, [0])
-        rootTree.SetBranchAddress(xBranchName, self.ArrayX)
-        rootTree.SetBranchAddress(yBranchName, self.ArrayY)
-        rootTree.GetEntry(0)
-        self.FirstValueX = self.ArrayX[0]
-        if numEntries < 0:
-            numEntries = rootTree.GetEntriesFast()
-        self.RootObject = ROOT.TGraph(numEntries)
+        arrayX = numpy.asarray(arrays[xBranchName], 'd')
+        arrayY = numpy.asarray(arrays[yBranchName], 'd')
+        if len(arrayX):
+            self.FirstValueX = arrayX[0]
+        (x, y) = self.getPoints(arrayX, arrayY)
+        x = numpy.ascontiguousarray(x, 'd')
+        y = numpy.ascontiguousarray(y, 'd')
+        if len(x):
+            self.RootObject = ROOT.TGraph(len(x), x, y)
+        else:
+            self.RootObject = ROOT.TGraph()
         self.RootObject.SetNameTitle(self.Name, self.Title)
-        for i in xrange(numEntries):
-            rootTree.GetEntry(i)
-            self.addPoint(i)
         self.formatAxes()
         ROOT.gDirectory.Add(self.RootObject)
 
@@ -135,14 +152,14 @@ class pXmlTH2FRep(pXmlTH1FRep):
         if self.YLabel == '':
             self.YLabel = yExpression
 
-    def createRootObject(self, rootTree, numEntries):
+    def createRootObject(self, rootTree, numEntries, filler = None):
         logger.debug('Creating TH2F %s' % self.Name)
         self.RootObject = ROOT.TH2F(self.Name, self.Title, self.NumXBins,\
                                     self.XMin, self.XMax, self.NumYBins,\
                                     self.YMin, self.YMax)
         self.formatAxes()
         self.formatMarker()
-        self.projectTree(rootTree, numEntries)
+        self.projectTree(rootTree, numEntries, filler)
 
     def formatMarker(self):
         if self.MarkerColor is not None:
@@ -169,7 +186,7 @@ class pXmlTH3FRep(pXmlTH2FRep):
         if self.ZLabel == '':
             self.ZLabel = zExpression
 
-    def createRootObject(self, rootTree, numEntries):
+    def createRootObject(self, rootTree, numEntries, filler = None):
         logger.debug('Creating TH3F %s' % self.Name)
         self.RootObject = ROOT.TH3F(self.Name, self.Title, self.NumXBins,\
                                     self.XMin, self.XMax, self.NumYBins,\
@@ -177,4 +194,4 @@ class pXmlTH3FRep(pXmlTH2FRep):
                                     self.ZMin, self.ZMax)
         self.formatAxes()
         self.formatMarker()
-        self.projectTree(rootTree, numEntries)
+        self.projectTree(rootTree, numEntries, filler)
@@ -0,0 +1,238 @@
+import sys
+import types
+import unittest
+import numpy
+
+try:
+    import pSafeROOT
+except ImportError:
+    # The histograms below are fakes, ROOT is only needed for TH1.kNormal.
+    fakeModule = types.ModuleType('pSafeROOT')
+    fakeModule.ROOT = types.ModuleType('ROOT')
+    sys.modules['pSafeROOT'] = fakeModule
+
+import pAlarmBaseAlgorithm as algorithmModule
+from pAlarmBaseAlgorithm import pAlarmBaseAlgorithm, getBinContents,\
+     getBinErrors, getNeighbouringAverages
+from pAlarmLimits import pAlarmLimits
+
+
+# Stand-ins for the ROOT histogram classes, storing the contents (and the
+# sum of the squares of the weights) in the ROOT global bin layout, i.e.
+# bin = i + (nx + 2)*j, and exposing them through both the bin by bin
+# interface and the TArray buffers.
+
+class FakeArray(bytearray):
+
+    def SetSize(self, size):
+        pass
+
+    def GetArray(self):
+        return self
+
+
+class FakeClass:
+
+    def __init__(self, name):
+        self.Name = name
+
+    def GetName(self):
+        return self.Name
+
+
+class FakeHistogram:
+
+    def __init__(self, className, contents, sumw2 = None, buffered = True):
+        dtype = algorithmModule.ROOT2NUMPYDICT[className[-1]]
+        self.ClassName = className
+        self.Shape = contents.shape
+        self.Contents = numpy.ascontiguousarray(contents.T, dtype).ravel()
+        self.Sumw2 = sumw2
+        if sumw2 is not None:
+            self.Sumw2 = numpy.ascontiguousarray(sumw2.T, 'd').ravel()
+        self.Buffered = buffered
+        self.ErrorOption = 0
+
+    def Class(self):
+        return FakeClass(self.ClassName)
+
+    def GetName(self):
+        return 'h'
+
+    def GetDimension(self):
+        return len(self.Shape)
+
+    def GetNbinsX(self):
+        return self.Shape[0] - 2
+
+    def GetNbinsY(self):
+        return self.Shape[1] - 2
+
+    def getGlobalBin(self, i, j = 0):
+        return i + self.Shape[0]*j
+
+    def GetBinContent(self, *bin):
+        return float(self.Contents[self.getGlobalBin(*bin)])
+
+    def GetBinError(self, *bin):
+        if self.Sumw2 is not None:
+            return numpy.sqrt(self.Sumw2[self.getGlobalBin(*bin)])
+        return numpy.sqrt(abs(float(self.Contents[self.getGlobalBin(*bin)])))
+
+    def GetBinErrorOption(self):
+        return self.ErrorOption
+
+    def GetSumw2N(self):
+        if self.Sumw2 is None:
+            return 0
+        return len(self.Sumw2)
+
+    def GetSumw2(self):
+        return FakeArray(self.Sumw2.tobytes())
+
+    def GetArray(self):
+        if not self.Buffered:
+            raise AttributeError('No buffer.')
+        return FakeArray(self.Contents.tobytes())
+
+
+class pTestAlgorithm(pAlarmBaseAlgorithm):
+
+    SUPPORTED_TYPES = ['TH1F', 'TH1D', 'TH1I', 'TH2F', 'TH2D', 'TH2S']
+
+
+# The original implementation of
+# pAlarmBaseAlgorithm.getNeighbouringAverage(), reading the bins one by one.
+
+def getNeighbouringAverage(algorithm, bin, numNeighbours, lowCut, highCut):
+    binsContent = []
+    binsList = algorithm.getNeighbouringBinsList(bin, numNeighbours)
+    firstBin = binsList[0]
+    if type(firstBin) == int:
+        for i in binsList:
+            binsContent.append(algorithm.RootObject.GetBinContent(i))
+    elif len(firstBin) == 2:
+        for (i, j) in binsList:
+            binsContent.append(algorithm.RootObject.GetBinContent(i, j))
+    binsContent.sort()
+    numBins = len(binsContent)
+    numCutBinsLow = int(numBins*lowCut)
+    numCutBinsHigh = int(numBins*highCut)
+    binsContent =  binsContent[numCutBinsLow:-(numCutBinsHigh + 1)]
+    return algorithm.getAverage(binsContent)
+
+
+class pAlarmBaseAlgorithmTest(unittest.TestCase):
+
+    def setUp(self):
+        # Make sure that TH1.kNormal is there even without ROOT.
+        self.ROOT = algorithmModule.ROOT
+        algorithmModule.ROOT = types.ModuleType('ROOT')
+        algorithmModule.ROOT.TH1 = types.ModuleType('TH1')
+        algorithmModule.ROOT.TH1.kNormal = 0
+        self.Random = numpy.random.RandomState(3)
+        self.Limits = pAlarmLimits(-1, 3, -1, 6)
+
+    def tearDown(self):
+        algorithmModule.ROOT = self.ROOT
+
+    def getHistograms(self, shape, buffered = True):
+        # Poisson contents (with empty bins and ties) and the same with
+        # weights, including the underflow and overflow bins.
+        contents = self.Random.poisson(3, shape).astype('d')
+        weights = self.Random.uniform(0.5, 2, shape)
+        dimension = len(shape)
+        (f, d, i) = ('TH%dF' % dimension, 'TH%dD' % dimension,\
+                     ['TH1I', 'TH2S'][dimension - 1])
+        return [FakeHistogram(f, contents, buffered = buffered),
+                FakeHistogram(i, -contents, buffered = buffered),
+                FakeHistogram(d, contents*weights, contents*weights**2,\
+                              buffered),
+                FakeHistogram(f, self.Random.normal(0, 1, shape))]
+
+    def getBins(self, histogram):
+        if histogram.GetDimension() == 1:
+            return [(i,) for i in range(histogram.GetNbinsX() + 2)]
+        return [(i, j) for i in range(histogram.GetNbinsX() + 2) for j in\
+                range(histogram.GetNbinsY() + 2)]
+
+    def checkBins(self, histogram):
+        contents = getBinContents(histogram)
+        errors = getBinErrors(histogram)
+        self.assertEqual(contents.shape, histogram.Shape)
+        self.assertEqual(errors.shape, histogram.Shape)
+        for bin in self.getBins(histogram):
+            self.assertEqual(contents[bin], histogram.GetBinContent(*bin))
+            self.assertEqual(errors[bin], histogram.GetBinError(*bin))
+
+    def testBins1d(self):
+        for shape in [(3,), (12,), (102,)]:
+            for buffered in [True, False]:
+                for histogram in self.getHistograms(shape, buffered):
+                    self.checkBins(histogram)
+
+    def testBins2d(self):
+        for shape in [(3, 3), (12, 7), (5, 22)]:
+            for buffered in [True, False]:
+                for histogram in self.getHistograms(shape, buffered):
+                    self.checkBins(histogram)
+
+    def testErrorOption(self):
+        histogram = self.getHistograms((10, 6))[2]
+        histogram.ErrorOption = 1
+        self.checkBins(histogram)
+
+    def testAlgorithmBins(self):
+        histogram = self.getHistograms((10, 6))[2]
+        algorithm = pTestAlgorithm(self.Limits, histogram, {})
+        self.assertTrue(algorithm.isValid())
+        # The histogram is read once.
+        self.assertTrue(algorithm.getBinContents() is\
+                        algorithm.getBinContents())
+        self.assertTrue(algorithm.getBinErrors() is algorithm.getBinErrors())
+        numpy.testing.assert_array_equal(algorithm.getBinContents(),\
+                                         getBinContents(histogram))
+        numpy.testing.assert_array_equal(algorithm.getBinErrors(),\
+                                         getBinErrors(histogram))
+
+    def checkNeighbouringAverages(self, histogram):
+        algorithm = pTestAlgorithm(self.Limits, histogram, {})
+        for numNeighbours in [1, 2, 3, 30]:
+            for (lowCut, highCut) in [(0, 0), (0.1, 0.2), (0.25, 0.25),
+                                      (0.5, 0.), (0.4, 0.6)]:
+                averages = algorithm.getNeighbouringAverages(numNeighbours,\
+                                                             lowCut, highCut)
+                self.assertEqual(averages.shape, histogram.Shape)
+                for bin in self.getBins(histogram):
+                    if 0 in bin or\
+                       bin[0] == histogram.GetNbinsX() + 1 or\
+                       (len(bin) == 2 and bin[1] == histogram.GetNbinsY() + 1):
+                        self.assertEqual(averages[bin], 0.)
+                        continue
+                    if len(bin) == 1:
+                        bin = bin[0]
+                    expected = getNeighbouringAverage(algorithm, bin,\
+                                                      numNeighbours, lowCut,\
+                                                      highCut)
+                    self.assertEqual(averages[bin], expected)
+                    self.assertEqual(algorithm.getNeighbouringAverage(bin,\
+                        numNeighbours, lowCut, highCut), expected)
+
+    def testNeighbouringAverages1d(self):
+        for shape in [(4,), (5,), (27,)]:
+            for histogram in self.getHistograms(shape):
+                self.checkNeighbouringAverages(histogram)
+
+    def testNeighbouringAverages2d(self):
+        for shape in [(4, 4), (3, 9), (10, 8)]:
+            for histogram in self.getHistograms(shape):
+                self.checkNeighbouringAverages(histogram)
+
+    def testNoNeighbours(self):
+        contents = numpy.arange(12.).reshape(4, 3)
+        averages = getNeighbouringAverages(contents, 0, 0., 0.)
+        numpy.testing.assert_array_equal(averages, numpy.zeros((4, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+import types
+import unittest
+import numpy
+
+from test_pTreeBlockReader import getTestTree, readerModule
+
+from pMultiHistogramFiller import pMultiHistogramFiller
+from pTreeFormula import pTreeFormula
+
+
+# Stand-in for the ROOT histograms, recording what is passed to FillN().
+
+class FakeHistogram:
+
+    def __init__(self, name):
+        self.Name = name
+        self.Blocks = []
+
+    def GetName(self):
+        return self.Name
+
+    def FillN(self, numValues, *arrays):
+        if len(arrays) == 2:
+            (x, w) = arrays
+            self.Blocks.append((x[:numValues].copy(), w[:numValues].copy()))
+        else:
+            (x, y, w, stride) = arrays
+            self.Blocks.append((x[:numValues].copy(), y[:numValues].copy(),\
+                                w[:numValues].copy()))
+
+    def getEntries(self):
+        if not len(self.Blocks):
+            return ()
+        return tuple([numpy.concatenate(arrays) for arrays in\
+                      zip(*self.Blocks)])
+
+
+class pMultiHistogramFillerTest(unittest.TestCase):
+
+    def setUp(self):
+        # Make sure that the entries are read from python.
+        self.ROOT = readerModule.ROOT
+        readerModule.ROOT = types.ModuleType('ROOT')
+        self.Tree = getTestTree()
+        self.Data = dict([(name, array.astype('d')) for (name, array) in\
+                          self.Tree.Data.items()])
+        self.Filler = pMultiHistogramFiller(self.Tree, blockSize = 5)
+
+    def tearDown(self):
+        readerModule.ROOT = self.ROOT
+
+    def fill(self, expression, cut = ''):
+        histogram = FakeHistogram('h%d' % len(self.Filler.Requests))
+        self.assertTrue(self.Filler.addHistogram(histogram, expression, cut))
+        self.Filler.run()
+        self.assertEqual(self.Tree.Projections, [])
+        return histogram.getEntries()
+
+    def assertEntries(self, entries, expected):
+        self.assertEqual(len(entries), len(expected))
+        for (array, expectedArray) in zip(entries, expected):
+            numpy.testing.assert_array_equal(array, expectedArray)
+
+    def testNoCut(self):
+        self.assertEntries(self.fill('Energy'),
+                           (self.Data['Energy'], numpy.ones(23)))
+        self.assertEntries(self.fill('EvtTime/1e6 + 1'),
+                           (self.Data['EvtTime']/1e6 + 1, numpy.ones(23)))
+
+    def testCut(self):
+        mask = (self.Data['Energy'] > 0) & (self.Data['Flag'] != 0)
+        self.assertEntries(self.fill('EvtTime', 'Energy > 0 && Flag'),
+                           (self.Data['EvtTime'][mask], numpy.ones(mask.sum())))
+
+    def testCutAsWeight(self):
+        # The cut value is the weight and the zero weights are dropped.
+        (energy, flag) = (self.Data['Energy'], self.Data['Flag'])
+        mask = flag != 0
+        self.assertEntries(self.fill('Flag', 'Energy*Flag'),
+                           (flag[mask], (energy*flag)[mask]))
+        mask = energy > 1
+        self.assertEntries(self.fill('Energy', '2.5*(Energy > 1)'),
+                           (energy[mask], numpy.repeat(2.5, mask.sum())))
+
+    def test2d(self):
+        (x, y) = (self.Data['EvtTime'], self.Data['Energy'])
+        mask = y < 2
+        self.assertEntries(self.fill('Energy : EvtTime', 'Energy < 2'),
+                           (x[mask], y[mask], numpy.ones(mask.sum())))
+
+    def testMultipleInstances(self):
+        counts = self.Data['Counts']
+        # Each instance is an entry of the histogram...
+        self.assertEntries(self.fill('Counts'),
+                           (counts.ravel(), numpy.ones(counts.size)))
+        self.assertEntries(self.fill('Counts[2]'),
+                           (counts[:, 2].ravel(), numpy.ones(23*4)))
+        # ...with the scalar branches repeated for all the instances...
+        energy = numpy.repeat(self.Data['Energy'], 12)
+        mask = counts.ravel() > 500
+        self.assertEntries(self.fill('Energy', 'Counts > 500'),
+                           (energy[mask], numpy.ones(mask.sum())))
+        self.assertEntries(self.fill('Counts:Energy', 'Energy'),
+                           (energy[energy != 0], counts.ravel()[energy != 0],
+                            energy[energy != 0]))
+        # ...and the indexed instances combined with the partial arrays.
+        mask = (counts[:, 1] < counts[:, 0]).ravel()
+        self.assertEntries(self.fill('Counts[0]', 'Counts[1] < Counts[0]'),
+                           (counts[:, 0].ravel()[mask],
+                            numpy.ones(mask.sum())))
+
+    def testConstant(self):
+        self.assertEntries(self.fill('1', 'Energy > 0'),
+                           (numpy.ones((self.Data['Energy'] > 0).sum()),
+                            numpy.ones((self.Data['Energy'] > 0).sum())))
+
+    def testSharedBlockRead(self):
+        histograms = [FakeHistogram('h%d' % i) for i in range(3)]
+        self.Filler.addHistogram(histograms[0], 'Energy')
+        self.Filler.addHistogram(histograms[1], 'Energy', 'Flag')
+        self.Filler.addHistogram(histograms[2], 'Counts[1][3]:Energy')
+        actions = []
+        self.Filler.addPostFillAction(lambda: actions.append(len(actions)))
+        self.assertEqual(self.Filler.getBranchNames(),
+                         ['Energy', 'Flag', 'Counts'])
+        self.Filler.run()
+        # All the histograms are filled with a single read of the tree.
+        self.assertEqual(self.Tree.NumReads, 23)
+        self.assertEqual(actions, [0])
+        self.assertEqual(len(histograms[0].getEntries()[0]), 23)
+        self.assertEqual(len(histograms[1].getEntries()[0]),
+                         (self.Data['Flag'] != 0).sum())
+        numpy.testing.assert_array_equal(histograms[2].getEntries()[1],\
+                                         self.Data['Counts'][:, 1, 3])
+        self.assertEqual(self.Filler.Requests, [])
+
+    def testNumEntries(self):
+        self.Filler.NumEntries = 12
+        self.assertEntries(self.fill('Energy'),
+                           (self.Data['Energy'][:12], numpy.ones(12)))
+
+    def testIsSupported(self):
+        def isSupported(*expressions):
+            return self.Filler.isSupported([pTreeFormula(expression) for\
+                                            expression in expressions])
+        self.assertTrue(isSupported('Energy', 'Counts[1] > 3'))
+        self.assertTrue(isSupported('Counts', 'Energy'))
+        for expressions in [('Object',), ('Pair + 1',), ('Hits[0]',),
+                            ('Missing',), ('Counts[3]',), ('Energy[0]',),
+                            ('Counts', 'Counts[0]'),
+                            ('Type_int8', 'Counts + 1')]:
+            self.assertFalse(isSupported(*expressions))
+
+    def testProjectFallback(self):
+        for (expression, cut) in [('sqrt(Energy)', ''),
+                                  ('Energy', 'abs(Energy) < 1'),
+                                  ('Hits', ''),
+                                  ('Object.fX', ''),
+                                  ('Counts[Flag]', ''),
+                                  ('Energy : EvtTime', 'Missing > 0'),
+                                  ('Counts[0] : Counts', ''),
+                                  ('Energy:EvtTime:Flag', ''),
+                                  ('Energy', 'Entry$ < 10')]:
+            histogram = FakeHistogram('p%d' % len(self.Tree.Projections))
+            self.assertFalse(self.Filler.addHistogram(histogram, expression,\
+                                                      cut))
+            self.assertEqual(self.Tree.Projections[-1],
+                             (histogram.GetName(), expression, cut, '',
+                              1000000000))
+        self.assertEqual(self.Filler.Requests, [])
+        self.Filler.NumEntries = 12
+        self.Filler.addHistogram(FakeHistogram('p'), 'Hits')
+        self.assertEqual(self.Tree.Projections[-1][-1], 12)
+        self.Filler.run()
+        self.assertEqual(self.Tree.NumReads, 0)
+
+    def testRange(self):
+        self.assertEqual(self.Filler.getRange('Energy'),
+                         (self.Data['Energy'].min(), self.Data['Energy'].max()))
+        self.assertEqual(self.Filler.getRange('Counts'),
+                         (self.Data['Counts'].min(), self.Data['Counts'].max()))
+        self.assertEqual(self.Tree.NumReads, 46)
+        # The range is cached...
+        self.Filler.getRange('Energy')
+        self.assertEqual(self.Tree.NumReads, 46)
+        # ...and left to ROOT for the unsupported branches.
+        self.assertEqual(self.Filler.getRange('Hits'), (0., 0.))
+        self.assertEqual(self.Tree.NumReads, 46)
+
+
+if __name__ == '__main__':
+    unittest.main()
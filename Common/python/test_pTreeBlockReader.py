@@ -0,0 +1,208 @@
+import sys
+import types
+import unittest
+import numpy
+
+try:
+    import pSafeROOT
+except ImportError:
+    # The reader only needs ROOT for the compiled helper, which is not used
+    # with the fake trees below anyway.
+    fakeModule = types.ModuleType('pSafeROOT')
+    fakeModule.ROOT = types.ModuleType('ROOT')
+    sys.modules['pSafeROOT'] = fakeModule
+
+import pTreeBlockReader as readerModule
+from pTreeBlockReader import pTreeBlockReader, getBranchLayout,\
+     ROOT_TO_NUMPY_TYPE_MAP
+
+NUMPY_TO_ROOT_TYPE_MAP = dict([(value, key) for (key, value) in\
+                               ROOT_TO_NUMPY_TYPE_MAP.items()])
+
+
+# Minimal stand-ins for the ROOT TLeaf, TBranch and TTree classes, reading
+# the entries from numpy arrays (one per branch) into the addresses set with
+# SetBranchAddress(), as ROOT does.
+
+class FakeLeaf:
+
+    def __init__(self, name, typeName, shape, leafCount):
+        self.Title = name + ''.join(['[%d]' % size for size in shape])
+        self.TypeName = typeName
+        self.LeafCount = leafCount
+
+    def GetTitle(self):
+        return self.Title
+
+    def GetTypeName(self):
+        return self.TypeName
+
+    def GetLeafCount(self):
+        return self.LeafCount
+
+
+class FakeList:
+
+    def __init__(self, items):
+        self.Items = items
+
+    def GetEntries(self):
+        return len(self.Items)
+
+    def At(self, index):
+        return self.Items[index]
+
+
+class FakeBranch:
+
+    def __init__(self, className, leaves):
+        self.Name = className
+        self.Leaves = FakeList(leaves)
+
+    def ClassName(self):
+        return self.Name
+
+    def GetListOfLeaves(self):
+        return self.Leaves
+
+
+class FakeTree:
+
+    def __init__(self, numEntries):
+        self.NumEntries = numEntries
+        self.Data = {}
+        self.Branches = {}
+        self.Status = {}
+        self.Addresses = {}
+        self.Projections = []
+        self.NumReads = 0
+
+    def addBranch(self, name, array, className = 'TBranch', numLeaves = 1,
+                  variableSize = False):
+        array = numpy.asarray(array)
+        assert len(array) == self.NumEntries
+        typeName = NUMPY_TO_ROOT_TYPE_MAP[array.dtype.name]
+        leaves = [FakeLeaf(name, typeName, array.shape[1:],\
+                           variableSize and FakeLeaf('n', 'Int_t', (), None))\
+                  for i in range(numLeaves)]
+        self.Data[name] = array
+        self.Branches[name] = FakeBranch(className, leaves)
+        self.Status[name] = 1
+
+    def GetBranch(self, name):
+        return self.Branches.get(name)
+
+    def GetEntries(self):
+        return self.NumEntries
+
+    def SetBranchStatus(self, name, status):
+        for branchName in self.Status.keys():
+            if name in ['*', branchName]:
+                self.Status[branchName] = status
+
+    def SetBranchAddress(self, name, address):
+        self.Addresses[name] = address
+
+    def ResetBranchAddresses(self):
+        self.Addresses = {}
+
+    def GetEntry(self, entry):
+        self.NumReads += 1
+        for (name, address) in self.Addresses.items():
+            if self.Status[name]:
+                address[...] = self.Data[name][entry]
+
+    def GetMinimum(self, name):
+        return float(self.Data[name].min())
+
+    def GetMaximum(self, name):
+        return float(self.Data[name].max())
+
+    def Project(self, histogramName, expression, cut, option, numEntries):
+        self.Projections.append((histogramName, expression, cut, option,\
+                                 numEntries))
+
+
+# A fake tree with branches of all the supported types and a few
+# unsupported ones.
+
+def getTestTree(numEntries = 23):
+    tree = FakeTree(numEntries)
+    random = numpy.random.RandomState(7)
+    tree.addBranch('EvtTime', random.uniform(0, 1e8, numEntries))
+    tree.addBranch('Energy', random.uniform(-5, 5, numEntries).astype('f'))
+    tree.addBranch('Flag', random.randint(0, 2, numEntries).astype('bool'))
+    tree.addBranch('Counts', random.randint(0, 1000, (numEntries, 3, 4))\
+                   .astype('int16'))
+    for dtype in ['int8', 'uint8', 'uint16', 'int32', 'uint32', 'int64',
+                  'uint64']:
+        tree.addBranch('Type_%s' % dtype, random.randint(0, 100,\
+                       (numEntries, 2)).astype(dtype))
+    tree.addBranch('Object', numpy.zeros(numEntries), 'TBranchElement')
+    tree.addBranch('Pair', numpy.zeros(numEntries), numLeaves = 2)
+    tree.addBranch('Hits', numpy.zeros((numEntries, 5)), variableSize = True)
+    return tree
+
+
+class pTreeBlockReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        # Make sure that the entries are read from python.
+        self.ROOT = readerModule.ROOT
+        readerModule.ROOT = types.ModuleType('ROOT')
+        self.Tree = getTestTree()
+
+    def tearDown(self):
+        readerModule.ROOT = self.ROOT
+
+    def testBranchLayout(self):
+        self.assertEqual(getBranchLayout(self.Tree, 'EvtTime'),
+                         ('float64', ()))
+        self.assertEqual(getBranchLayout(self.Tree, 'Counts'),
+                         ('int16', (3, 4)))
+        self.assertEqual(getBranchLayout(self.Tree, 'Flag'), ('bool', ()))
+        for name in ['Object', 'Pair', 'Hits', 'Missing']:
+            self.assertEqual(getBranchLayout(self.Tree, name), None)
+            self.assertRaises(RuntimeError, pTreeBlockReader, self.Tree,\
+                              ['EvtTime', name])
+
+    def testReadArrays(self):
+        names = [name for name in self.Tree.Data.keys() if\
+                 getBranchLayout(self.Tree, name) is not None]
+        for blockSize in [1, 5, 23, 100]:
+            arrays = pTreeBlockReader(self.Tree, names, blockSize).readArrays()
+            self.assertEqual(sorted(arrays.keys()), sorted(names))
+            for name in names:
+                self.assertEqual(arrays[name].dtype, self.Tree.Data[name].dtype)
+                numpy.testing.assert_array_equal(arrays[name],\
+                                                 self.Tree.Data[name])
+        self.assertEqual(self.Tree.Addresses, {})
+
+    def testBlocks(self):
+        reader = pTreeBlockReader(self.Tree, ['Energy', 'Counts'], 5)
+        firstEntries = []
+        for (firstEntry, arrays) in reader.getBlocks(17):
+            firstEntries.append(firstEntry)
+            numEntries = min(5, 17 - firstEntry)
+            # Only the branches being read are enabled.
+            self.assertEqual(sorted([name for (name, status) in\
+                                     self.Tree.Status.items() if status]),
+                             ['Counts', 'Energy'])
+            for name in ['Energy', 'Counts']:
+                numpy.testing.assert_array_equal(arrays[name],\
+                    self.Tree.Data[name][firstEntry:firstEntry + numEntries])
+        self.assertEqual(firstEntries, [0, 5, 10, 15])
+        self.assertEqual(self.Tree.NumReads, 17)
+        self.assertTrue(min(self.Tree.Status.values()) == 1)
+
+    def testNumEntries(self):
+        reader = pTreeBlockReader(self.Tree, ['Flag'])
+        self.assertEqual(reader.getNumEntries(), 23)
+        self.assertEqual(reader.getNumEntries(10), 10)
+        self.assertEqual(reader.getNumEntries(100), 23)
+        self.assertEqual(len(reader.readArrays(10)['Flag']), 10)
+        self.assertEqual(len(reader.readArrays(0)['Flag']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import numpy
+
+from pTreeFormula import pTreeFormula, tokenize, splitExpression,\
+     broadcastInstances
+
+# Branch arrays for 4 entries: two scalars, a fixed-size array (multiple
+# instances per entry) and a 2-d one.
+ARRAYS = {'a'  : numpy.array([5, 12, 0, -3], 'int32'),
+          'b'  : numpy.array([3., 10., 0., 0.5], 'float32'),
+          'v'  : numpy.arange(12, dtype = 'uint16').reshape(4, 3),
+          'w'  : numpy.arange(8, dtype = 'float64').reshape(4, 2),
+          'm'  : numpy.arange(24, dtype = 'int16').reshape(4, 2, 3)
+          }
+
+
+def evaluate(expression, arrays = ARRAYS):
+    return pTreeFormula(expression).evaluate(arrays)
+
+
+class pTreeFormulaTest(unittest.TestCase):
+
+    def assertValues(self, expression, expected):
+        value = evaluate(expression)
+        self.assertEqual(value.dtype, numpy.dtype('d'))
+        numpy.testing.assert_array_equal(value, expected)
+
+    def testTokenize(self):
+        self.assertEqual(tokenize(' m[1][2]>=0x1F&&!b||1.5e3 '),
+                         [('name', 'm'), ('operator', '['), ('number', '1'),
+                          ('operator', ']'), ('operator', '['),
+                          ('number', '2'), ('operator', ']'),
+                          ('operator', '>='), ('number', '0x1F'),
+                          ('operator', '&&'), ('operator', '!'),
+                          ('name', 'b'), ('operator', '||'),
+                          ('number', '1.5e3')])
+        self.assertEqual(tokenize('a<<2 <= .5'),
+                         [('name', 'a'), ('operator', '<<'), ('number', '2'),
+                          ('operator', '<='), ('number', '.5')])
+        self.assertRaises(RuntimeError, tokenize, 'a $ b')
+
+    def testSplitExpression(self):
+        self.assertEqual(splitExpression('b : a[1]'), ['b', 'a[1]'])
+        self.assertEqual(splitExpression('a'), ['a'])
+
+    def testBranchNames(self):
+        self.assertEqual(pTreeFormula('(a + b)*a - m[1][0]').BranchNames,
+                         ['a', 'b', 'm'])
+
+    def testNumbers(self):
+        self.assertEqual(evaluate('0x10'), 16.)
+        self.assertEqual(evaluate('1.5e1'), 15.)
+        self.assertEqual(evaluate('.25'), 0.25)
+
+    def testPrecedence(self):
+        self.assertEqual(evaluate('1 + 2*3'), 7.)
+        self.assertEqual(evaluate('(1 + 2)*3'), 9.)
+        self.assertEqual(evaluate('10 - 4 - 3'), 3.)
+        self.assertEqual(evaluate('12/3/2'), 2.)
+        self.assertEqual(evaluate('2*7 % 4'), 2.)
+        self.assertEqual(evaluate('-2*-3'), 6.)
+        self.assertEqual(evaluate('!0 + 1'), 2.)
+        self.assertEqual(evaluate('1 << 2 + 1'), 8.)
+        self.assertEqual(evaluate('1 | 2 & 3'), 3.)
+        self.assertEqual(evaluate('6 & 3 == 3'), 0.)
+        self.assertEqual(evaluate('1 < 2 == 1'), 1.)
+        self.assertEqual(evaluate('1 || 0 && 0'), 1.)
+        self.assertEqual(evaluate('(1 || 0) && 0'), 0.)
+        self.assertEqual(evaluate('~1 + 1'), -1.)
+
+    def testArithmetic(self):
+        (a, b) = (ARRAYS['a'].astype('d'), ARRAYS['b'].astype('d'))
+        self.assertValues('a + b', a + b)
+        self.assertValues('a - 2*b', a - 2*b)
+        self.assertValues('-a', -a)
+        self.assertValues('+a', a)
+
+    def testDivisionByZero(self):
+        self.assertEqual(evaluate('1/0'), 0.)
+        self.assertEqual(evaluate('1 % 0'), 0.)
+        self.assertValues('a/b', [5./3., 1.2, 0., -6.])
+        self.assertValues('b/a', [0.6, 10./12., 0., 0.5/-3.])
+        self.assertValues('a/(b - 3)', [0., 12./7., 0., 1.2])
+        # The modulo works on Long64_t (i.e. 0.5 is 0) with the C sign.
+        self.assertValues('a % b', [2., 2., 0., 0.])
+        self.assertValues('a % 5', [0., 2., 0., -3.])
+
+    def testBitwise(self):
+        self.assertValues('a & b', [1., 8., 0., 0.])
+        self.assertValues('a | b', [7., 14., 0., -3.])
+        self.assertValues('~a', [-6., -13., -1., 2.])
+        self.assertValues('a << 2', [20., 48., 0., -12.])
+        self.assertValues('a >> 1', [2., 6., 0., -2.])
+        self.assertValues('-1 & 0xff', 255.)
+        # Doubles are truncated to Long64_t.
+        self.assertValues('5.7 & 3', 1.)
+
+    def testLogical(self):
+        self.assertValues('a && b', [1., 1., 0., 1.])
+        self.assertValues('a || b', [1., 1., 0., 1.])
+        self.assertValues('!b', [0., 0., 1., 0.])
+        self.assertValues('!!b', [1., 1., 0., 1.])
+        self.assertValues('a > 0 && b < 5', [1., 0., 0., 0.])
+        self.assertValues('a == 0 || b == 10', [0., 1., 1., 0.])
+        self.assertValues('a != 12', [1., 0., 1., 1.])
+        self.assertValues('a <= 0', [0., 0., 1., 1.])
+        self.assertValues('a >= 5', [1., 1., 0., 0.])
+
+    def testIndices(self):
+        self.assertValues('v[2]', [2., 5., 8., 11.])
+        self.assertValues('m[1][2]', [5., 11., 17., 23.])
+        self.assertValues('m[1]', ARRAYS['m'][:, 1].astype('d'))
+        self.assertRaises(RuntimeError, evaluate, 'v[3]')
+        self.assertRaises(RuntimeError, evaluate, 'm[0][3]')
+        self.assertRaises(RuntimeError, evaluate, 'a[0]')
+
+    def testBroadcasting(self):
+        (a, v) = (ARRAYS['a'].astype('d'), ARRAYS['v'].astype('d'))
+        value = evaluate('v + a')
+        self.assertEqual(value.shape, (4, 3))
+        numpy.testing.assert_array_equal(value, v + a[:, numpy.newaxis])
+        self.assertValues('v*2 > a', 2*v > a[:, numpy.newaxis])
+        self.assertValues('v[1]*a', v[:, 1]*a)
+        self.assertValues('m[0] - v', ARRAYS['m'][:, 0] - v)
+        # Multiple instances with different dimensions can't be combined.
+        self.assertRaises(RuntimeError, evaluate, 'v + w')
+        self.assertRaises(RuntimeError, evaluate, 'm + v')
+        (left, right) = broadcastInstances(ARRAYS['w'], ARRAYS['b'])
+        self.assertEqual(left.shape, (4, 2))
+        self.assertEqual(right.shape, (4, 2))
+        numpy.testing.assert_array_equal(right[:, 1], ARRAYS['b'])
+
+    def testEmptyArrays(self):
+        arrays = dict([(name, array[:0]) for (name, array) in\
+                       ARRAYS.items()])
+        self.assertEqual(evaluate('a/b + v', arrays).shape, (0, 3))
+
+    def testUnsupported(self):
+        for expression in ['', '   ', 'sqrt(a)', 'v[a]', 'v[1.5]', 'v[-1]',
+                           'a +', '(a + b', 'a b', 'a)', 'a:b', 'a ? b : 1',
+                           'Entry$', '"a"']:
+            self.assertRaises(RuntimeError, pTreeFormula, expression)
+        self.assertRaises(KeyError, evaluate, 'c + 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -102,12 +102,15 @@ class pOrbitViewer:
         self.StartMet = self.M7Parser.TimePoints[0]
         self.StopMet  = self.M7Parser.TimePoints[-1]
         self.SaaPoca  = None
+        self.Coordinates = self.M7Parser.processCoordinates()
 
-    def getCoordinates(self, position):
-        position.processCoordinates()
-        lon = position.getLongitude()
-        lat = position.getLatitude()
-        dsaa = position.getDistanceToSAA()
+    def getCoordinates(self, index):
+        lon = self.Coordinates['Longitude'][index]
+        lat = self.Coordinates['Latitude'][index]
+        try:
+            dsaa = self.Coordinates['DistanceToSAA'][index]
+        except KeyError:
+            dsaa = -9999
         return (lon, lat, dsaa)
 
     def run(self, deltaTimeStepMin, saaPocaTimePaddingMin, saaPocaMaxDistance):
@@ -118,8 +121,7 @@ class pOrbitViewer:
         for (i, met) in enumerate(self.M7Parser.TimePoints[:-1]):
             secFromStart = met - self.StartMet
             secToEnd = self.StopMet - met
-            position = self.M7Parser.getSCPosition((met, 0))
-            (lon, lat, dsaa) = self.getCoordinates(position)
+            (lon, lat, dsaa) = self.getCoordinates(i)
             self.Orbit.SetPoint(i, lon, lat)
             if i == 0:
                 date = pTimeUtils.met2utc(met, '%b %d, %Y %H:%M:%S')
@@ -162,8 +164,7 @@ class pOrbitViewer:
         maxLat = MIN_LAT
         for (i, met) in enumerate(self.M7Parser.TimePoints[:-1]):
             if abs(met - self.SaaPoca.Met) < timePadding:
-                position = self.M7Parser.getSCPosition((met, 0))
-                (lon, lat, dsaa) = self.getCoordinates(position)
+                (lon, lat, dsaa) = self.getCoordinates(i)
                 if lon < minLon:
                     minLon = lon
                 if lon > maxLon:
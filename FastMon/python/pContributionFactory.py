@@ -0,0 +1,285 @@
+## @package pContributionFactory
+## @brief Package for the in-memory implementation of the event contribution
+#  classes (and iterators), based on the xml configuration file.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pContributionFactory')
+
+import time
+import hashlib
+
+from pGlobals import *
+
+from pTKRcontributionIteratorBase import pTKRcontributionIteratorBase
+from pCALcontributionIteratorBase import pCALcontributionIteratorBase
+from pAEMcontributionIteratorBase import pAEMcontributionIteratorBase
+from pGEMcontributionBase         import pGEMcontributionBase
+
+
+## @brief Cache of the classes already built, indexed by a hash of the
+#  relevant part of the configuration.
+#
+#  The classes only depend on the list of enabled variables in a given
+#  group, so they are built once per configuration (and per process).
+
+CONTRIBUTION_CLASS_CACHE = {}
+
+
+## @brief Base class implementing the contribution factories.
+#
+#  Subclassed for all the subsystems (TKR, CAL, ACD, GEM).
+#  The scheme here is the following: base classes for all the contributions
+#  exist, with functions defined for all the possible variables (e.g. the TKR
+#  subsystem has its pTKRcontributionIteratorBase class defined in
+#  pTKRcontributionIteratorBase.py). This class creates (in memory) a
+#  subclass in which *only* the functions corresponding to the variables
+#  in the xml input list are called.
+#
+#  The functions to be called are collected once into dispatch lists:
+#  the fillEventContribution() method calls the functions named after the
+#  enabled variables, while each hook of the base class (e.g. strip() for the
+#  TKR) calls the base hook and then the functions named
+#  <variable>__<hook>__ for the enabled variables.
+
+class pContributionFactory:
+
+    ## @brief Constructor
+    ## @param self
+    #  The class instance.
+    ## @param xmlParser
+    #  Reference to the pXmlParser object responsible for the variables list.
+    ## @param baseClass
+    #  The base class (e.g. pTKRcontributionIteratorBase for the TKR).
+    ## @param className
+    #  The name of the class to be built.
+    ## @param groupName
+    #  The group name identifying the relevant variables in the input list.
+    ## @param hookNames
+    #  The names of the subsystem-specific hooks (i.e. strip() and TOT() for
+    #  the TKR, log() for the CAL etc).
+
+    def __init__(self, xmlParser, baseClass, className, groupName,
+                 hookNames = []):
+
+        ## @var BaseClass
+        ## @brief The base class.
+
+        ## @var ClassName
+        ## @brief The name of the class to be built.
+
+        ## @var VariableNames
+        ## @brief The names of the variables which need to be filled, as
+        #  defined in the corresponding input lists group of the the xml
+        #  configuration file.
+
+        ## @var HookNames
+        ## @brief The names of the subsystem-specific hooks.
+
+        self.BaseClass     = baseClass
+        self.ClassName     = className
+        self.VariableNames = [variable.getName() for variable in\
+                              xmlParser.getEnabledVariablesByGroup(groupName)]
+        self.HookNames     = hookNames
+
+    ## @brief Return the cache key for the class.
+    ## @param self
+    #  The class instance.
+
+    def getHash(self):
+        return hashlib.md5('%s:%s' % (self.ClassName,\
+                                  ','.join(self.VariableNames))).hexdigest()
+
+    ## @brief Return the list of the base class functions with a given name
+    #  pattern for all the enabled variables.
+    ## @param self
+    #  The class instance.
+    ## @param pattern
+    #  The function name pattern (e.g. '%s' or '%s__strip__').
+
+    def getFunctions(self, pattern):
+        functions = []
+        for variableName in self.VariableNames:
+            functionName = pattern % variableName
+            if hasattr(self.BaseClass, functionName):
+                functions.append(getattr(self.BaseClass, functionName))
+        return functions
+
+    ## @brief Return the class, building it if not already in the cache.
+    ## @param self
+    #  The class instance.
+
+    def getClass(self):
+        key = self.getHash()
+        try:
+            return CONTRIBUTION_CLASS_CACHE[key]
+        except KeyError:
+            pass
+        logger.info('Building %s...' % self.ClassName)
+        startTime = time.time()
+        attributes = {'fillEventContribution':\
+                      self.implementFill(self.getFunctions('%s'))}
+        for hookName in self.HookNames:
+            functions = self.getFunctions('%%s__%s__' % hookName)
+            if len(functions):
+                attributes[hookName] =\
+                    self.implementHook(getattr(self.BaseClass, hookName),\
+                                       functions)
+        contributionClass = type(self.BaseClass)(self.ClassName,\
+                                                 (self.BaseClass,), attributes)
+        CONTRIBUTION_CLASS_CACHE[key] = contributionClass
+        logger.info('Done in %.4f s.\n' % (time.time() - startTime))
+        return contributionClass
+
+    ## @brief Return the implementation of the fillEventContribution() method
+    #  (which is the main function, called whenever the contribution itself
+    #  is processed).
+    ## @param self
+    #  The class instance.
+    ## @param functions
+    #  The functions to be called.
+
+    def implementFill(self, functions):
+        def fillEventContribution(contribution):
+            for function in functions:
+                function(contribution)
+        return fillEventContribution
+
+    ## @brief Return the implementation of a subsystem-specific hook (e.g.
+    #  strip() for the TKR).
+    ## @param self
+    #  The class instance.
+    ## @param baseHook
+    #  The hook as implemented in the base class.
+    ## @param functions
+    #  The functions to be called after the base hook.
+
+    def implementHook(self, baseHook, functions):
+        def hook(contribution, *args):
+            baseHook(contribution, *args)
+            for function in functions:
+                function(contribution, *args)
+        return hook
+
+
+## @brief TKR iterator factory implementation.
+#
+#  In vectorized mode the variables defining a __strips__ function (called
+#  once per contribution with the arrays of all the strips) are filled through
+#  it rather than through their __strip__ function (called for each strip):
+#  the strip() hook then only buffers the strips.
+
+class pTKRcontributionIteratorFactory(pContributionFactory):
+
+    ## @brief Constructor
+    ## @param self
+    #  The class instance.
+    ## @param xmlParser
+    #  Reference to the pXmlParser object responsible for the variables list.
+    ## @param vectorize
+    #  Flag to enable the vectorized strip accumulation.
+
+    def __init__(self, xmlParser, vectorize = TKR_VECTORIZED_STRIPS):
+
+        ## @var Vectorize
+        ## @brief Flag to enable the vectorized strip accumulation.
+
+        hookNames = ['strip', 'TOT']
+        if vectorize:
+            hookNames.append('strips')
+        pContributionFactory.__init__(self, xmlParser,\
+                                      pTKRcontributionIteratorBase,\
+                                      'pTKRcontributionIterator', 'TKR',\
+                                      hookNames)
+        self.Vectorize = vectorize
+
+    ## @brief Return the cache key for the class.
+    ## @param self
+    #  The class instance.
+
+    def getHash(self):
+        return '%s:%s' % (pContributionFactory.getHash(self), self.Vectorize)
+
+    ## @brief Return the list of the base class functions with a given name
+    #  pattern for all the enabled variables.
+    #
+    #  In vectorized mode the __strip__ functions with a __strips__
+    #  counterpart are replaced by pTKRcontributionIteratorBase.bufferStrip().
+    ## @param self
+    #  The class instance.
+    ## @param pattern
+    #  The function name pattern (e.g. '%s' or '%s__strip__').
+
+    def getFunctions(self, pattern):
+        functions = pContributionFactory.getFunctions(self, pattern)
+        if self.Vectorize and pattern == '%s__strip__':
+            vectorized = pContributionFactory.getFunctions(self, '%s__strips__')
+            names = [function.__name__.replace('__strips__', '__strip__')\
+                     for function in vectorized]
+            functions = [function for function in functions\
+                         if function.__name__ not in names]
+            if len(vectorized):
+                functions.append(self.BaseClass.bufferStrip)
+        return functions
+
+
+## @brief CAL iterator factory implementation.
+
+class pCALcontributionIteratorFactory(pContributionFactory):
+
+    ## @brief Constructor
+    ## @param self
+    #  The class instance.
+    ## @param xmlParser
+    #  Reference to the pXmlParser object responsible for the variables list.
+
+    def __init__(self, xmlParser):
+        pContributionFactory.__init__(self, xmlParser,\
+                                      pCALcontributionIteratorBase,\
+                                      'pCALcontributionIterator', 'CAL',\
+                                      ['log'])
+
+
+## @brief ACD iterator factory implementation.
+
+class pAEMcontributionIteratorFactory(pContributionFactory):
+
+    ## @brief Constructor
+    ## @param self
+    #  The class instance.
+    ## @param xmlParser
+    #  Reference to the pXmlParser object responsible for the variables list.
+
+    def __init__(self, xmlParser):
+        pContributionFactory.__init__(self, xmlParser,\
+                                      pAEMcontributionIteratorBase,\
+                                      'pAEMcontributionIterator', 'ACD',\
+                                      ['header', 'pha'])
+
+
+## @brief GEM contribution factory implementation.
+
+class pGEMcontributionFactory(pContributionFactory):
+
+    ## @brief Constructor
+    ## @param self
+    #  The class instance.
+    ## @param xmlParser
+    #  Reference to the pXmlParser object responsible for the variables list.
+
+    def __init__(self, xmlParser):
+        pContributionFactory.__init__(self, xmlParser, pGEMcontributionBase,\
+                                      'pGEMcontribution', 'GEM')
+        for variableName in self.VariableNames:
+            if not hasattr(self.BaseClass, variableName):
+                logger.error('Function %s not defined.' % variableName)
+
+
+
+if __name__ == '__main__':
+    from pXmlParser import pXmlParser
+    parser = pXmlParser('../xml/config.xml')
+    for factory in [pTKRcontributionIteratorFactory(parser),
+                    pCALcontributionIteratorFactory(parser),
+                    pAEMcontributionIteratorFactory(parser),
+                    pGEMcontributionFactory(parser)]:
+        print factory.getClass()
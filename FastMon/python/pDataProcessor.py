@@ -11,25 +11,26 @@ import sys
 import time
 import LDF
 import struct
+import array
+import multiprocessing
 
 from copy 			      import copy
 from LICOS_Scripts.analysis.LsfMerger import LsfMerger
 from eventFile			      import LSEReader, LSE_Info
 from pFastMonTreeMaker                import pFastMonTreeMaker
+from pFastMonTreeMaker                import FAST_MON_TREE_NAME
 from pLATdatagramIterator             import pLATdatagramIterator
+from pLATcomponentIterator            import pLATcomponentIterator
 from pLATcontributionIterator         import pLATcontributionIterator
 from pEBFeventIterator                import pEBFeventIterator
 from pXmlParser                       import pXmlParser
 from pGlobals			      import *
-from pContributionIteratorWriter      import pTKRcontributionIteratorWriter
-from pContributionIteratorWriter      import pCALcontributionIteratorWriter
-from pContributionIteratorWriter      import pAEMcontributionIteratorWriter
-from pContributionWriter              import pGEMcontributionWriter
 from pMetaEventProcessor	      import pMetaEventProcessor
 from pEvtMetaContextProcessor	      import pEvtMetaContextProcessor
 from pErrorHandler                    import pErrorHandler
 from pFastMonTreeProcessor            import pFastMonTreeProcessor
 from pFastMonReportGenerator          import pFastMonReportGenerator
+from pStageProfiler                   import pStageProfiler
 from pSafeROOT                        import ROOT
 
 ## @brief The data processor implementation.
@@ -57,7 +58,8 @@ class pDataProcessor:
     def __init__(self, inputFilePath, configFilePath = None,
                  outputFilePath = None, outputProcessedFilePath = None,
                  outputErrorFilePath = None, inputMagic7FilePath = None,
-                 saaDefinitionFile = None):
+                 saaDefinitionFile = None, geomagGridFilePath = None,
+                 magic7CacheFilePath = None):
 
         ## @var XmlParser
         ## @brief The xml parser object (pXmlParser instance).
@@ -115,11 +117,32 @@ class pDataProcessor:
         ## @var PrevTimestamp
         ## @brief The time stamp of the previous event, initialized to 0.
 
+        ## @var SCPositionUpdateInterval
+        ## @brief The interval (in s of event time) between two updates of the
+        #  space craft position and of the geomagnetic quantities.
+
+        ## @var FirstEvent
+        ## @brief The index (in the input file) of the first event to be
+        #  processed (different from 0 only for the shards of a parallel run).
+
+        ## @var FirstEventOffset
+        ## @brief The byte offset of the first event to be processed (set only
+        #  for the shards of a parallel run on ldf files, None otherwise).
+
+        ## @var Profiler
+        ## @brief The pStageProfiler object (None unless profiling is
+        #  enabled through enableProfiling()).
+
         logger.info('Starting Data Processor.')
 	logger.info('Using LDF Version : %s - %s - %s', LDF.LDF_VERSION_STR,
                     LDF.LDF_VERSION, LDF.__file__)
         
         self.InputFilePath = inputFilePath
+        self.ConfigFilePath = configFilePath
+        self.InputMagic7FilePath = inputMagic7FilePath
+        self.SaaDefinitionFile = saaDefinitionFile
+        self.GeomagGridFilePath = geomagGridFilePath
+        self.Magic7CacheFilePath = magic7CacheFilePath
         if outputFilePath is None:
             logger.info('Output file path not specified.')
             logger.info('All output files will be saved in the input folder.')
@@ -150,8 +173,10 @@ class pDataProcessor:
             from pM7Parser          import pM7Parser
             from IGRF               import IGRF
             logger.info('Using magic7 file : %s' % inputMagic7FilePath)
-            self.M7Parser = pM7Parser(inputMagic7FilePath, saaDefinitionFile)
-            self.GeomagProcessor = pGeomagProcessor(self.TreeMaker)
+            self.M7Parser = pM7Parser(inputMagic7FilePath, saaDefinitionFile,\
+                                      magic7CacheFilePath)
+            self.GeomagProcessor = pGeomagProcessor(self.TreeMaker,\
+                                                    geomagGridFilePath)
         if self.M7Parser is None:
             logger.error('pDataProcessor started without magic7 information.')
             logger.error('Are you sure?')
@@ -161,11 +186,9 @@ class pDataProcessor:
 	self.EvtMetaContextProcessor =\
                                      pEvtMetaContextProcessor(self.TreeMaker,\
                                                              self.ErrorHandler)
-        self.__updateContributionIterators()
-        self.__updateContributions()
-        from pLATcomponentIterator    import pLATcomponentIterator
         self.LatCompIter    = pLATcomponentIterator(self.TreeMaker,\
-                                                    self.ErrorHandler)
+                                                    self.ErrorHandler,\
+                                                    self.XmlParser)
         self.EbfEventIter   = pEBFeventIterator(self.LatCompIter)
         self.LatContrIter   = pLATcontributionIterator(self.EbfEventIter)
         self.LatDatagrIter  = pLATdatagramIterator(self.LatContrIter)
@@ -177,49 +200,283 @@ class pDataProcessor:
         self.StartTime      = None
         self.StopTime       = None
 	self.PrevTimestamp  = 0
+        if geomagGridFilePath is None:
+            self.SCPositionUpdateInterval = FASTMON_SC_POSITION_UPDATE_INTERVAL
+        else:
+            self.SCPositionUpdateInterval =\
+                FASTMON_SC_POSITION_UPDATE_INTERVAL_GRID
+        self.FirstEvent     = 0
+        self.FirstEventOffset = None
+        self.Profiler       = None
+
+    ## @brief Enable the per-stage profiling of the event processing.
+    ## @param self
+    #  The class instance.
 
-    ## @brief Update the event contribution iterators, based on the xml
-    #  configuration file.
+    def enableProfiling(self):
+        self.Profiler = pStageProfiler()
+        self.LatCompIter.Profiler = self.Profiler
+
+    ## @brief Mark the beginning of a processing stage (if profiling).
     ## @param self
     #  The class instance.
+    ## @param stage
+    #  The stage name.
 
-    def __updateContributionIterators(self):
-        writer = pTKRcontributionIteratorWriter(self.XmlParser)
-        writer.writeIterator()
-        writer = pCALcontributionIteratorWriter(self.XmlParser)
-        writer.writeIterator()
-        writer = pAEMcontributionIteratorWriter(self.XmlParser)
-        writer.writeIterator()
+    def __startStage(self, stage):
+        if self.Profiler is not None:
+            self.Profiler.start(stage)
 
-    ## @brief Update the event contributions, based on the xml
-    #  configuration file.
+    ## @brief Mark the end of a processing stage (if profiling).
     ## @param self
     #  The class instance.
+    ## @param stage
+    #  The stage name.
+
+    def __stopStage(self, stage):
+        if self.Profiler is not None:
+            self.Profiler.stop(stage)
 
-    def __updateContributions(self):
-        writer = pGEMcontributionWriter(self.XmlParser)
-        writer.writeComponent()
+    ## @brief Start the data processing.
+    ## @param self
+    #  The class instance.
+    ## @param maxNumEvents
+    #  The maximum number of events to be processed (-1 for all the events).
+    ## @param numShards
+    #  The number of worker processes the event loop is split into (1 means
+    #  the standard, serial, event loop).
 
-    def startProcessing(self, maxNumEvents = -1):
+    def startProcessing(self, maxNumEvents = -1, numShards = 1):
         logger.info('Opening data file %s...' % self.InputFilePath)
         if not os.path.exists(self.InputFilePath):
             sys.exit('Input data file not found. Abort.')
-        fileType = self.InputFilePath.split('.')[-1]
+        if numShards > 1:
+            self.startShardedProcessing(maxNumEvents, numShards)
+            logger.info('Data processing complete.')
+            return
+        fileType = self.__openInputFile()
         logger.info('Processing started on %s.' % time.asctime())
         self.NumEvents = 0
         self.StartTime = time.time()
+        if self.FirstEventOffset is not None:
+            logger.info('Seeking to event %d...' % self.FirstEvent)
+            self.LdfFile.seek(self.FirstEventOffset)
+        elif self.FirstEvent > 0:
+            logger.info('Skipping the first %d events...' % self.FirstEvent)
+            self.skipEvents(self.FirstEvent)
         if fileType   == 'lsf':
-            self.LsfMerger = LsfMerger(self.InputFilePath)
             self.startLSFProcessing(maxNumEvents)
         elif fileType == 'evt':
-            self.EvtReader = LSEReader(self.InputFilePath)
             self.startEvtProcessing(maxNumEvents)
         elif fileType == 'ldf':
-            self.LdfFile   = file(self.InputFilePath, 'rb')
             self.startLDFProcessing(maxNumEvents)
+        logger.info('Data processing complete.')
+
+    ## @brief Open the input file with the reader appropriate for its type
+    #  and return the file type.
+    ## @param self
+    #  The class instance.
+
+    def __openInputFile(self):
+        fileType = self.InputFilePath.split('.')[-1]
+        if fileType   == 'lsf':
+            self.LsfMerger = LsfMerger(self.InputFilePath)
+        elif fileType == 'evt':
+            self.EvtReader = LSEReader(self.InputFilePath)
+        elif fileType == 'ldf':
+            self.LdfFile   = file(self.InputFilePath, 'rb')
         else:
             sys.exit('Unknown file type (%s).' % fileType)
-        logger.info('Data processing complete.')
+        return fileType
+
+    ## @brief Advance the (already open) input file by a given number of
+    #  events without processing them and return the number of events
+    #  actually skipped.
+    #
+    #  For ldf files the events are skipped by seeking over the payload,
+    #  while for lsf and evt files they still need to be read (and
+    #  uncompressed) by the underlying reader. The meta events of the
+    #  skipped lsf events are passed through the meta event processor, so
+    #  that the time hack rollovers are counted exactly as in a serial run.
+    ## @param self
+    #  The class instance.
+    ## @param numEvents
+    #  The number of events to be skipped (-1 to skip up to the end of file).
+    ## @param eventIndex
+    #  Optional array the timestamp (lsf files) or the byte offset (ldf
+    #  files) of each skipped event is appended to.
+
+    def skipEvents(self, numEvents, eventIndex = None):
+        numSkipped = 0
+        while (numSkipped != numEvents):
+            if self.LsfMerger is not None:
+                try:
+                    (meta, event) = self.LsfMerger.getUncompressedEvent()
+                except TypeError:
+                    break
+                timestamp = self.MetaEventProcessor.calculateTimeStamp(meta)
+                if eventIndex is not None:
+                    eventIndex.append(timestamp)
+            elif self.EvtReader is not None:
+                if self.EvtReader.nextEvent().isNull():
+                    break
+            else:
+                header = self.LdfFile.read(8)
+                if len(header) < 8:
+                    break
+                if eventIndex is not None:
+                    eventIndex.append(self.LdfFile.tell() - 8)
+                (identity, length) = struct.unpack('!LL', header)
+                self.LdfFile.seek(length - 8, 1)
+            numSkipped += 1
+        return numSkipped
+
+    ## @brief Scan the input file and return the tuple (numEvents,
+    #  eventIndex).
+    #
+    #  eventIndex is the array of the byte offsets of the events for ldf
+    #  files (so that the shards of a parallel run can seek directly to
+    #  their first event) and the array of the event timestamps, as
+    #  calculated in a serial run, for lsf files (used to verify the
+    #  output of a parallel run). It is None for evt files.
+    ## @param self
+    #  The class instance.
+    ## @param maxNumEvents
+    #  The maximum number of events to be scanned (-1 for all the events).
+
+    def indexEvents(self, maxNumEvents = -1):
+        fileType = self.__openInputFile()
+        if fileType == 'ldf':
+            eventIndex = array.array('L')
+        elif fileType == 'lsf':
+            eventIndex = array.array('d')
+        else:
+            eventIndex = None
+        # Scratch processor, the rollover counting of this one must not leak.
+        metaEventProcessor = self.MetaEventProcessor
+        self.MetaEventProcessor = pMetaEventProcessor(self.TreeMaker)
+        numEvents = self.skipEvents(maxNumEvents, eventIndex)
+        self.MetaEventProcessor = metaEventProcessor
+        if self.LdfFile is not None:
+            self.LdfFile.close()
+        self.LsfMerger = None
+        self.EvtReader = None
+        self.LdfFile   = None
+        return (numEvents, eventIndex)
+
+    ## @brief Compare the timestamps in the merged output of a parallel run
+    #  of an lsf file with those of a serial run and return the number of
+    #  mismatches.
+    #
+    #  The timestamps of lsf files depend on the number of time hack
+    #  rollovers (every 128 s) seen since the beginning of the file, which
+    #  each shard must count on the events before its start.
+    ## @param self
+    #  The class instance.
+    ## @param timestamps
+    #  The array of the serial timestamps (see indexEvents()).
+
+    def checkShardedTimestamps(self, timestamps):
+        import numpy
+        from pTreeBlockReader import pTreeBlockReader
+        rootFile = ROOT.TFile(self.OutputFilePath)
+        rootTree = rootFile.Get(FAST_MON_TREE_NAME)
+        reader = pTreeBlockReader(rootTree, ['event_timestamp'])
+        shardedTimestamps = reader.readArrays()['event_timestamp']
+        rootFile.Close()
+        serialTimestamps = numpy.frombuffer(timestamps, 'd')
+        serialTimestamps = serialTimestamps.astype(shardedTimestamps.dtype)
+        if len(shardedTimestamps) != len(serialTimestamps):
+            logger.error('Timestamp check: %d events in the merged tree, '\
+                         '%d expected.' %\
+                         (len(shardedTimestamps), len(serialTimestamps)))
+            return abs(len(shardedTimestamps) - len(serialTimestamps))
+        numMismatches = (shardedTimestamps.reshape(-1) !=\
+                         serialTimestamps).sum()
+        if numMismatches:
+            logger.error('Timestamp check: %d sharded timestamps differ '\
+                         'from the serial ones.' % numMismatches)
+        else:
+            logger.info('Timestamp check: sharded and serial timestamps '\
+                        'agree on %d events.' % len(serialTimestamps))
+        return numMismatches
+
+    ## @brief Run the event loop in parallel.
+    #
+    #  The input file is split into numShards contiguous event ranges, each
+    #  one processed in a separate process (see processShard()) with its own
+    #  tree maker and error handler. The per-shard trees are then merged
+    #  (in order) into the output ROOT file and the per-shard error handlers
+    #  into the one of this processor, so that the output files are the same
+    #  as those written by a serial run.
+    #
+    #  The input file is scanned once up front (see indexEvents()). The ldf
+    #  shards seek directly to their first event, while the lsf and evt
+    #  readers (LsfMerger and LSEReader) provide no random access, so the
+    #  lsf and evt shards still read through the events before their start.
+    #  For lsf files the timestamps in the merged tree are checked against
+    #  the serial ones (see checkShardedTimestamps()).
+    #
+    #  Note that the geomagnetic quantities (updated every
+    #  SCPositionUpdateInterval s of event time) are refreshed on the first
+    #  event of each shard.
+    ## @param self
+    #  The class instance.
+    ## @param maxNumEvents
+    #  The maximum number of events to be processed (-1 for all the events).
+    ## @param numShards
+    #  The number of worker processes.
+
+    def startShardedProcessing(self, maxNumEvents, numShards):
+        logger.info('Indexing events in %s...' % self.InputFilePath)
+        (numEvents, eventIndex) = self.indexEvents(maxNumEvents)
+        numShards = max(1, min(numShards, numEvents))
+        logger.info('Splitting %d events into %d shards.' %\
+                    (numEvents, numShards))
+        shardArgsList = []
+        for i in range(numShards):
+            firstEvent = i*numEvents/numShards
+            lastEvent = (i + 1)*numEvents/numShards
+            firstEventOffset = None
+            if self.InputFilePath.endswith('.ldf') and firstEvent > 0:
+                firstEventOffset = eventIndex[firstEvent]
+            shardFilePath = '%s.shard%03d.root' %\
+                            (os.path.splitext(self.OutputFilePath)[0], i)
+            shardArgsList.append((self.InputFilePath, self.ConfigFilePath,\
+                                  shardFilePath, self.InputMagic7FilePath,\
+                                  self.SaaDefinitionFile, firstEvent,\
+                                  lastEvent - firstEvent,\
+                                  self.Profiler is not None,\
+                                  self.GeomagGridFilePath,\
+                                  self.Magic7CacheFilePath, firstEventOffset))
+        logger.info('Processing started on %s.' % time.asctime())
+        self.NumEvents = 0
+        self.StartTime = time.time()
+        pool = multiprocessing.Pool(numShards)
+        results = pool.map(processShard, shardArgsList)
+        pool.close()
+        pool.join()
+        for (numShardEvents, errorHandler, profiler) in results:
+            self.NumEvents += numShardEvents
+            self.ErrorHandler.merge(errorHandler)
+            if profiler is not None:
+                self.Profiler.merge(profiler)
+        self.StopTime = time.time()
+        logger.info('Merging %d shards into %s...' %\
+                    (numShards, self.OutputFilePath))
+        # The (empty) tree from the constructor is overwritten by the merge.
+        self.TreeMaker.close()
+        chain = ROOT.TChain(FAST_MON_TREE_NAME)
+        for shardArgs in shardArgsList:
+            chain.Add(shardArgs[2])
+        tmin = chain.GetMinimum("event_timestamp")
+        tmax = chain.GetMaximum("event_timestamp")
+        chain.Merge(self.OutputFilePath, 'fast')
+        for shardArgs in shardArgsList:
+            os.remove(shardArgs[2])
+        if self.InputFilePath.endswith('.lsf'):
+            self.checkShardedTimestamps(eventIndex)
+        self.__closeRun(int(tmax - tmin))
 
     ## @brief Start the event loop for lsf files.
     ## @param self
@@ -229,12 +486,16 @@ class pDataProcessor:
     
     def startLSFProcessing(self, maxEvents):
         while (self.NumEvents != maxEvents):
+            self.__startStage('reader')
             try:
                 (meta, event) = self.LsfMerger.getUncompressedEvent()
             except TypeError:
                 logger.info('End of file reached.')
                 break
+            self.__stopStage('reader')
+            self.__startStage('meta_context')
             self.MetaEventProcessor.process(meta)
+            self.__stopStage('meta_context')
             self.processEvent(event)
         self.finalize()
 
@@ -248,6 +509,7 @@ class pDataProcessor:
     def startEvtProcessing(self, maxEvents):
         self.EvtMetaContextProcessor.setEvtReader(self.EvtReader)
         while (self.NumEvents != maxEvents):
+            self.__startStage('reader')
             evt = self.EvtReader.nextEvent()
             if evt.isNull():
                 logger.info("End of File reached.")
@@ -264,6 +526,7 @@ class pDataProcessor:
                 meta = None
 	    context = evt.ctx()
 	    buff = evt.ebf().copyData()
+            self.__stopStage('reader')
 	    self.processEvt(meta, context, buff)
         self.finalize()
 
@@ -275,6 +538,7 @@ class pDataProcessor:
     
     def startLDFProcessing(self, maxEvents):
         while (self.NumEvents != maxEvents):
+            self.__startStage('reader')
     	    event = self.LdfFile.read(8)
     	    if len(event) < 8:
     	      logger.info("End of File reached.")
@@ -282,10 +546,13 @@ class pDataProcessor:
     	    else:
     	      (identity, length) = struct.unpack('!LL', event)
     	      event += self.LdfFile.read(length - 8)
+              self.__stopStage('reader')
               self.__preEvent()
+              self.__startStage('iterator')
               self.LatDataBufIter.iterate(event, len(event))
-              self.TreeMaker.getVariable('meta_context_gem_scalers_sequence')[0] = self.NumEvents
-              self.__postEvent()
+              self.__stopStage('iterator')
+              self.TreeMaker.getVariable('meta_context_gem_scalers_sequence')[0] = self.FirstEvent + self.NumEvents
+              self.__postEvent(event)
               #self.processEvent(event)
         self.finalize()
 
@@ -299,8 +566,10 @@ class pDataProcessor:
  
     def processEvent(self, event):
         self.__preEvent()
+        self.__startStage('iterator')
 	self.LatDataBufIter.iterate(event, len(event))
-        self.__postEvent()
+        self.__stopStage('iterator')
+        self.__postEvent(event)
 
     ## @brief Special event processing for evt files.
     ## @param self
@@ -312,18 +581,29 @@ class pDataProcessor:
     ## @param buff
     #  The buff object of type LDF.EBFeventIterator
     #
-    # If a magic7 file is provided, the space craft position and the
-    # corresponding geomagnetic quantities are updated every 5 seconds
+    # If a magic7 file is provided, the space craft position (interpolated
+    # at the event time) and the corresponding geomagnetic quantities are
+    # updated every SCPositionUpdateInterval seconds, i.e.
+    # FASTMON_SC_POSITION_UPDATE_INTERVAL with the full IGRF model and
+    # FASTMON_SC_POSITION_UPDATE_INTERVAL_GRID when a geomagnetic grid is loaded
     
     def processEvt(self, meta, context, buff):
         self.__preEvent()
+        self.__startStage('meta_context')
         self.EvtMetaContextProcessor.process(meta, context)
+        self.__stopStage('meta_context')
+        self.__startStage('iterator')
 	self.EbfEventIter.iterate(buff, len(buff), False)
+        self.__stopStage('iterator')
         timestamp = self.TreeMaker.getVariable('event_timestamp')
         if self.M7Parser is not None and self.M7Parser.HasData:
-	    if (timestamp - self.PrevTimestamp) > 5:
-                position = self.M7Parser.getSCPosition((timestamp, 0))
+	    if (timestamp - self.PrevTimestamp) >\
+                   self.SCPositionUpdateInterval:
+                self.__startStage('geomag')
+                position = self.M7Parser.getInterpolatedSCPosition(\
+                    (float(timestamp[0]), 0))
                 self.GeomagProcessor.process(position)
+                self.__stopStage('geomag')
 	        # Need to copy the value, not to let python use a reference !
 		self.PrevTimestamp = copy(timestamp)
         self.__postEvent(buff)
@@ -331,7 +611,7 @@ class pDataProcessor:
     def __preEvent(self):
         self.TreeMaker.resetVariables()
 	self.TreeMaker.VariablesDictionary['processor_event_number'][0] =\
-                       self.NumEvents
+                       self.FirstEvent + self.NumEvents
 
     ## @brief Post event processing 
     #
@@ -351,16 +631,23 @@ class pDataProcessor:
         # compatibility
 	try:
 	    if FASTMON_DUMP_ERRORS_TO_FILE and \
-                    self.ErrorHandler.ErrorsBuffer != []:
+                    self.ErrorHandler.getNumBufferedErrors() > 0:
 	        self.__dumpEventToFile(buff)
         except:
 	    pass
 
+        if self.Profiler is not None:
+            self.Profiler.fillEvent(len(buff),\
+                                    self.ErrorHandler.getNumBufferedErrors())
+        self.__startStage('error_flush')
         error_summary = self.ErrorHandler.flushErrorsBuffer(\
              self.TreeMaker.getVariable('meta_context_gem_scalers_sequence')[0])
 	self.TreeMaker.getVariable('error_summary')[0]=error_summary
+        self.__stopStage('error_flush')
 	
+        self.__startStage('tree_fill')
         self.TreeMaker.fillTree()
+        self.__stopStage('tree_fill')
 	self.NumEvents += 1
 	if not self.NumEvents % 100:
             elapsedTime = time.time() - self.StartTime
@@ -378,8 +665,6 @@ class pDataProcessor:
     
     def finalize(self):
         self.StopTime = time.time()
-        elapsedTime   = self.StopTime - self.StartTime
-        averageRate   = self.NumEvents/elapsedTime        
 
 	# For the ErrorHandler get the number of seconds elapsed, assuming
         # counters are fine... 
@@ -388,14 +673,27 @@ class pDataProcessor:
 	delta_time = int(tmax-tmin)
 	#Now closing the TTree
 	self.TreeMaker.close()
+        self.__closeRun(delta_time)
 
+    ## @brief Print out the run statistics and write the error xml file.
+    ## @param self
+    #  The class instance.
+    ## @param deltaTime
+    #  The number of seconds elapsed between the first and the last event.
+
+    def __closeRun(self, deltaTime):
+        elapsedTime   = self.StopTime - self.StartTime
+        averageRate   = self.NumEvents/elapsedTime        
         logger.info('Processing stopped on %s.' % time.asctime())
         logger.info('%d events processed in %.2f s (%.2f Hz).\n' %\
                     (self.NumEvents, elapsedTime, averageRate))
+        if self.Profiler is not None:
+            logger.info('Time spent per processing stage:\n%s' % self.Profiler)
 	
         self.ErrorHandler.NumProcessedEvents = self.NumEvents
-        self.ErrorHandler.SecondsElapsed     = delta_time
-        self.ErrorHandler.writeXmlOutput(self.OutputErrorFilePath)
+        self.ErrorHandler.SecondsElapsed     = deltaTime
+        if self.OutputErrorFilePath is not None:
+            self.ErrorHandler.writeXmlOutput(self.OutputErrorFilePath)
 
     ## @brief Dump an event buffer to a file
     #
@@ -439,15 +737,46 @@ class pDataProcessor:
         writer.writeTag('elapsed_time', {}, elapsedTime)
         writer.writeTag('average_rate', {}, averageRate)
         #writer.writeTag('current_time', {}, time.asctime())
+        if self.Profiler is not None:
+            self.Profiler.writeXml(writer)
         writer.backup()
         writer.closeTag('pDataProcessorSummary')
         writer.closeFile()
 
 
+
+## @brief Process a single shard of the input file.
+#
+#  This is the function executed by the worker processes in a parallel run
+#  (see pDataProcessor.startShardedProcessing()); it is defined at the module
+#  level so that it can be dispatched through a multiprocessing pool.
+## @param shardArgs
+#  Tuple (inputFilePath, configFilePath, outputFilePath, inputMagic7FilePath,
+#  saaDefinitionFile, firstEvent, numEvents, profile, geomagGridFilePath,
+#  magic7CacheFilePath, firstEventOffset).
+
+def processShard(shardArgs):
+    (inputFilePath, configFilePath, outputFilePath, inputMagic7FilePath,\
+     saaDefinitionFile, firstEvent, numEvents, profile,\
+     geomagGridFilePath, magic7CacheFilePath, firstEventOffset) = shardArgs
+    dataProcessor = pDataProcessor(inputFilePath, configFilePath,\
+                                   outputFilePath, None, None,\
+                                   inputMagic7FilePath, saaDefinitionFile,\
+                                   geomagGridFilePath, magic7CacheFilePath)
+    # The errors are merged and written out by the parent processor.
+    dataProcessor.OutputErrorFilePath = None
+    dataProcessor.FirstEvent = firstEvent
+    dataProcessor.FirstEventOffset = firstEventOffset
+    if profile:
+        dataProcessor.enableProfiling()
+    dataProcessor.startProcessing(numEvents)
+    return (dataProcessor.NumEvents, dataProcessor.ErrorHandler,\
+            dataProcessor.Profiler)
+
     
 if __name__ == '__main__':
     from pOptionParser import pOptionParser
-    optparser = pOptionParser('cnorvVpems', 1, 1, False)
+    optparser = pOptionParser('cnorvVpemsjPgM', 1, 1, False)
     if optparser.Options.o == None:
         optparser.error('the -o option is mandatory. Exiting...')
     if optparser.Options.p == optparser.Options.o:
@@ -458,8 +787,14 @@ if __name__ == '__main__':
     dataProcessor = pDataProcessor(optparser.Argument, optparser.Options.c,\
                                    optparser.Options.o, optparser.Options.p,\
                                    optparser.Options.e, optparser.Options.m,
-                                   optparser.Options.s)
-    dataProcessor.startProcessing(optparser.Options.n)
+                                   optparser.Options.s, optparser.Options.g,
+                                   optparser.Options.M)
+    if optparser.Options.P:
+        dataProcessor.enableProfiling()
+    dataProcessor.startProcessing(optparser.Options.n, optparser.Options.j)
+    if optparser.Options.P:
+        dataProcessor.Profiler.writeCsv('%s.profile.csv' %\
+            os.path.splitext(dataProcessor.OutputFilePath)[0])
     if optparser.Options.p != None:
         dataProcessor.TreeProcessor.run()
     if optparser.Options.r:
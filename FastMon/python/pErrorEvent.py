@@ -44,6 +44,23 @@ def getBitNumber(errorCode):
 
 GTCC_FIFO_ERROR_BIT = getBitNumber('GTCC_FIFO_ERROR')
 
+def getSummaryMask(errorCode):
+    return (1 << getBitNumber(errorCode))
+
+## @brief Return whether an error summary only has the GTCC FIFO bit set.
+
+def hasOnlyGTCCFIFOErrors(errorSummary):
+    return bool(errorSummary == (0x1 << GTCC_FIFO_ERROR_BIT))
+
+## @brief Return whether an error summary has unusual errors (i.e. anything
+#  beyond the TimeTone bits, except for the TEM bug and the GTCC FIFO errors).
+
+def hasUnusualErrors(errorSummary):
+    if not (errorSummary & getSummaryMask('TEM_BUG')) and\
+       not hasOnlyGTCCFIFOErrors(errorSummary):
+        return (errorSummary >= 2**8)
+    return False
+
 
 class pErrorEvent:
 
@@ -53,7 +70,7 @@ class pErrorEvent:
         self.ErrorSummary = 0
 
     def assertSummaryBit(self, errorCode):
-        self.ErrorSummary |= (1 << getBitNumber(errorCode))
+        self.ErrorSummary |= getSummaryMask(errorCode)
 
     def hasErrors(self):
         return self.ErrorSummary > 0
@@ -62,12 +79,10 @@ class pErrorEvent:
         return bool((self.ErrorSummary >> getBitNumber(errorCode)) & 1)
 
     def hasOnlyGTCCFIFOErrors(self):
-        return bool(self.ErrorSummary == (0x1 << GTCC_FIFO_ERROR_BIT))
+        return hasOnlyGTCCFIFOErrors(self.ErrorSummary)
 
     def hasUnusualErrors(self):
-        if not self.hasError('TEM_BUG') and not self.hasOnlyGTCCFIFOErrors():
-	    return (self.ErrorSummary >= 2**8) 
-	return False
+        return hasUnusualErrors(self.ErrorSummary)
 
     def addError(self, error):
         self.ErrorsList.append(error)
@@ -3,62 +3,357 @@
 import pSafeLogger
 logger = pSafeLogger.getLogger('pErrorHandler')
 
+import os
 import time
 import sys
 import cPickle
+import tempfile
+import numpy
 import pUtils
 
 from pError      import pError
-from pErrorEvent import pErrorEvent
+from pErrorEvent import pErrorEvent, ERROR_BITS_DICT, getSummaryMask,\
+     hasUnusualErrors, hasOnlyGTCCFIFOErrors
+
+## @brief Default maximum number of error events stored in detail (the
+#  per-code counters are always complete).
 
 MAX_ERROR_EVENTS = 500
 
+## @brief Maximum number of parameters stored for each error (the parameters
+#  in excess are dropped).
+
+MAX_ERROR_PARAMETERS = 8
+
+## @brief Initial size (in errors) of the per-event error buffer (which is
+#  enlarged on demand).
+
+ERROR_BUFFER_SIZE = 64
+
+## @brief Range of the integer parameters which can be stored as such.
+
+MIN_INTEGER_PARAMETER = -2**63
+MAX_INTEGER_PARAMETER = 2**63 - 1
+
+## @brief Fixed-width record describing an error.
+#
+#  The error code is stored as an index into the handler list of codes and
+#  the parameters as integers; the parameters which are not integers (e.g.
+#  the LDF error names) are stored as indices into the handler list of
+#  strings, and flagged in the string mask.
+
+ERROR_RECORD_DTYPE = numpy.dtype([('code', 'i2'),
+                                  ('num_parameters', 'u1'),
+                                  ('string_mask', 'u1'),
+                                  ('parameters', 'i8', (MAX_ERROR_PARAMETERS,))
+                                  ])
+
+## @brief Return whether an error parameter is stored as an integer.
+#
+#  Only genuine integers are: everything else (including bools, floats and
+#  numeric strings, which numpy would silently convert) is stored as a
+#  string.
+
+def isIntegerParameter(parameter):
+    return (type(parameter) in (int, long) or\
+            isinstance(parameter, numpy.integer)) and\
+            MIN_INTEGER_PARAMETER <= parameter <= MAX_INTEGER_PARAMETER
+
+
 class pErrorHandler:
 
-    def __init__(self):
+    ## @brief Constructor.
+    #
+    #  The errors of the current event are written as fixed-width records
+    #  into a preallocated buffer, together with the (uint32) error summary;
+    #  at the end of the event the per-code counters are updated and the
+    #  records are appended, up to maxErrorEvents events, to an anonymous
+    #  temporary (spill) file. pError and pErrorEvent objects are only
+    #  created when the details are needed (xml output, report, log).
+    ## @param maxErrorEvents
+    #  The maximum number of error events stored in detail.
+    ## @param spillDirPath
+    #  The directory for the spill file (the system default if None).
+
+    def __init__(self, maxErrorEvents = MAX_ERROR_EVENTS, spillDirPath = None):
         self.NumProcessedEvents = 'n/a'
         self.SecondsElapsed     = 'n/a'
-        self.ErrorCountsDict = {}
-        self.ErrorEventsList = []
-        self.ErrorsBuffer = []
+        self.MaxErrorEvents = maxErrorEvents
+        self.SpillDirPath = spillDirPath
+        self.ErrorCodes = []
+        self.ErrorCodeIndexDict = {}
+        self.ErrorMasks = []
+        self.ErrorCounts = numpy.zeros(0, 'i8')
+        self.ErrorEventCounts = numpy.zeros(0, 'i8')
+        for errorCode in sorted(ERROR_BITS_DICT.keys()):
+            self.addErrorCode(errorCode)
+        self.Strings = []
+        self.StringIndexDict = {}
+        self.NumErrorEvents = 0
+        self.NumGTCCFIFOErrorEvents = 0
+        self.NumStoredErrorEvents = 0
+        self.StoredEventNumbers = numpy.zeros(maxErrorEvents, 'i8')
+        self.StoredEventSummaries = numpy.zeros(maxErrorEvents, 'u4')
+        self.StoredEventNumErrors = numpy.zeros(maxErrorEvents, 'i4')
+        self.SpillFile = None
+        self.allocateErrorsBuffer(ERROR_BUFFER_SIZE)
+
+    ## @brief Allocate the per-event error buffer (and the views on its
+    #  fields used by fill()).
+
+    def allocateErrorsBuffer(self, size):
+        self.ErrorsBuffer = numpy.zeros(size, ERROR_RECORD_DTYPE)
+        self.BufferCodes = self.ErrorsBuffer['code']
+        self.BufferNumParameters = self.ErrorsBuffer['num_parameters']
+        self.BufferStringMasks = self.ErrorsBuffer['string_mask']
+        self.BufferParameters = self.ErrorsBuffer['parameters']
+        self.NumBufferedErrors = 0
+        self.BufferSummary = 0
+
+    ## @brief Double the size of the error buffer, preserving its content.
+
+    def enlargeErrorsBuffer(self):
+        numErrors = self.NumBufferedErrors
+        summary = self.BufferSummary
+        errorsBuffer = self.ErrorsBuffer
+        self.allocateErrorsBuffer(2*len(errorsBuffer))
+        self.ErrorsBuffer[:numErrors] = errorsBuffer[:numErrors]
+        self.NumBufferedErrors = numErrors
+        self.BufferSummary = summary
+
+    ## @brief Register a new error code and return its index.
+
+    def addErrorCode(self, errorCode):
+        index = len(self.ErrorCodes)
+        self.ErrorCodes.append(errorCode)
+        self.ErrorCodeIndexDict[errorCode] = index
+        self.ErrorMasks.append(getSummaryMask(errorCode))
+        self.ErrorCounts = numpy.append(self.ErrorCounts, 0)
+        self.ErrorEventCounts = numpy.append(self.ErrorEventCounts, 0)
+        return index
 
-    ## @brief Fill the summary dictionary (indexed by error code)
-    #  and the error buffer, with which the error event will be filled
-    #  when the flushErrorBuffer() method is called.
+    ## @brief Return the index of a (non-integer) parameter in the list of
+    #  strings, registering it if needed.
+
+    def getStringIndex(self, parameter):
+        parameter = str(parameter)
+        try:
+            return self.StringIndexDict[parameter]
+        except KeyError:
+            self.StringIndexDict[parameter] = len(self.Strings)
+            self.Strings.append(parameter)
+            return len(self.Strings) - 1
+
+    ## @brief Fill the error buffer, with which the error event will be
+    #  filled when the flushErrorBuffer() method is called.
 
     def fill(self, errorCode, parameters=[]):
-        error = pError(errorCode, parameters)
         try:
-            self.ErrorCountsDict[errorCode] += 1
+            index = self.ErrorCodeIndexDict[errorCode]
         except KeyError:
-            self.ErrorCountsDict[errorCode] = 1
-        self.ErrorsBuffer.append(error)
-        
+            index = self.addErrorCode(errorCode)
+        row = self.NumBufferedErrors
+        if row == len(self.ErrorsBuffer):
+            self.enlargeErrorsBuffer()
+        self.BufferCodes[row] = index
+        self.BufferSummary |= self.ErrorMasks[index]
+        parameters = parameters[:MAX_ERROR_PARAMETERS]
+        numParameters = len(parameters)
+        self.BufferNumParameters[row] = numParameters
+        stringMask = 0
+        for (i, parameter) in enumerate(parameters):
+            if not isIntegerParameter(parameter):
+                stringMask |= (1 << i)
+        self.BufferStringMasks[row] = stringMask
+        if stringMask == 0:
+            self.BufferParameters[row, :numParameters] = parameters
+        else:
+            for (i, parameter) in enumerate(parameters):
+                if (stringMask >> i) & 1:
+                    parameter = self.getStringIndex(parameter)
+                self.BufferParameters[row, i] = parameter
+        self.NumBufferedErrors += 1
+
+    ## @brief Return the number of errors in the buffer (i.e. for the event
+    #  being processed).
+
+    def getNumBufferedErrors(self):
+        return self.NumBufferedErrors
+
     ## @brief Method to be called *at the end* of the event processing,
     #  when all the errors have been detected.
     #
-    #  At this point an ErrorEvent object is created (with the correct event
-    #  id) and all the errors in the buffer are dumped into it.
+    #  Return the error summary of the event and reset the buffer.
     #  Ready for the next event!
 
     def flushErrorsBuffer(self, eventNumber):
-        if self.ErrorsBuffer != []:
-            errorEvent = pErrorEvent(eventNumber)
-            for error in self.ErrorsBuffer:
-                errorEvent.addError(error)
-            if errorEvent.hasUnusualErrors():
-	        logger.info('Unsual errors found, probably just a phase error.')
-		logger.info(errorEvent.getAsText())
-	    self.ErrorEventsList.append(errorEvent)
-            self.ErrorsBuffer = []
-            return errorEvent.ErrorSummary
-        return 0
+        numErrors = self.NumBufferedErrors
+        if numErrors == 0:
+            return 0
+        errorSummary = self.BufferSummary
+        codes = self.BufferCodes[:numErrors]
+        self.ErrorCounts += numpy.bincount(codes,
+                                           minlength = len(self.ErrorCodes))
+        self.ErrorEventCounts[numpy.unique(codes)] += 1
+        self.NumErrorEvents += 1
+        if hasUnusualErrors(errorSummary):
+            logger.info('Unsual errors found, probably just a phase error.')
+            logger.info(self.getErrorEvent(eventNumber,\
+                                           self.ErrorsBuffer[:numErrors]).getAsText())
+        self.storeErrorEvent(eventNumber, errorSummary,
+                             self.ErrorsBuffer[:numErrors])
+        self.NumBufferedErrors = 0
+        self.BufferSummary = 0
+        return errorSummary
+
+    ## @brief Store the error records of an event into the spill file, unless
+    #  the maximum number of stored error events has been reached.
+    #
+    #  Events with only GTCC FIFO errors are never written out in detail,
+    #  so they are not stored (and don't count toward the maximum).
+
+    def storeErrorEvent(self, eventNumber, errorSummary, records):
+        if hasOnlyGTCCFIFOErrors(errorSummary):
+            self.NumGTCCFIFOErrorEvents += 1
+            return
+        if self.NumStoredErrorEvents >= self.MaxErrorEvents:
+            return
+        if self.SpillFile is None:
+            self.SpillFile = tempfile.TemporaryFile(dir = self.SpillDirPath)
+        records.tofile(self.SpillFile)
+        self.StoredEventNumbers[self.NumStoredErrorEvents] = eventNumber
+        self.StoredEventSummaries[self.NumStoredErrorEvents] = errorSummary
+        self.StoredEventNumErrors[self.NumStoredErrorEvents] = len(records)
+        self.NumStoredErrorEvents += 1
+
+    ## @brief Return the array of all the stored error records.
+
+    def getStoredRecords(self):
+        if self.SpillFile is None:
+            return numpy.zeros(0, ERROR_RECORD_DTYPE)
+        self.SpillFile.flush()
+        self.SpillFile.seek(0)
+        records = numpy.fromfile(self.SpillFile, ERROR_RECORD_DTYPE)
+        self.SpillFile.seek(0, os.SEEK_END)
+        return records
+
+    ## @brief Return the parameters of an error record as a list.
+
+    def getParameters(self, record):
+        parameters = []
+        for i in xrange(record['num_parameters']):
+            parameter = int(record['parameters'][i])
+            if (record['string_mask'] >> i) & 1:
+                parameter = self.Strings[parameter]
+            parameters.append(parameter)
+        return parameters
+
+    ## @brief Materialize a pErrorEvent object out of an array of error
+    #  records.
+
+    def getErrorEvent(self, eventNumber, records):
+        errorEvent = pErrorEvent(eventNumber)
+        for record in records:
+            errorEvent.addError(pError(self.ErrorCodes[record['code']],\
+                                       self.getParameters(record)))
+        return errorEvent
+
+    ## @brief Iterate over the stored error events (pErrorEvent objects are
+    #  created on the fly).
+
+    def getErrorEvents(self):
+        records = self.getStoredRecords()
+        offset = 0
+        for i in xrange(self.NumStoredErrorEvents):
+            numErrors = self.StoredEventNumErrors[i]
+            yield self.getErrorEvent(int(self.StoredEventNumbers[i]),\
+                                     records[offset:offset + numErrors])
+            offset += numErrors
+
+    ## @brief Return the dictionary of the number of errors, indexed by
+    #  error code.
+
+    def getErrorCountsDict(self):
+        return self.getCountsDict(self.ErrorCounts)
+
+    ## @brief Return the dictionary of the number of events with a given error,
+    #  indexed by error code.
+
+    def getErrorEventCountsDict(self):
+        return self.getCountsDict(self.ErrorEventCounts)
+
+    def getCountsDict(self, counts):
+        countsDict = {}
+        for index in numpy.flatnonzero(counts):
+            countsDict[self.ErrorCodes[index]] = int(counts[index])
+        return countsDict
+
+    ## @brief Merge the content of another error handler (e.g. the one of a
+    #  shard of a parallel run) into this one.
+    #
+    #  Error events are appended, so handlers must be merged in event order.
+    #  The code and string indices of the other handler are translated.
+
+    def merge(self, errorHandler):
+        codeMap = numpy.zeros(len(errorHandler.ErrorCodes), 'i2')
+        for (index, errorCode) in enumerate(errorHandler.ErrorCodes):
+            try:
+                codeMap[index] = self.ErrorCodeIndexDict[errorCode]
+            except KeyError:
+                codeMap[index] = self.addErrorCode(errorCode)
+        numpy.add.at(self.ErrorCounts, codeMap, errorHandler.ErrorCounts)
+        numpy.add.at(self.ErrorEventCounts, codeMap,\
+                     errorHandler.ErrorEventCounts)
+        self.NumErrorEvents += errorHandler.NumErrorEvents
+        self.NumGTCCFIFOErrorEvents += errorHandler.NumGTCCFIFOErrorEvents
+        records = errorHandler.getStoredRecords()
+        records['code'] = codeMap[records['code']]
+        if len(errorHandler.Strings):
+            stringMap = numpy.array([self.getStringIndex(string) for string\
+                                     in errorHandler.Strings], 'i8')
+            for i in xrange(MAX_ERROR_PARAMETERS):
+                mask = ((records['string_mask'] >> i) & 1).astype(bool)
+                records['parameters'][mask, i] =\
+                    stringMap[records['parameters'][mask, i]]
+        offset = 0
+        for i in xrange(errorHandler.NumStoredErrorEvents):
+            numErrors = errorHandler.StoredEventNumErrors[i]
+            self.storeErrorEvent(errorHandler.StoredEventNumbers[i],\
+                                 errorHandler.StoredEventSummaries[i],\
+                                 records[offset:offset + numErrors])
+            offset += numErrors
+
+    ## @brief Pickling support (error handlers are sent back from the worker
+    #  processes of a parallel run): the stored records travel with the
+    #  object, since the spill file can't.
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ['SpillFile', 'ErrorsBuffer', 'BufferCodes',
+                    'BufferNumParameters', 'BufferStringMasks',
+                    'BufferParameters']:
+            del state[key]
+        state['StoredRecords'] = self.getStoredRecords()
+        return state
+
+    def __setstate__(self, state):
+        records = state.pop('StoredRecords')
+        self.__dict__.update(state)
+        self.allocateErrorsBuffer(ERROR_BUFFER_SIZE)
+        self.SpillFile = None
+        if len(records):
+            self.SpillFile = tempfile.TemporaryFile(dir = self.SpillDirPath)
+            records.tofile(self.SpillFile)
 
     def getNumErrors(self):
-        return sum(self.ErrorCountsDict.values())
+        return int(self.ErrorCounts.sum())
 
     def getNumErrorEvents(self):
-        return len(self.ErrorEventsList)
+        return self.NumErrorEvents
+
+    def isTruncated(self):
+        return self.NumErrorEvents - self.NumGTCCFIFOErrorEvents >\
+               self.NumStoredErrorEvents
  
     def writeXmlOutput(self, filename):
         try:
@@ -66,7 +361,6 @@ class pErrorHandler:
         except:
             logger.error("Can not find pXmlWriter module. Exit.")
             return None
-        truncated = self.getNumErrorEvents() > MAX_ERROR_EVENTS
         xmlWriter  = pXmlWriter(filename)
         xmlWriter.openTag('errorContribution')
         xmlWriter.indent()
@@ -74,14 +368,11 @@ class pErrorHandler:
         xmlWriter.writeComment('Summary by error code')
         xmlWriter.openTag('errorSummary')
         xmlWriter.indent()
-        for (errorCode, numErrors) in self.ErrorCountsDict.items():
-            numEvents = 0
-            for errorEvent in self.ErrorEventsList:
-                if errorEvent.hasError(errorCode):
-                    numEvents += 1
+        errorEventCountsDict = self.getErrorEventCountsDict()
+        for (errorCode, numErrors) in self.getErrorCountsDict().items():
             xmlWriter.writeTag('errorType', {'code':errorCode,
                                              'quantity': numErrors,
-                                             'events': numEvents
+                                             'events': errorEventCountsDict.get(errorCode, 0)
                                              })
         xmlWriter.backup()
         xmlWriter.closeTag('errorSummary')
@@ -91,9 +382,9 @@ class pErrorHandler:
                           {'num_error_events'      : self.getNumErrorEvents(),
                            'num_processed_events'  : self.NumProcessedEvents,
                            'seconds_elapsed'       : self.SecondsElapsed,
-                           'truncated'             : truncated})
+                           'truncated'             : self.isTruncated()})
         xmlWriter.indent()
-        for errorEvent in self.ErrorEventsList:
+        for errorEvent in self.getErrorEvents():
             if not errorEvent.hasOnlyGTCCFIFOErrors():
                 xmlWriter.openTag('errorEvent',\
                                       {'eventNumber': errorEvent.EventNumber})
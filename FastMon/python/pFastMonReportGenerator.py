@@ -55,7 +55,7 @@ class pFastMonBaseReportGenerator(pBaseReportGenerator):
         self.write('Here is the number of errors found in the run ' +\
                    '(indexed by error code)', pageLabel)
         self.newline(pageLabel)
-        dictionary = self.ErrorHandler.ErrorCountsDict
+        dictionary = self.ErrorHandler.getErrorCountsDict()
         if len(dictionary):
             self.addDictionary('Summary by error code', dictionary, pageLabel)
         else:
@@ -70,7 +70,7 @@ class pFastMonBaseReportGenerator(pBaseReportGenerator):
                    pageLabel)
         self.newline(pageLabel)
         if self.ErrorHandler.getNumErrorEvents() > 0:
-            for errorEvent in self.ErrorHandler.ErrorEventsList:
+            for errorEvent in self.ErrorHandler.getErrorEvents():
                 self.addDictionary('Event %d' %\
                                        errorEvent.EventNumber,\
                                        errorEvent.getErrorsDict(),\
@@ -4,6 +4,7 @@ import pSafeLogger
 logger = pSafeLogger.getLogger('pFastMonTreeProcessor')
 
 from pBaseTreeProcessor   import pBaseTreeProcessor
+from pMultiHistogramFiller import pMultiHistogramFiller
 from pFastMonTreeMaker    import FAST_MON_TREE_NAME
 from pCustomPlotter       import pCustomPlotter
 from pRootFileManager     import pRootFileManager
@@ -35,8 +36,12 @@ class pFastMonTreeProcessor(pBaseTreeProcessor):
     #  The class instance.
     #
     ## Sorting the keys before creating the plots
+    #
+    ## The histograms are filled all together, reading the tree once, by a
+    #  pMultiHistogramFiller (custom plots excepted).
 
     def createObjects(self):
+        filler = pMultiHistogramFiller(self.RootTree)
         keys = self.XmlParser.EnabledPlotRepsDict.keys()
 	keys.sort()
 	for key in keys:
@@ -44,8 +49,9 @@ class pFastMonTreeProcessor(pBaseTreeProcessor):
             logger.debug('%s processing.' % rep.getName())
 	    if rep.__class__.__name__ == 'pCUSTOMXmlRep':
                 rep.setPlotter(self.CustomPlotter)
-            rep.createRootObjects(self.RootTree)
+            rep.createRootObjects(self.RootTree, filler)
             logger.debug('%s done.' % rep.getName())
+        filler.run()
 
 
 
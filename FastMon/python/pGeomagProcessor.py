@@ -32,17 +32,26 @@ class pGeomagProcessor:
     #  The class instance.
     ## @param treeMaker
     #  The Tree maker object
+    ## @param gridFilePath
+    #  Optional path to a precomputed grid of the geomagnetic quantities
+    #  (see IGRFGrid), to be used in place of the full IGRF model.
 
-    def __init__(self, treeMaker):
+    def __init__(self, treeMaker, gridFilePath = None):
 
         ## @var TreeMaker
         ## @brief The Tree maker object
 
         ## @var FieldModel
         ## @brief The GeoMagnetic Field Model created using the IGRF library
+        #  (or the interpolated IGRFGrid, which has the same interface).
 
         self.TreeMaker = treeMaker
-        self.FieldModel = IGRF()
+        if gridFilePath is None:
+            self.FieldModel = IGRF()
+        else:
+            from IGRFGrid import IGRFGrid
+            logger.info('Using geomagnetic grid : %s' % gridFilePath)
+            self.FieldModel = IGRFGrid(gridFilePath)
 
     ## @brief Return the tree branch corresponding to the variable name
     ## @param self
@@ -4,11 +4,11 @@
 import LDF
 from pGlobals  import *
 
-from pTKRcontributionIterator     import pTKRcontributionIterator
-from pCALcontributionIterator     import pCALcontributionIterator
-from pAEMcontributionIterator     import pAEMcontributionIterator
 from pERRcontributionIteratorBase import pERRcontributionIteratorBase
-from pGEMcontribution             import pGEMcontribution
+from pContributionFactory         import pTKRcontributionIteratorFactory
+from pContributionFactory         import pCALcontributionIteratorFactory
+from pContributionFactory         import pAEMcontributionIteratorFactory
+from pContributionFactory         import pGEMcontributionFactory
 
 import pSafeLogger
 logger = pSafeLogger.getLogger('pLATcomponentIterator')
@@ -26,8 +26,11 @@ class pLATcomponentIterator(LDF.LATcomponentIterator):
     #  of the output ROOT tree.
     ## @param errorHandler
     #  The pErrorHandler responsible for keeping track of the errors.
+    ## @param xmlParser
+    #  The pXmlParser object defining the variables to be filled by the
+    #  event contributions.
   
-    def __init__(self, treeMaker, errorHandler):
+    def __init__(self, treeMaker, errorHandler, xmlParser):
 
         ## @var TreeMaker
         ## @brief The pRootTreeMaker object responsible for the creation
@@ -36,10 +39,35 @@ class pLATcomponentIterator(LDF.LATcomponentIterator):
         ## @var ErrorHandler
         ## @brief The pErrorHandler responsible for keeping track of
         #  the errors.
+
+        ## @var TKRcontributionIterator
+        ## @brief The TKR contribution iterator class.
+
+        ## @var CALcontributionIterator
+        ## @brief The CAL contribution iterator class.
+
+        ## @var AEMcontributionIterator
+        ## @brief The ACD contribution iterator class.
+
+        ## @var GEMcontribution
+        ## @brief The GEM contribution class.
+
+        ## @var Profiler
+        ## @brief The pStageProfiler object timing the contributions (None
+        #  unless profiling is enabled).
         
         LDF.LATcomponentIterator.__init__(self)
         self.TreeMaker    = treeMaker
         self.ErrorHandler = errorHandler
+        self.TKRcontributionIterator =\
+             pTKRcontributionIteratorFactory(xmlParser).getClass()
+        self.CALcontributionIterator =\
+             pCALcontributionIteratorFactory(xmlParser).getClass()
+        self.AEMcontributionIterator =\
+             pAEMcontributionIteratorFactory(xmlParser).getClass()
+        self.GEMcontribution =\
+             pGEMcontributionFactory(xmlParser).getClass()
+        self.Profiler = None
 
     ## @brief Implementation of the GEM component.
     ## @param self
@@ -50,10 +78,14 @@ class pLATcomponentIterator(LDF.LATcomponentIterator):
     #  The contribution object.
 
     def GEMcomponent(self, event, contribution):
-        gemContribution = pGEMcontribution(event, contribution,\
-                                           self.TreeMaker     ,\
-                                           self.ErrorHandler)
+        if self.Profiler is not None:
+            self.Profiler.start('GEM')
+        gemContribution = self.GEMcontribution(event, contribution,\
+                                               self.TreeMaker     ,\
+                                               self.ErrorHandler)
         gemContribution.fillEventContribution()
+        if self.Profiler is not None:
+            self.Profiler.stop('GEM')
         return 0 
 
     ## @brief Implementation of the TKR component.
@@ -65,15 +97,19 @@ class pLATcomponentIterator(LDF.LATcomponentIterator):
     #  The contribution object.
         
     def TKRcomponent(self, event, contribution):
-        tkrIterator = pTKRcontributionIterator(event, contribution,\
-                                               self.TreeMaker     ,\
-                                               self.ErrorHandler)
+        if self.Profiler is not None:
+            self.Profiler.start('TKR')
+        tkrIterator = self.TKRcontributionIterator(event, contribution,\
+                                                  self.TreeMaker     ,\
+                                                  self.ErrorHandler)
 	rc     = tkrIterator.iterate()
 	status = tkrIterator.status()
 	# Note Trying to fill the event contribution only if the event has no error
         tkrIterator.fillEventContribution()
         if tkrIterator.diagnostic() is not None:
             self.TKRend(tkrIterator.diagnostic())
+        if self.Profiler is not None:
+            self.Profiler.stop('TKR')
         return 0
 
     ## @brief Implementation of the CAL component.
@@ -85,14 +121,18 @@ class pLATcomponentIterator(LDF.LATcomponentIterator):
     #  The contribution object.
     
     def CALcomponent(self, event, contribution):
-        calIterator = pCALcontributionIterator(event, contribution,\
-                                               self.TreeMaker     ,\
-                                               self.ErrorHandler)
+        if self.Profiler is not None:
+            self.Profiler.start('CAL')
+        calIterator = self.CALcontributionIterator(event, contribution,\
+                                                  self.TreeMaker     ,\
+                                                  self.ErrorHandler)
         rc     = calIterator.iterate() 
         status = calIterator.status() 
 	# Note Trying to fill the event contribution only if the event has no error
         calIterator.fillEventContribution()
         self.CALend(calIterator.CALend())
+        if self.Profiler is not None:
+            self.Profiler.stop('CAL')
         return 0
 
     ## @brief Implementation of the ACD component.
@@ -104,13 +144,17 @@ class pLATcomponentIterator(LDF.LATcomponentIterator):
     #  The contribution object.
 
     def ACDcomponent(self, event, contribution):
-        aemIterator = pAEMcontributionIterator(event, contribution,\
-                                               self.TreeMaker     ,\
-                                               self.ErrorHandler)
+        if self.Profiler is not None:
+            self.Profiler.start('ACD')
+        aemIterator = self.AEMcontributionIterator(event, contribution,\
+                                                  self.TreeMaker     ,\
+                                                  self.ErrorHandler)
         rc     = aemIterator.iterate()        
         status = aemIterator.status()        
 	# Note Trying to fill the event contribution only if the event has no error
 	aemIterator.fillEventContribution()
+        if self.Profiler is not None:
+            self.Profiler.stop('ACD')
         return 0
 
     ## @brief Implementation of the error component.
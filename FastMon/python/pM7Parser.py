@@ -28,17 +28,89 @@ logger = pSafeLogger.getLogger('pM7Parser')
 
 
 
-import time
-import math
 import os
 import sys
-import bisect
+import array
+import numpy
+import pSCCoordinates
 from pSCPosition import pSCPosition
 from pSAAPolygon import pSAAPolygon, pVertex
 
+## @brief Version of the binary cache format (bump it whenever the content
+#  of the cache changes, so that old cache files are ignored).
+
+M7_CACHE_VERSION = 2
+
+## @brief The arrays filled when parsing the file (and stored in the cache).
+
+M7_ARRAY_NAMES = ['TimePoints', 'MicroSeconds', 'YearFloats', 'Positions',
+                  'Velocities', 'Quaternions', 'OrbModes', 'OrbInSAA',
+                  'AttTimes', 'AttQuaternions']
+
+## @brief The position interpolation methods (see pM7Parser.interpolate()).
+
+INTERPOLATION_METHODS = ['linear', 'hermite']
+
+## @brief Maximum time difference (in s) between a requested time and the
+#  magic7 time span.
+
+M7_MAX_TIME_GAP = 60
+
+## @brief Convert an array.array into a numpy array (without copying).
+## @param data
+#  The array.array object.
+
+def toNumpyArray(data):
+    if not len(data):
+        return numpy.zeros(0, data.typecode)
+    return numpy.frombuffer(data, data.typecode)
+
+## @brief Return the bracketing grid points for an array of times.
+#
+#  Return the arrays of the lower and upper indices, of the fractional
+#  position between the two and of the grid step. Times outside the grid
+#  are clamped to the first (last) point.
+## @param grid
+#  The (sorted) array of grid times.
+## @param times
+#  The array of times.
+
+def getBrackets(grid, times):
+    lo = numpy.searchsorted(grid, times, 'right') - 1
+    lo = numpy.clip(lo, 0, max(len(grid) - 2, 0))
+    hi = numpy.minimum(lo + 1, len(grid) - 1)
+    step = grid[hi] - grid[lo]
+    frac = (times - grid[lo])/numpy.where(step > 0, step, 1.)
+    frac = numpy.where(step > 0, numpy.clip(frac, 0., 1.), 0.)
+    return (lo, hi, frac, step)
+
+## @brief Spherical linear interpolation between two arrays of quaternions.
+## @param q0
+#  The (n, 4) array of the quaternions at the lower points.
+## @param q1
+#  The (n, 4) array of the quaternions at the upper points.
+## @param frac
+#  The array of the fractional positions between the two.
+
+def slerp(q0, q1, frac):
+    dot = (q0*q1).sum(axis = 1)
+    # q and -q are the same rotation: take the shortest path.
+    q1 = numpy.where((dot < 0)[:, numpy.newaxis], -q1, q1)
+    theta = numpy.arccos(numpy.clip(numpy.abs(dot), 0., 1.))
+    sinTheta = numpy.sin(theta)
+    small = sinTheta < 1e-9
+    sinTheta = numpy.where(small, 1., sinTheta)
+    w0 = numpy.where(small, 1. - frac, numpy.sin((1. - frac)*theta)/sinTheta)
+    w1 = numpy.where(small, frac, numpy.sin(frac*theta)/sinTheta)
+    q = w0[:, numpy.newaxis]*q0 + w1[:, numpy.newaxis]*q1
+    return q/numpy.sqrt((q*q).sum(axis = 1))[:, numpy.newaxis]
+
 ## @brief The Magic7 parser implementation
 #
-#  The constructor needs a full path to a magic7 text file
+#  The constructor needs a full path to a magic7 text file.
+#  The file is read line by line and the content of the ORB messages
+#  (along with the latest attitude quaternion) is stored in numpy arrays;
+#  the pSCPosition objects are only created on request.
 
 class pM7Parser:
 
@@ -47,72 +119,156 @@ class pM7Parser:
     #  The class instance.
     ## @param inputFilePath
     #  The full path to the magic7 text file.
+    ## @param saaDefinitionFile
+    #  The path to the xml file defining the SAA polygon (optional).
+    ## @param cacheFilePath
+    #  The path to a binary (.npz) cache of the parsed arrays (optional).
+    #  The cache is used if it was written for the current modification time
+    #  of the magic7 file, and (re)written otherwise.
 
-    def __init__(self, inputFilePath, saaDefinitionFile):
+    def __init__(self, inputFilePath, saaDefinitionFile = None,
+                 cacheFilePath = None):
         ## @var m7FilePath
         ## @brief The magic7 file path
-	
-        ## @var m7FileContent
-        ## @brief The Magic7 file content is read in the constructor
-	
-	## @var SCPositionTable
-	## @brief The list of Space Craft Position is filled in when the file is parsed.
-	
+
+        ## @var CacheFilePath
+        ## @brief The path to the binary cache file (None if not used)
+
 	## @var TimePoints
-	## @brief The list of time stamps corresponding to each space craft position.
+	## @brief The array of time stamps (MET seconds) of the ORB messages.
 	#
-	# This list is used to retreive the nearest space craft position corresponding to a time stamp.
-	
+	# This array is used to retreive the nearest space craft position corresponding to a time stamp.
+
+        ## @var MicroSeconds
+        ## @brief The array of the microseconds parts of the time stamps.
+
+        ## @var YearFloats
+        ## @brief The array of the year floats (see getYearFloat()).
+
+        ## @var Positions
+        ## @brief The (n, 3) array of the orbit positions in ECI J2000 coordinates, in meters.
+
+        ## @var Velocities
+        ## @brief The (n, 3) array of the orbit velocities in ECI J2000 coordinates, in meters/sec.
+
+        ## @var Quaternions
+        ## @brief The (n, 4) array of the latest attitude quaternions (x, y, z, w)
+        #  at the time of each ORB message.
+
+        ## @var OrbModes
+        ## @brief The array of the spacecraft attitude-control modes.
+
+        ## @var OrbInSAA
+        ## @brief The array of the in-SAA flags.
+
+        ## @var AttTimes
+        ## @brief The array of the time stamps (MET seconds, including the
+        #  microseconds) of the ATT messages.
+
+        ## @var AttQuaternions
+        ## @brief The (n, 4) array of the attitude quaternions of the ATT messages.
+
+        ## @var LastPosition
+        ## @brief The (index, pSCPosition) pair last returned by getSCPosition().
+
         if saaDefinitionFile is None:
             logger.info('No SAA definition provided. Corresponding variables will not be filled.')
             self.SAAPolygon = None
         else:
             self.SAAPolygon = pSAAPolygon(saaDefinitionFile)
         self.m7FilePath = inputFilePath
+        self.CacheFilePath = cacheFilePath
+        self.LastPosition = (None, None)
+        self.HasData = False
         if not os.path.exists(inputFilePath):
             logger.error('Could not find M7 file "%s"...' % inputFilePath)
-            self.HasData = False
+            return
+        if not self.readCache():
+            self.parseIt()
+            self.writeCache()
+        if not len(self.TimePoints):
+            logger.error('Got empty M7 file "%s"...' % inputFilePath)
         else:
-            self.m7FileContent = file(self.m7FilePath ,'r').readlines()
-            if not len(self.m7FileContent):
-                logger.error('Got empty M7 file "%s"...' % inputFilePath)
-                self.HasData = False
-            else:
-                self.tweakM7content()
-                self.SCPositionTable = []
-                self.TimePoints = []
-                self.parseIt()
-                self.HasData = True
-
-    ## @brief Check magic 7 file content
-    #  Use this function to check the magic 7 file quality
-    ## @param self
-    #  The class instance.
-    def tweakM7content(self):
-        # I need the M7 file to start with an ATT line, if it starts with an ORB line
-	# then I'll just skip it
-	if self.m7FileContent[0].strip('\n').split(' ')[2] == "ORB":
-	    self.m7FileContent = self.m7FileContent[1:]
-        return 0
+            self.HasData = True
+
+    ## @brief Return the key identifying the version of the magic7 file
+    #  the cache was written for.
+    ## @param self
+    #  The class instance.
+
+    def getCacheKey(self):
+        stat = os.stat(self.m7FilePath)
+        return numpy.array([M7_CACHE_VERSION, stat.st_mtime, stat.st_size], 'd')
+
+    ## @brief Read the arrays from the cache file, if any.
+    #
+    #  Return True if the arrays were read, False otherwise (no cache,
+    #  cache written for a different version of the magic7 file or
+    #  unreadable).
+    ## @param self
+    #  The class instance.
+
+    def readCache(self):
+        if self.CacheFilePath is None or not os.path.exists(self.CacheFilePath):
+            return False
+        try:
+            cache = numpy.load(self.CacheFilePath)
+            if not (cache['CacheKey'] == self.getCacheKey()).all():
+                logger.info('M7 cache file "%s" is out of date.' %\
+                            self.CacheFilePath)
+                return False
+            for name in M7_ARRAY_NAMES:
+                setattr(self, name, cache[name])
+        except Exception, e:
+            logger.warn('Could not read M7 cache file "%s" (%s).' %\
+                        (self.CacheFilePath, e))
+            return False
+        logger.info('M7 data read from cache file "%s".' % self.CacheFilePath)
+        return True
+
+    ## @brief Write the arrays to the cache file (if requested).
+    ## @param self
+    #  The class instance.
+
+    def writeCache(self):
+        if self.CacheFilePath is None:
+            return
+        arrays = dict([(name, getattr(self, name)) for name in M7_ARRAY_NAMES])
+        try:
+            # Pass a file object, or numpy.savez would append .npz to the path.
+            cacheFile = file(self.CacheFilePath, 'wb')
+            numpy.savez(cacheFile, CacheKey = self.getCacheKey(), **arrays)
+            cacheFile.close()
+        except Exception, e:
+            logger.warn('Could not write M7 cache file "%s" (%s).' %\
+                        (self.CacheFilePath, e))
+            return
+        logger.info('M7 data written to cache file "%s".' % self.CacheFilePath)
 
     ## @brief Get the list of Space Craft Position
-    #  
+    #
+    #  The pSCPosition objects are created on the fly, so this is expensive
+    #  for large files: use getSCPosition() or the arrays whenever possible.
     ## @param self
     #  The class instance.
 
     def getSCPositionTable(self):
-        if self.SCPositionTable == []:
-	    print 'Warning : SCPositionTable has not been filled in yet.'
-        return self.SCPositionTable
-	
-    ## @brief Parse the magic7 file content as stored in m7FileContent.
-    #  
+        if not self.HasData:
+	    print 'Warning : no M7 data available.'
+            return []
+        return [self.createSCPosition(i) for i in xrange(len(self.TimePoints))]
+
+    ## @brief Parse the magic7 file.
+    #
     ## @param self
     #  The class instance.
     #
     # The magic7 text file structure is detailed in the class description.
+    # The file is read line by line (it is never loaded into memory as a
+    # whole) and the relevant fields of the ORB messages are appended to
+    # compact arrays, which are finally converted into numpy arrays.
     #
-    # We're interested in 4 quantities to build the space craft position table
+    # We're interested in 4 quantities to build the space craft positions
     #
     # yearfloat is a float quantity calculated using the year and month read in the magic7 text file.
     #
@@ -122,73 +278,251 @@ class pM7Parser:
     #
     # SCAttitudeQuaternion is a 4D vector (x, y, z, w) with the components of the attitude quaternion in the ECI J2000 frame
     #
+    # ORB messages preceding the first ATT message (i.e. with no attitude
+    # information available) are skipped.
     
     def parseIt(self):
-        i = 0
-        OrbInSAA = 0
-	for aline in self.m7FileContent:
+        timePoints   = array.array('l')
+        microSeconds = array.array('l')
+        yearFloats   = array.array('d')
+        positions    = array.array('d')
+        velocities   = array.array('d')
+        quaternions  = array.array('d')
+        orbModes     = array.array('i')
+        orbInSAA     = array.array('i')
+        attTimes     = array.array('d')
+        attQuaternions = array.array('d')
+        SCAttitudeQuaternion = None
+        for aline in file(self.m7FilePath):
 	    #Useless to parse this human readable timestamp - SCTime is what we need
-	    dataList = aline.strip('\n').split(' ')	    
-	    yearfloat = self.getYearFloat(dataList)
-
-	    #Spacecraft message timestamp, seconds since 2001-01-01 00:00:00
-            #Spacecraft message timestamp, microseconds of the current second
-	    SCTime = (dataList[3], dataList[4])
-	    
+            dataList = aline.split()
+            if len(dataList) < 3:
+                continue
 	    #Message type : Attitude or Orbit
 	    dtype = dataList[2]
 	    if dtype == 'ATT':
                 #The x, y, z, and w components of the attitude quaternion in the ECI J2000 frame
-	        SCAttitudeQuaternion = (float(dataList[5]), float(dataList[6]), float(dataList[7]), float(dataList[8]))		
-		#The body-axis x, y, and z components of the spacecraft angular velocity, in rad/sec
-		SCAngularVelocity =  (dataList[9], dataList[10], dataList[11])
-
-	    elif dtype == 'ORB':
+	        SCAttitudeQuaternion = [float(item) for item in dataList[5:9]]
+                attTimes.append(float(dataList[3]) + 1e-6*float(dataList[4]))
+                attQuaternions.extend(SCAttitudeQuaternion)
+	    elif dtype == 'ORB' and SCAttitudeQuaternion is not None:
+	        #Spacecraft message timestamp, seconds since 2001-01-01 00:00:00
+                #Spacecraft message timestamp, microseconds of the current second
+                timePoints.append(int(dataList[3]))
+                microSeconds.append(int(dataList[4]))
+                yearFloats.append(self.getYearFloat(dataList))
                 #ORB 	6-8 	The ECI J2000 orbit position, in meters
-		OrbPosition = (float(dataList[5]), float(dataList[6]), float(dataList[7]))	
+                positions.extend([float(item) for item in dataList[5:8]])
                 #ORB 	9-11 	The ECI J2000 orbit velocity, in meters/sec
-		OrbVelocity = (dataList[8], dataList[9], dataList[10])
+                velocities.extend([float(item) for item in dataList[8:11]])
                 #ORB 	12 	The spacecraft attitude-control mode 3==inertially pointed, 5==sky survey (TBR)
-		OrbMode = dataList[11]
+                orbModes.append(int(dataList[11]))
                 #ORB 	13 	Flag indicating whether or not the observatory is within the LAT SAA boundary 1==IN, 0==OUT
-		OrbInSAA = dataList[12]
-                
+                orbInSAA.append(int(dataList[12]))
 		# OrbPosition as just been read from the file, whereas we get the latest value of SCAttitudeQuaternion
 		# As magic7 file contains many more ATT message than ORB ones that should work
-		self.SCPositionTable.append(pSCPosition(SCTime, yearfloat, OrbPosition, SCAttitudeQuaternion, OrbMode,
-                                                        OrbInSAA, self.SAAPolygon))
-                self.TimePoints.append(int(SCTime[0]))	    
-	    i+=1
+                quaternions.extend(SCAttitudeQuaternion)
+        self.TimePoints   = toNumpyArray(timePoints)
+        self.MicroSeconds = toNumpyArray(microSeconds)
+        self.YearFloats   = toNumpyArray(yearFloats)
+        self.Positions    = toNumpyArray(positions).reshape((-1, 3))
+        self.Velocities   = toNumpyArray(velocities).reshape((-1, 3))
+        self.Quaternions  = toNumpyArray(quaternions).reshape((-1, 4))
+        self.OrbModes     = toNumpyArray(orbModes)
+        self.OrbInSAA     = toNumpyArray(orbInSAA)
+        self.AttTimes     = toNumpyArray(attTimes)
+        self.AttQuaternions = toNumpyArray(attQuaternions).reshape((-1, 4))
 
-    ## @brief Get the space craft position nearest to the corresponding timestamp.
-    #
-    # Using the bisect module on the TimePoints list to get the correct index in the space craft position list.
+    ## @brief Create the space craft position corresponding to a given
+    #  ORB message.
+    ## @param self
+    #  The class instance.
+    ## @param index
+    #  The index of the ORB message in the arrays.
+
+    def createSCPosition(self, index):
+        return pSCPosition((self.TimePoints[index], self.MicroSeconds[index]),
+                           self.YearFloats[index],
+                           tuple(self.Positions[index]),
+                           tuple(self.Quaternions[index]),
+                           self.OrbModes[index], self.OrbInSAA[index],
+                           self.SAAPolygon)
+
+    ## @brief Get the index of the ORB message nearest to the corresponding
+    #  timestamp.
     #
     ## @param self
     #  The class instance.
     ## @param SCTime
     #  A space craft timestamp is a pair containing the MET : (seconds, microseconds).
     #  Only the seconds are used though to get the space craft position.
-    #  Note that bisect return the length of the array when requiring a point which is
+    #  Note that searchsorted (just like bisect) returns the length of the
+    #  array when requiring a point which is
     #  larger than the maximum value of the array so that in that case we decrement the returned
     #  index by one in order to avoid an IndexError.
     #  When a boundary is returned we check if the time difference is greater than 60 s, in
     #  which case the program considers the Magic 7 file time span
     #  does not match data and exits as per JIRA GDQMQ-368
-    
-    def getSCPosition(self, SCTime):
-        index = bisect.bisect(self.TimePoints, SCTime[0])
+
+    def getSCPositionIndex(self, SCTime):
+        index = int(numpy.searchsorted(self.TimePoints, SCTime[0], 'right'))
         if index == 0 or index == len(self.TimePoints):
             if index==len(self.TimePoints):
                 index-=1
             m7time=float(self.TimePoints[index])
             timediff=abs(m7time-SCTime[0])
-            if timediff>60:
+            if timediff>M7_MAX_TIME_GAP:
                 logger.error('M7 Time = %s s and SC Time=%s s'% (m7time, SCTime[0]) )
                 logger.error('Time difference is %s s, greater than 60 s' % timediff)
                 logger.error('Magic 7 time span does not match space craft time, aborting...')
                 sys.exit(1)
-        return self.SCPositionTable[index]
+        return index
+
+    ## @brief Get the space craft position nearest to the corresponding timestamp.
+    #
+    #  The pSCPosition object is created on request (the last one is kept,
+    #  since consecutive requests often map to the same ORB message).
+    ## @param self
+    #  The class instance.
+    ## @param SCTime
+    #  A space craft timestamp (see getSCPositionIndex()).
+    
+    def getSCPosition(self, SCTime):
+        index = self.getSCPositionIndex(SCTime)
+        if index != self.LastPosition[0]:
+            self.LastPosition = (index, self.createSCPosition(index))
+        return self.LastPosition[1]
+
+    ## @brief Return the array of the ORB message times (MET seconds,
+    #  including the microseconds).
+    ## @param self
+    #  The class instance.
+
+    def getOrbTimes(self):
+        return self.TimePoints + 1e-6*self.MicroSeconds
+
+    ## @brief Interpolate the space craft state at an arbitrary array of
+    #  times.
+    #
+    #  The positions are interpolated between the bracketing ORB messages,
+    #  either linearly or with a cubic Hermite spline using the velocities;
+    #  the attitude quaternions are interpolated between the bracketing ATT
+    #  messages with a spherical linear interpolation (SLERP). The mode and
+    #  in-SAA flags are taken from the latest ORB message.
+    #  Times outside the magic7 time span are clamped to its boundaries.
+    #
+    #  Return a dictionary of arrays, with keys 'Times', 'YearFloats',
+    #  'Positions', 'Quaternions', 'OrbModes' and 'OrbInSAA'.
+    ## @param self
+    #  The class instance.
+    ## @param times
+    #  The array of times (MET seconds).
+    ## @param method
+    #  The position interpolation method (one of INTERPOLATION_METHODS).
+
+    def interpolate(self, times, method = 'hermite'):
+        if method not in INTERPOLATION_METHODS:
+            raise ValueError, 'Unknown interpolation method "%s".' % method
+        times = numpy.ravel(numpy.asarray(times, 'd'))
+        orbTimes = self.getOrbTimes()
+        (lo, hi, frac, step) = getBrackets(orbTimes, times)
+        p0 = self.Positions[lo]
+        p1 = self.Positions[hi]
+        f = frac[:, numpy.newaxis]
+        if method == 'linear':
+            positions = p0 + f*(p1 - p0)
+        else:
+            h = step[:, numpy.newaxis]
+            positions = (2*f**3 - 3*f**2 + 1)*p0 +\
+                        (f**3 - 2*f**2 + f)*h*self.Velocities[lo] +\
+                        (-2*f**3 + 3*f**2)*p1 +\
+                        (f**3 - f**2)*h*self.Velocities[hi]
+        yearFloats = self.YearFloats[lo] +\
+                     frac*(self.YearFloats[hi] - self.YearFloats[lo])
+        latest = numpy.where(frac >= 1., hi, lo)
+        (attLo, attHi, attFrac, attStep) = getBrackets(self.AttTimes, times)
+        quaternions = slerp(self.AttQuaternions[attLo],
+                            self.AttQuaternions[attHi], attFrac)
+        return {'Times'      : times,
+                'YearFloats' : yearFloats,
+                'Positions'  : positions,
+                'Quaternions': quaternions,
+                'OrbModes'   : self.OrbModes[latest],
+                'OrbInSAA'   : self.OrbInSAA[latest]}
+
+    ## @brief Return the list of the (interpolated) space craft positions for
+    #  an arbitrary array of times.
+    ## @param self
+    #  The class instance.
+    ## @param times
+    #  The array of times (MET seconds).
+    ## @param method
+    #  The position interpolation method (one of INTERPOLATION_METHODS).
+
+    def getInterpolatedSCPositions(self, times, method = 'hermite'):
+        state = self.interpolate(times, method)
+        positions = []
+        for i in xrange(len(state['Times'])):
+            seconds = int(state['Times'][i])
+            microSeconds = int(1e6*(state['Times'][i] - seconds))
+            positions.append(pSCPosition((seconds, microSeconds),
+                                         state['YearFloats'][i],
+                                         tuple(state['Positions'][i]),
+                                         tuple(state['Quaternions'][i]),
+                                         state['OrbModes'][i],
+                                         state['OrbInSAA'][i],
+                                         self.SAAPolygon))
+        return positions
+
+    ## @brief Process the space craft coordinates for all the ORB messages
+    #  in one pass.
+    #
+    #  Return a dictionary of arrays (see pSCCoordinates.processCoordinates()).
+    ## @param self
+    #  The class instance.
+
+    def processCoordinates(self):
+        return pSCCoordinates.processCoordinates(self.getOrbTimes(),
+                                                 self.Positions,
+                                                 self.Quaternions,
+                                                 self.SAAPolygon)
+
+    ## @brief Interpolate the space craft state at an arbitrary array of
+    #  times and process the corresponding coordinates in one pass.
+    #
+    #  Return a dictionary of arrays (see pSCCoordinates.processCoordinates()),
+    #  also including the interpolated state (see interpolate()).
+    ## @param self
+    #  The class instance.
+    ## @param times
+    #  The array of times (MET seconds).
+    ## @param method
+    #  The position interpolation method (one of INTERPOLATION_METHODS).
+
+    def interpolateCoordinates(self, times, method = 'hermite'):
+        state = self.interpolate(times, method)
+        coordinates = pSCCoordinates.processCoordinates(state['Times'],
+                                                        state['Positions'],
+                                                        state['Quaternions'],
+                                                        self.SAAPolygon)
+        coordinates.update(state)
+        return coordinates
+
+    ## @brief Return the space craft position interpolated at a given time.
+    #
+    #  Just like getSCPosition(), exit if the time is too far from the
+    #  magic7 time span.
+    ## @param self
+    #  The class instance.
+    ## @param SCTime
+    #  A space craft timestamp (seconds, microseconds).
+    ## @param method
+    #  The position interpolation method (one of INTERPOLATION_METHODS).
+
+    def getInterpolatedSCPosition(self, SCTime, method = 'hermite'):
+        self.getSCPositionIndex(SCTime)
+        return self.getInterpolatedSCPositions([SCTime[0] + 1e-6*SCTime[1]],
+                                               method)[0]
        
     ## @brief Parse any magic7 line having a human readable time stamp and returns a float corresponding to
     # the year and month of the data.
@@ -210,11 +544,13 @@ class pM7Parser:
 if __name__ == '__main__':
     from optparse import OptionParser
     parser = OptionParser()
+    parser.add_option('-c', '--cache-file', dest = 'c', default = None,
+                      type = str, help = 'path to the binary cache file')
     (opts, args) = parser.parse_args()
     if len(args) != 1:
         parser.print_help()
         parser.error('Please provide a (single) input M7 file.')
-    p = pM7Parser(args[0], None)
+    p = pM7Parser(args[0], None, opts.c)
     if p.HasData:
         for met in p.TimePoints[len(p.TimePoints)-10:]: 
             sc = p.getSCPosition((met,0))
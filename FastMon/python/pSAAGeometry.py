@@ -0,0 +1,249 @@
+## @package pSAAGeometry
+## @brief Array-oriented geometry of the SAA polygon.
+#
+#  This module only depends on numpy (no ROOT objects are created), so that
+#  it can be used wherever the SAA boundary is needed on large arrays of
+#  (longitude, latitude) points: pSAAPolygon (and hence pSCPosition), the
+#  LRS utilities and the long-term trending.
+
+import numpy
+
+EARTH_RADIUS = 6378145
+
+DEG_TO_RAD = numpy.pi/180.
+RAD_TO_DEG = 1./DEG_TO_RAD
+
+
+## @brief Return the distance on the earth surface (in km) between two
+#  (arrays of) points.
+## @param lon1
+#  The longitude of the first point(s), in degrees.
+## @param lat1
+#  The latitude of the first point(s), in degrees.
+## @param lon2
+#  The longitude of the second point(s), in degrees.
+## @param lat2
+#  The latitude of the second point(s), in degrees.
+
+def getDistanceOnSphere(lon1, lat1, lon2, lat2):
+    b = DEG_TO_RAD*(90 - lat1)
+    c = DEG_TO_RAD*(90 - lat2)
+    A = DEG_TO_RAD*(lon1 - lon2)
+    cosDistance = numpy.cos(b)*numpy.cos(c) + numpy.sin(b)*numpy.sin(c)*numpy.cos(A)
+    return EARTH_RADIUS/1000.*numpy.arccos(numpy.clip(cosDistance, -1., 1.))
+
+
+## @brief Implementation of the SAA polygon geometry.
+#
+#  The polygon is assumed to be star-shaped with respect to its center (the
+#  average of the vertices) and its vertices to be ordered by increasing
+#  angle to the center, which is the case for the SAA definitions in use.
+#  All the methods accept either scalars or arrays of coordinates.
+
+class pSAAGeometry:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+    ## @param vertices
+    #  The list of the polygon vertices, as (longitude, latitude) pairs.
+
+    def __init__(self, vertices):
+
+        ## @var Lons
+        ## @brief The array of the vertex longitudes.
+
+        ## @var Lats
+        ## @brief The array of the vertex latitudes.
+
+        ## @var CenterLon
+        ## @brief The longitude of the polygon center.
+
+        ## @var CenterLat
+        ## @brief The latitude of the polygon center.
+
+        ## @var Lon1, Lat1, Lon2, Lat2
+        ## @brief The arrays of the segment end points (the last segment
+        #  closes the polygon).
+
+        ## @var Angle1, Angle2
+        ## @brief The arrays of the angles to the center of the segment end
+        #  points.
+
+        vertices = numpy.array(vertices, 'd')
+        self.Lons = vertices[:, 0]
+        self.Lats = vertices[:, 1]
+        self.CenterLon = self.Lons.mean()
+        self.CenterLat = self.Lats.mean()
+        self.Lon1 = self.Lons
+        self.Lat1 = self.Lats
+        self.Lon2 = numpy.roll(self.Lons, -1)
+        self.Lat2 = numpy.roll(self.Lats, -1)
+        self.Angle1 = self.getAngleToCenter(self.Lon1, self.Lat1)
+        self.Angle2 = self.getAngleToCenter(self.Lon2, self.Lat2)
+
+    ## @brief Return the number of vertices.
+    ## @param self
+    #  The class instance.
+
+    def getNumVertices(self):
+        return len(self.Lons)
+
+    ## @brief Return the distance (in km) to the polygon center.
+    ## @param self
+    #  The class instance.
+    ## @param lon
+    #  The longitude(s) in degrees.
+    ## @param lat
+    #  The latitude(s) in degrees.
+
+    def getDistanceToCenter(self, lon, lat):
+        return getDistanceOnSphere(self.CenterLon, self.CenterLat, lon, lat)
+
+    ## @brief Return the angle (in degrees) of the line joining the polygon
+    #  center to the point(s), measured from the north direction.
+    ## @param self
+    #  The class instance.
+    ## @param lon
+    #  The longitude(s) in degrees.
+    ## @param lat
+    #  The latitude(s) in degrees.
+
+    def getAngleToCenter(self, lon, lat):
+        return RAD_TO_DEG*numpy.arctan2(lon - self.CenterLon,
+                                        lat - self.CenterLat)
+
+    ## @brief Return the index of the segment crossed by the ray from the
+    #  center at a given angle.
+    #
+    #  The ray at an angle which does not fall strictly within any of
+    #  the segments (i.e. pointing to the segment wrapping around +-180
+    #  degrees or exactly to a vertex) is assigned to the last segment.
+    ## @param self
+    #  The class instance.
+    ## @param angle
+    #  The array of angles in degrees.
+
+    def getSegmentIndex(self, angle):
+        angle = angle[:, numpy.newaxis]
+        crossed = (angle > self.Angle1) & (angle < self.Angle2)
+        lastSegment = self.getNumVertices() - 1
+        return numpy.where(crossed.any(axis = 1),
+                           lastSegment - crossed[:, ::-1].argmax(axis = 1),
+                           lastSegment)
+
+    ## @brief Return the indices of the segments crossed by the straight
+    #  line joining the point(s) to the polygon center, on the side of the
+    #  point(s) and on the opposite side, respectively.
+    ## @param self
+    #  The class instance.
+    ## @param lon
+    #  The longitude(s) in degrees.
+    ## @param lat
+    #  The latitude(s) in degrees.
+
+    def getCrossSegments(self, lon, lat):
+        angle = numpy.ravel(self.getAngleToCenter(lon, lat))
+        shift = numpy.where(angle > 0, -180., 180.)
+        return (self.getSegmentIndex(angle), self.getSegmentIndex(angle + shift))
+
+    ## @brief Return the intersection between the straight line joining the
+    #  point(s) to the center and the given segments.
+    ## @param self
+    #  The class instance.
+    ## @param lon
+    #  The array of longitudes in degrees.
+    ## @param lat
+    #  The array of latitudes in degrees.
+    ## @param index
+    #  The array of segment indices.
+
+    def getIntersection(self, lon, lat, index):
+        (x1, y1) = (self.CenterLon, self.CenterLat)
+        (x3, y3) = (self.Lon1[index], self.Lat1[index])
+        (x4, y4) = (self.Lon2[index], self.Lat2[index])
+        u = ((x4 - x3)*(y1 - y3) - (y4 - y3)*(x1 - x3))/\
+            ((y4 - y3)*(lon - x1) - (x4 - x3)*(lat - y1))
+        return (x1 + u*(lon - x1), y1 + u*(lat - y1))
+
+    ## @brief Return the signed distance (in km) to the polygon border,
+    #  without the correction for the discontinuity at +-180 degrees.
+    ## @param self
+    #  The class instance.
+    ## @param lon
+    #  The array of longitudes in degrees.
+    ## @param lat
+    #  The array of latitudes in degrees.
+
+    def getRawDistanceToBorder(self, lon, lat):
+        (index1, index2) = self.getCrossSegments(lon, lat)
+        errorSettings = numpy.seterr(divide = 'ignore', invalid = 'ignore')
+        (x1, y1) = self.getIntersection(lon, lat, index1)
+        (x2, y2) = self.getIntersection(lon, lat, index2)
+        numpy.seterr(**errorSettings)
+        distance = numpy.minimum(getDistanceOnSphere(lon, lat, x1, y1),
+                                 getDistanceOnSphere(lon, lat, x2, y2))
+        # We're inside the polygon if the distance to the center is smaller
+        # than the distance between the first intersection point and the
+        # center itself: change sign.
+        inside = self.getDistanceToCenter(lon, lat) <\
+                 self.getDistanceToCenter(x1, y1)
+        return numpy.where(inside, -distance, distance)
+
+    ## @brief Return the signed distance (in km) to the polygon border
+    #  (negative inside the polygon).
+    #
+    #  The distance is measured along the straight line (in the lon-lat plane)
+    #  joining the point to the polygon center. Close to lon = +-180 a
+    #  weighted average between the distance at lon and the one at -lon is
+    #  taken, in order to get rid of the discontinuity.
+    ## @param self
+    #  The class instance.
+    ## @param lon
+    #  The longitude(s) in degrees.
+    ## @param lat
+    #  The latitude(s) in degrees.
+    ## @param lonPadding
+    #  The longitude range (in degrees) over which the average is taken.
+
+    def getDistanceToBorder(self, lon, lat, lonPadding = 10.0):
+        scalar = numpy.isscalar(lon) and numpy.isscalar(lat)
+        (lon, lat) = [numpy.ravel(item) for item in
+                      numpy.broadcast_arrays(numpy.asarray(lon, 'd'),
+                                             numpy.asarray(lat, 'd'))]
+        distance = self.getRawDistanceToBorder(lon, lat)
+        pad = numpy.abs(numpy.abs(lon) - 180)
+        mask = pad <= lonPadding
+        if mask.any():
+            weight = 1 - numpy.abs(lonPadding - pad[mask])/(2*lonPadding)
+            mirror = self.getRawDistanceToBorder(-lon[mask], lat[mask])
+            distance[mask] = distance[mask]*weight + mirror*(1 - weight)
+        if scalar:
+            return float(distance[0])
+        return distance
+
+    ## @brief Return whether the point(s) lie inside the polygon.
+    #
+    #  This is a standard (even-odd) crossing test, which does not rely on the
+    #  polygon being star-shaped.
+    ## @param self
+    #  The class instance.
+    ## @param lon
+    #  The longitude(s) in degrees.
+    ## @param lat
+    #  The latitude(s) in degrees.
+
+    def isInside(self, lon, lat):
+        scalar = numpy.isscalar(lon) and numpy.isscalar(lat)
+        (lon, lat) = [numpy.ravel(item)[:, numpy.newaxis] for item in
+                      numpy.broadcast_arrays(numpy.asarray(lon, 'd'),
+                                             numpy.asarray(lat, 'd'))]
+        straddle = (self.Lat1 > lat) != (self.Lat2 > lat)
+        errorSettings = numpy.seterr(divide = 'ignore', invalid = 'ignore')
+        intercept = self.Lon1 + (lat - self.Lat1)*(self.Lon2 - self.Lon1)/\
+                    (self.Lat2 - self.Lat1)
+        numpy.seterr(**errorSettings)
+        inside = (straddle & (lon < intercept)).sum(axis = 1) % 2 == 1
+        if scalar:
+            return bool(inside[0])
+        return inside
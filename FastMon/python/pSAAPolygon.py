@@ -13,6 +13,7 @@ from math import sqrt, cos, sin, acos, pi, atan2
 
 from pXmlBaseParser  import pXmlBaseParser
 from pXmlBaseElement import pXmlBaseElement
+from pSAAGeometry    import pSAAGeometry
 
 EARTH_RADIUS = 6378145
 
@@ -125,6 +126,8 @@ class pSAAPolygon:
         self.Center /= self.getNumVertices()
         for vertex in self.VertexList:
             self.AngleList.append(self.getAngleToCenter(vertex))
+        self.Geometry = pSAAGeometry([(vertex.Lon, vertex.Lat)\
+                                      for vertex in self.VertexList])
 
     def getNumVertices(self):
         return len(self.VertexList)
@@ -146,71 +149,19 @@ class pSAAPolygon:
                                 v.Lat - self.Center.Lat)
 
     def getCrossSegments(self, v):
-        s1 = None
-        s2 = None
-        angle = self.getAngleToCenter(v)
-        if angle > 0:
-            shift = -180
-        else:
-            shift = 180
-        for segment in self.SegmentList:
-            angle1 = self.getAngleToCenter(segment.Vertex1)
-            angle2 = self.getAngleToCenter(segment.Vertex2)
-            if (angle > angle1 and angle < angle2):
-                s1 = segment
-            if (angle + shift > angle1 and angle + shift < angle2):
-                s2 = segment
-        if s2 is None:
-            s2 = self.SegmentList[-1]
-        return (s1, s2)
-
-    def __getDistanceToBorder(self, v):
-        # Get the two SAA segments crossed by the straight line joining
-        # a generic point to the SAA center.
-        (s1, s2) = self.getCrossSegments(v)
-        (x1, y1) = (self.Center.Lon, self.Center.Lat)
-        (x2, y2) = (v.Lon, v.Lat)
-        # Distance of the point to the intersection point between the
-        # straight line to the SAA center and the first segment crossed
-        # by the line itself.
-        (x3, y3) = (s1.Vertex1.Lon, s1.Vertex1.Lat)
-        (x4, y4) = (s1.Vertex2.Lon, s1.Vertex2.Lat)
-        u = ((x4-x3)*(y1-y3) - (y4-y3)*(x1-x3))/\
-            ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1))
-        x = x1 + u*(x2-x1) 
-        y = y1 + u*(y2-y1)
-        p1 = pVertex(x, y, 'i', ROOT.kBlack)
-        d1 = getDistanceOnSphere(v, p1)
-        # Distance of the point to the intersection point between the
-        # straight line to the SAA center and the second segment crossed
-        # by the line itself.
-        (x3, y3) = (s2.Vertex1.Lon, s2.Vertex1.Lat)
-        (x4, y4) = (s2.Vertex2.Lon, s2.Vertex2.Lat)
-        u = ((x4-x3)*(y1-y3) - (y4-y3)*(x1-x3))/\
-            ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1))
-        x = x1 + u*(x2-x1) 
-        y = y1 + u*(y2-y1)
-        p2 = pVertex(x, y, 'i', ROOT.kBlack)
-        d2 = getDistanceOnSphere(v, p2)
-        d = min(d1, d2)
-        # We're inside the SAA if the distance to the center is smaller than
-        # the distance between any of the two intersection points
-        # and the center itself: change sign.
-        if self.getDistanceToCenter(v) <  self.getDistanceToCenter(p1):
-            d *= -1
-        return d
+        (index1, index2) = self.Geometry.getCrossSegments(v.Lon, v.Lat)
+        return (self.SegmentList[index1[0]], self.SegmentList[index2[0]])
 
     def getDistanceToBorder(self, v, lonPadding = 10.0):
-        # Dirty trick to get rid of discontinuities: when close to lon = 180
-        # make a weighted average between the distance at lon and the one
-        # at -lon.
-        pad = float(abs(abs(v.Lon) - 180))
-        if pad > lonPadding:
-            return self.__getDistanceToBorder(v)
-        d1 = self.__getDistanceToBorder(v)
-        d2 = self.__getDistanceToBorder(pVertex(-v.Lon, v.Lat))
-        weight = 1 - abs(lonPadding - pad)/(2*lonPadding)
-        return d1*weight + d2*(1 - weight)
+        return self.Geometry.getDistanceToBorder(v.Lon, v.Lat, lonPadding)
+
+    # Same as getDistanceToBorder(), but working on (arrays of) longitudes
+    # and latitudes, without creating any pVertex (i.e. ROOT) object.
+    def getDistancesToBorder(self, lon, lat, lonPadding = 10.0):
+        return self.Geometry.getDistanceToBorder(lon, lat, lonPadding)
+
+    def isInside(self, lon, lat):
+        return self.Geometry.isInside(lon, lat)
     
 
 
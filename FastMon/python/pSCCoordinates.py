@@ -0,0 +1,222 @@
+## @package pSCCoordinates
+## @brief Array-oriented computation of the spacecraft coordinates.
+#
+#  Same conversions as in the original pSCPosition implementation (from
+#  ECI J2000 orbit position and attitude quaternion to geodetic
+#  coordinates, Euler angles, axes pointing directions etc.), but working
+#  on arrays of points in one pass, with no ROOT objects involved.
+#
+#  From astro package : ScienceTools/ScienceTools_v8r0p4/astro/v2r8p1
+#
+#  src/EarthCoordinate.cxx astro/EarthCoordinate.h
+#
+#  src/JulianDate.cxx  astro/JulianDate.h
+
+import numpy
+
+import pTETEUtils
+
+#Earth Flattening Coeff.
+EARTH_FLAT      = 1/298.25
+EARTH_RADIUS    = 6378145
+SECONDS_PER_DAY = 24*60*60
+LAT_FOV = 70 # LAT Field of View for Earth limb is set to 80 degrees
+
+## @brief Julian date of the mission start (1 Jan 2001 00:00).
+
+MISSION_START_JD = 2451910.5
+
+## @brief Julian date of the J2000 reference (1 Jan 2000 12:00).
+
+J2000_JD = 2451545.0
+
+## @brief Rotation matrix from the equatorial to the galactic frame (same
+#  rotations as the astro package SkyDir class, plus the additional
+#  rotation needed to be consistent with the Telemetry Trending).
+
+def getGalacticMatrix():
+    def rotateZ(angle):
+        (c, s) = (numpy.cos(angle), numpy.sin(angle))
+        return numpy.array([[c, -s, 0.], [s, c, 0.], [0., 0., 1.]])
+    def rotateX(angle):
+        (c, s) = (numpy.cos(angle), numpy.sin(angle))
+        return numpy.array([[1., 0., 0.], [0., c, -s], [0., s, c]])
+    matrix = rotateZ(numpy.radians(-282.8592))
+    matrix = numpy.dot(rotateX(numpy.radians(-62.8717)), matrix)
+    matrix = numpy.dot(rotateZ(numpy.radians(32.93224)), matrix)
+    return numpy.dot(rotateZ(numpy.pi), matrix)
+
+GALACTIC_MATRIX = getGalacticMatrix()
+
+## @brief The quantities returned by processCoordinates() (named after the
+#  corresponding pSCPosition members).
+
+COORDINATE_NAMES = ['JulianDate', 'GMSTime', 'Latitude', 'Longitude',
+                    'Altitude', 'Pitch', 'Roll', 'Yaw', 'RockAngle',
+                    'XRa', 'XDec', 'YRa', 'YDec', 'ZRa', 'ZDec',
+                    'ZGalL', 'ZGalB', 'HorizonAngle', 'ArcAngleEarthLimb']
+
+
+## @brief Return the Julian dates for an array of MET.
+## @param met
+#  The mission elapsed times in seconds.
+
+def getJulianDateFromMET(met):
+    return MISSION_START_JD + numpy.asarray(met, 'd')/SECONDS_PER_DAY
+
+## @brief Return the Greenwich Meridian Sideral Time (in degrees) for an
+#  array of Julian dates (corrected for the leap seconds and UT1 offset).
+## @param jd
+#  The Julian dates.
+
+def getGMSTime(jd):
+    jd = jd - 1.764810/86400.
+    hours = numpy.modf(jd - 0.5)[0]*24.
+    T = (jd - hours/24. - J2000_JD)/36525.
+    T1 = (24110.54841 + 8640184.812866*T + 0.093104*T*T - 0.0000062*T*T*T)/86400.0
+    siderealTime = numpy.modf(T1)[0]*24. + hours*1.00273790935
+    siderealTime = numpy.where(siderealTime < 0., siderealTime + 24., siderealTime)
+    siderealTime = numpy.where(siderealTime >= 24., siderealTime - 24., siderealTime)
+    return siderealTime*15.
+
+## @brief Return the space craft position in Earth coordinates
+#  (latitude, longitude, altitude).
+## @param positions
+#  The (n, 3) array of positions in ECI J2000 coordinates, in meters.
+## @param jd
+#  The Julian dates.
+## @param gmst
+#  The Greenwich Meridian Sideral Times in degrees.
+
+def getEarthCoordinates(positions, jd, gmst):
+    matrices = pTETEUtils.getJ2000toTETEMatrices(jd)
+    v = numpy.einsum('nij,nj->ni', matrices, positions)
+    (x, y, z) = (v[:, 0], v[:, 1], v[:, 2])
+    lat = numpy.pi/2. - numpy.arctan2(numpy.sqrt(x*x + y*y), z)
+    lon = numpy.fmod(numpy.arctan2(y, x) - numpy.radians(gmst), 2*numpy.pi)
+    lon = numpy.where(lon < numpy.pi, lon + 2*numpy.pi, lon)
+    lon = numpy.where(lon > numpy.pi, lon - 2*numpy.pi, lon)
+    # oblateness correction to obtain geodesic latitude
+    lat = numpy.arctan(numpy.tan(lat))/((1. - EARTH_FLAT)*(1. - EARTH_FLAT))
+    # this is also such a correction: the number 0.00669454 is the geodesic eccentricity squared?
+    alt = numpy.sqrt(x*x + y*y)/numpy.cos(lat) -\
+          EARTH_RADIUS/(1000.*numpy.sqrt(1. - (0.00669454*numpy.sin(lat))**2))
+    return (numpy.degrees(lat), numpy.degrees(lon), alt)
+
+## @brief Return the (X, Y, Z) axis vectors corresponding to an array of
+#  attitude quaternions, as three (n, 3) arrays.
+## @param quaternions
+#  The (n, 4) array of quaternions (x, y, z, w) in the ECI J2000 frame.
+
+def getAxisVectors(quaternions):
+    q = quaternions/numpy.sqrt((quaternions**2).sum(axis = 1))[:, numpy.newaxis]
+    (x, y, z, w) = (q[:, 0], q[:, 1], q[:, 2], q[:, 3])
+    xAxis = numpy.column_stack((1 - 2*(y*y + z*z), 2*(x*y + w*z), 2*(x*z - w*y)))
+    yAxis = numpy.column_stack((2*(x*y - w*z), 1 - 2*(x*x + z*z), 2*(y*z + w*x)))
+    zAxis = numpy.column_stack((2*(x*z + w*y), 2*(y*z - w*x), 1 - 2*(x*x + y*y)))
+    return (xAxis, yAxis, zAxis)
+
+## @brief Convert the quaternions to Euler angles (pitch, roll, yaw), in
+#  degrees.
+## From http://en.wikipedia.org/wiki/Conversion_between_quaternions_and_Euler_angles
+## @param quaternions
+#  The (n, 4) array of quaternions (x, y, z, w).
+
+def getEulerAngles(quaternions):
+    (q1, q2, q3, q0) = (quaternions[:, 0], quaternions[:, 1],
+                        quaternions[:, 2], quaternions[:, 3])
+    theta = numpy.arctan(2*(q0*q1 + q2*q3)/(1 - 2*(q1*q1 + q2*q2)))
+    phi   = numpy.arcsin(numpy.clip(2*(q0*q2 - q3*q1), -1., 1.))
+    psi   = numpy.arctan(2*(q0*q3 + q1*q2)/(1 - 2*(q2*q2 + q3*q3)))
+    return (numpy.degrees(theta), numpy.degrees(phi), numpy.degrees(psi))
+
+## @brief Return the angle (in degrees) between two arrays of vectors.
+## @param v1
+#  The first (n, 3) array of vectors.
+## @param v2
+#  The second (n, 3) array of vectors.
+
+def getAngle(v1, v2):
+    norm = numpy.sqrt((v1**2).sum(axis = 1)*(v2**2).sum(axis = 1))
+    cosAngle = (v1*v2).sum(axis = 1)/numpy.where(norm > 0, norm, 1.)
+    return numpy.degrees(numpy.arccos(numpy.clip(cosAngle, -1., 1.)))
+
+## @brief Return the (Ra, Dec), in degrees, of an array of vectors.
+## @param v
+#  The (n, 3) array of vectors.
+
+def getRaDec(v):
+    (x, y, z) = (v[:, 0], v[:, 1], v[:, 2])
+    dec = 90. - numpy.degrees(numpy.arctan2(numpy.sqrt(x*x + y*y), z))
+    ra = numpy.degrees(numpy.arctan2(y, x))
+    ra = numpy.where(ra < 0, ra + 360., ra)
+    return (ra, dec)
+
+## @brief Return the angle between the zenith and the earth horizon.
+#
+## We add 10km to the earth radius because we're interested in the atmosphere.
+## @param altitude
+#  The altitudes (as returned by getEarthCoordinates()).
+
+def getHorizonAngle(altitude):
+    return 180. - numpy.degrees(numpy.arcsin(numpy.clip(\
+        EARTH_RADIUS/(altitude + 10000.), -1., 1.)))
+
+## @brief Get the arc angle of the earth limb in the LAT FOV.
+#
+#  Intersection points between a circle of this radius, centered at the
+#  rocking angle of GLAST, and the horizon (which has an angular radius of
+#  about 113 deg and is centered on the zenith - i.e., rocking angle 0).
+## @param horizonAngle
+#  The horizon angles in degrees.
+## @param rockAngle
+#  The rock angles in degrees.
+
+def getEarthLimb(horizonAngle, rockAngle):
+    alphaFOV = numpy.radians(LAT_FOV)
+    ratio = numpy.cos(alphaFOV)/numpy.cos(numpy.radians(rockAngle - horizonAngle))
+    limb = numpy.degrees(2*numpy.arccos(numpy.clip(ratio, -1., 1.)))
+    # if we're not rocking too much then we have no earth limb in FOV
+    return numpy.where(horizonAngle - (rockAngle + LAT_FOV) > 0, 0., limb)
+
+## @brief Process all the spacecraft coordinates for arrays of points.
+#
+#  Return a dictionary of arrays, with keys COORDINATE_NAMES (plus
+#  'XaxisVector', 'YaxisVector' and 'ZaxisVector' and, if an SAA polygon is
+#  passed, 'DistanceToSAA').
+## @param met
+#  The array of mission elapsed times in seconds.
+## @param positions
+#  The (n, 3) array of positions in ECI J2000 coordinates, in meters.
+## @param quaternions
+#  The (n, 4) array of quaternions (x, y, z, w) in the ECI J2000 frame.
+## @param saaPolygon
+#  The pSAAPolygon object (optional).
+
+def processCoordinates(met, positions, quaternions, saaPolygon = None):
+    positions = numpy.asarray(positions, 'd').reshape((-1, 3))
+    quaternions = numpy.asarray(quaternions, 'd').reshape((-1, 4))
+    errorSettings = numpy.seterr(divide = 'ignore', invalid = 'ignore')
+    c = {}
+    c['JulianDate'] = numpy.ravel(getJulianDateFromMET(met))
+    c['GMSTime'] = getGMSTime(c['JulianDate'])
+    (c['Latitude'], c['Longitude'], c['Altitude']) =\
+        getEarthCoordinates(positions, c['JulianDate'], c['GMSTime'])
+    (c['Pitch'], c['Roll'], c['Yaw']) = getEulerAngles(quaternions)
+    (c['XaxisVector'], c['YaxisVector'], c['ZaxisVector']) =\
+        getAxisVectors(quaternions)
+    # Angle between the zenith (direction given by the spacecraft position
+    # in ECI frame) and the Z axis
+    c['RockAngle'] = getAngle(c['ZaxisVector'], positions)
+    (c['XRa'], c['XDec']) = getRaDec(c['XaxisVector'])
+    (c['YRa'], c['YDec']) = getRaDec(c['YaxisVector'])
+    (c['ZRa'], c['ZDec']) = getRaDec(c['ZaxisVector'])
+    (c['ZGalL'], c['ZGalB']) =\
+        getRaDec(numpy.dot(c['ZaxisVector'], GALACTIC_MATRIX.T))
+    c['HorizonAngle'] = getHorizonAngle(c['Altitude'])
+    c['ArcAngleEarthLimb'] = getEarthLimb(c['HorizonAngle'], c['RockAngle'])
+    numpy.seterr(**errorSettings)
+    if saaPolygon is not None:
+        c['DistanceToSAA'] =\
+            saaPolygon.getDistancesToBorder(c['Longitude'], c['Latitude'])
+    return c
@@ -16,16 +16,9 @@ import math
 import bisect
 import numpy
 
-import pTETEUtils
+import pSCCoordinates
 
-from pSafeROOT   import ROOT
-from pSAAPolygon import pVertex
-
-#Earth Flattening Coeff.
-EARTH_FLAT      = 1/298.25 
-EARTH_RADIUS    = 6378145
-SECONDS_PER_DAY = 24*60*60
-LAT_FOV = 70 # LAT Field of View for Earth limb is set to 80 degrees
+from pSCCoordinates import EARTH_FLAT, EARTH_RADIUS, SECONDS_PER_DAY, LAT_FOV
 
 ## @brief The space craft position implementation.
 
@@ -486,213 +479,37 @@ class pSCPosition:
 	return float(Tempo_Siderale_Ora*15.)
 
 
-    ## @brief Get all the axis vectors from the quaternion 
-    ## @param self
-    #  The class instance.
-    def setAllAxisVectors(self):
-        q = ROOT.TQuaternion(self.Quaternion[3], self.Quaternion[0], self.Quaternion[1], self.Quaternion[2])
-	self.XaxisVector = q.Rotation(ROOT.TVector3(1,0,0))
-	self.YaxisVector = q.Rotation(ROOT.TVector3(0,1,0))
-	self.ZaxisVector = q.Rotation(ROOT.TVector3(0,0,1))
-	return 0
-	
-
-    ## @brief Calculate and return the space craft position in Earth coordinates
-    #  Routine was checked against astro package code, Jun 13th 2008 JB
-    ## @param self
-    #  The class instance.
-    def getEarthCoordinate(self):
- 	x = self.Position[0]
-	y = self.Position[1]
-	z = self.Position[2]
-
-        # This is absolutely brilliant! We start with a list coverted to three numbers,
-        # create a numpy matrix for the multiplication with the rotation matrix, go back to
-        # three numbers and then convert them into a ROOT.TVector3 object to transform into
-        # polar coordinates.
-        # Talking about code optimization...
-        R = pTETEUtils.getJ2000toTETEMatrix(self.JulianDate)
-        v = numpy.matrix([[x], [y], [z]], 'd')
-        v = R*v
-        (x, y, z) = (v[0, 0], v[1, 0], v[2, 0])
-
-        # use ROOT TVector3 to avoid dumb errors
-        v3 = ROOT.TVector3(x, y, z)
-	r     = v3.Mag()
-	theta = v3.Theta()
-        phi   = v3.Phi()
-	
-	# Latitude
-        m_lat = math.pi/2. - theta
-    		
-    	# Longitude
-	m_lon = phi - self.GMSTime*math.pi/180.
-    	m_lon = math.fmod(m_lon, 2*math.pi) # fmod(m_lon, 2*M_PI) rest of the division of m_lon by 2Pi
-    	if m_lon<math.pi:
-	     m_lon+=2.*math.pi   # for -180 to 180?
-    	if m_lon>math.pi:
-	     m_lon-=2.*math.pi
-
-    	# oblateness correction to obtain geodesic latitude 
-    	m_lat = math.atan(math.tan(m_lat)) /( (1.-EARTH_FLAT)*(1.-EARTH_FLAT) ) 
-
-    	# this is also such a correction: the number 0.00669454 is the geodesic eccentricity squared?
-    	# see http://www.cage.curtin.edu.au/~will/gra64_05.pdf
-    	# or http://www.colorado.edu/geography/gcraft/notes/datum/gif/ellipse.gif
-    	m_altitude=math.sqrt(x*x+y*y)/math.cos(m_lat)\
-    	           -EARTH_RADIUS / (1000.*math.sqrt(1.-math.pow(0.00669454*math.sin(m_lat), 2)))
-        
-	# convert latitude and longitude from radian to degree
-	m_lat = math.degrees(m_lat)
-	m_lon = math.degrees(m_lon)
-	
-        return (m_lat, m_lon, m_altitude)
-
-    ## @brief Set the Spacecraft Zenith direction in galactic coordinates
-    ## Direction given by the earth center and the spacecraft position in galactic frame
-    ## from astro package SkyDir class
-    ## @param self
-    #  The class instance.
-    def processZGalacticLB(self):
-        glb = ROOT.TVector3(self.ZaxisVector)
-	glb.RotateZ(-282.8592*math.pi/180)
-        glb.RotateX(-62.8717 *math.pi/180)
-        glb.RotateZ( 32.93224*math.pi/180)
-	#need this additional rotation to be consistent with the Telemetry Trending.
-	glb.RotateZ(math.pi)
-	return self.getAxisRaDec(glb)
-
-    ## @brief Convert the quaternion to Euler angles
-    ## From http://en.wikipedia.org/wiki/Conversion_between_quaternions_and_Euler_angles
-    ## @param self
-    #  The class instance.
-    def getEulerAngles(self):
-        # I have verified that the quaternion is normalized.
-        # get the quaternion individual components
-        q0 = self.Quaternion[3]
-        q1 = self.Quaternion[0]
-        q2 = self.Quaternion[1]
-        q3 = self.Quaternion[2]
-	# Invert the matrix and return angles in degrees
-	theta = math.degrees(math.atan( 2*(q0*q1+q2*q3)/(1-2*(q1*q1+q2*q2)) ))
-	phi   = math.degrees(math.asin( 2*(q0*q2-q3*q1) ))
-	psi   = math.degrees(math.atan( 2*(q0*q3+q1*q2)/(1-2*(q2*q2+q3*q3)) ))        
-	return (theta, phi, psi)
-
-    ## @brief Get the Spacecraft Rock angle
-    ## Angle between the Zenith (direction given by the spacecraft position in ECI frame)
-    ## and the Z axis declination
-    ## @param self
-    #  The class instance.
-    def setRockAngle(self):
- 	x = self.Position[0]
-	y = self.Position[1]
-	z = self.Position[2]	
-        # use ROOT TVector3 to avoid dumb errors
-        zenith = ROOT.TVector3(x, y, z)
-
-        self.RockAngle   = math.degrees(self.ZaxisVector.Angle(zenith))
-	return 0
-	
-
-    ## @brief Get the Angle to the horizon
-    ## Angle between the Zenith (direction given by the spacecraft position in ECI frame)
-    ## and the Earth horizon
-    ## @param self
-    #  The class instance.
-    ## We add 10km to the earth radius because we're interested in the atmosphere.
-    def getHorizonAngle(self):
-	horizon = 180 - math.degrees(math.asin(EARTH_RADIUS/(self.Altitude+10000)))
-	return horizon
-
-    ## @brief Get the arc angle of the earth limb in the LAT FOV (Pi/3)
-    ## intersection points between a circle of
-    #  this radius, centered at the rocking angle of GLAST, and the horizon (which
-    #  has an angular radius of about 113 deg and is centered on the zenith - i.e.,
-    #  rocking angle 0). Thank Seth !
-    ## @param self
-    #  The class instance.
-    ## We add 10km to the earth radius because we're interested in the atmosphere.    
-    def getEarthLimb(self):
-	# if we're not rocking too much then we have no earth limb in FOV
-        if (self.HorizonAngle - (self.RockAngle+LAT_FOV)>0 ):
-	    return 0
-	# if not then we have to calculate the arc lenght        
-        alphaFOV = math.radians(LAT_FOV)
-        alambda  = math.radians(self.HorizonAngle)
-	theta    = math.radians(self.RockAngle)
-	thing    = math.cos(alphaFOV)/math.cos(theta - alambda)
-        elimb    = 2*math.acos( thing )
-	return math.degrees(elimb)
-	
-    ## @brief Get the axis (Ra, Dec) from the axis vector
-    ## @param self
-    #  The class instance.
-    ## @param axis
-    #  The axis vector you want the Ra and Dec
-    def getAxisRaDec(self, axis):
-	dec = math.degrees(axis.Theta())
-    	ra  = math.degrees(axis.Phi())
-	dec = 90-dec
-	if ra<0:
-	    ra+=360
-        return (ra, dec)
-
-    ## @brief Get the quaternion X Axis pointing direction in equatorial coordinates (Ra, Dec)
-    ## @param self
-    #  The class instance.
-    def getXaxisPointing(self):
-        return self.getAxisRaDec(self.XaxisVector)
-
-    ## @brief Get the quaternion Y Axis pointing direction in equatorial coordinates (Ra, Dec)
-    ## @param self
-    #  The class instance.
-    def getYaxisPointing(self):        
-        return self.getAxisRaDec(self.YaxisVector)
-
-    ## @brief Get the quaternion Z Axis pointing direction in equatorial coordinates (Ra, Dec)
+    ## @brief Returns the signed distance (in km) to the SAA border
+    #  (-9999 if no SAA polygon is available).
     ## @param self
     #  The class instance.
-    def getZaxisPointing(self):        
-        return self.getAxisRaDec(self.ZaxisVector)
-
     def getDistanceToSAA(self):
         if self.SAAPolygon is None:
             return -9999
         else:
-            vertex = pVertex(self.getLongitude(), self.getLatitude())
-            return self.SAAPolygon.getDistanceToBorder(vertex)
+            return self.SAAPolygon.getDistancesToBorder(self.getLongitude(),
+                                                        self.getLatitude())
 
     ## @brief Call processing of the earth coordinates
+    #
+    #  The conversions are implemented (for arrays of points) in the
+    #  pSCCoordinates module.
     ## @param self
     #  The class instance.
     def processCoordinates(self):
-	self.setAllAxisVectors()
-	self.setRockAngle()
-        self.JulianDate = self.getJulianDateFromMET(self.MetInSeconds)
-        self.GMSTime    = self.getGMSTime(self.JulianDate)
-        self.EarthCoordinates = self.getEarthCoordinate()
-        self.Latitude         = self.EarthCoordinates[0]
-        self.Longitude        = self.EarthCoordinates[1]
-        self.Altitude         = self.EarthCoordinates[2]
-	self.PitchRollYaw     = self.getEulerAngles()
-	self.Pitch 	      = self.PitchRollYaw[0]
-	self.Roll  	      = self.PitchRollYaw[1]
-	self.Yaw   	      = self.PitchRollYaw[2]
-	self.Xaxis = self.getXaxisPointing()
-	self.XRa   = self.Xaxis[0]
-	self.XDec  = self.Xaxis[1]
-	self.Yaxis = self.getYaxisPointing()
-	self.YRa   = self.Yaxis[0]
-	self.YDec  = self.Yaxis[1]
-	self.Zaxis = self.getZaxisPointing()
-	self.ZRa   = self.Zaxis[0]
-	self.ZDec  = self.Zaxis[1]
-	self.HorizonAngle      = self.getHorizonAngle()
-	self.ArcAngleEarthLimb = self.getEarthLimb()
-	self.ZGalacticLB = self.processZGalacticLB()
-	self.ZGalL = self.ZGalacticLB[0]
-	self.ZGalB = self.ZGalacticLB[1]
+        c = pSCCoordinates.processCoordinates(
+            [self.MetInSeconds], [self.Position], [self.Quaternion])
+        for name in pSCCoordinates.COORDINATE_NAMES:
+            setattr(self, name, float(c[name][0]))
+        self.XaxisVector = c['XaxisVector'][0]
+        self.YaxisVector = c['YaxisVector'][0]
+        self.ZaxisVector = c['ZaxisVector'][0]
+        self.EarthCoordinates = (self.Latitude, self.Longitude, self.Altitude)
+        self.PitchRollYaw     = (self.Pitch, self.Roll, self.Yaw)
+        self.Xaxis = (self.XRa, self.XDec)
+        self.Yaxis = (self.YRa, self.YDec)
+        self.Zaxis = (self.ZRa, self.ZDec)
+        self.ZGalacticLB = (self.ZGalL, self.ZGalB)
 	
 	
 if __name__ == '__main__':
@@ -0,0 +1,184 @@
+## @package pStageProfiler
+## @brief Instrumentation of the data processing pipeline.
+#
+#  Keeps track of the time spent in each stage of the event processing
+#  (reading, iteration over the contributions, error handling, tree filling
+#  etc.) as well as of the distributions of the event size and of the
+#  number of errors per event.
+
+import pSafeLogger
+logger = pSafeLogger.getLogger('pStageProfiler')
+
+import time
+
+
+## @brief The width (in bytes) of the bins of the event size histogram.
+
+EVENT_SIZE_BIN_WIDTH = 256
+
+## @brief The processing stages, in the order they are reported.
+#
+#  Note that the times are inclusive, i.e. the time spent in the
+#  subsystem contributions (TKR, CAL, ACD, GEM) is also accounted for in the
+#  iterator stage.
+
+STAGES = ['reader', 'iterator', 'TKR', 'CAL', 'ACD', 'GEM', 'meta_context',
+          'geomag', 'error_flush', 'tree_fill']
+
+
+## @brief Implementation of the stage profiler.
+
+class pStageProfiler:
+
+    ## @brief Constructor.
+    ## @param self
+    #  The class instance.
+
+    def __init__(self):
+
+        ## @var StageTimes
+        ## @brief Dictionary of the time (in s) spent in each stage.
+
+        ## @var StageCalls
+        ## @brief Dictionary of the number of calls to each stage.
+
+        ## @var StartTimes
+        ## @brief Dictionary of the start times of the running stages.
+
+        ## @var EventSizeHist
+        ## @brief Histogram of the event size (indexed by bin number).
+
+        ## @var NumErrorsHist
+        ## @brief Histogram of the number of errors per event (indexed by
+        #  number of errors).
+
+        self.StageTimes    = {}
+        self.StageCalls    = {}
+        self.StartTimes    = {}
+        self.EventSizeHist = {}
+        self.NumErrorsHist = {}
+        for stage in STAGES:
+            self.StageTimes[stage] = 0.0
+            self.StageCalls[stage] = 0
+
+    ## @brief Mark the beginning of a stage.
+    ## @param self
+    #  The class instance.
+    ## @param stage
+    #  The stage name.
+
+    def start(self, stage):
+        self.StartTimes[stage] = time.time()
+
+    ## @brief Mark the end of a stage.
+    ## @param self
+    #  The class instance.
+    ## @param stage
+    #  The stage name.
+
+    def stop(self, stage):
+        self.StageTimes[stage] += time.time() - self.StartTimes[stage]
+        self.StageCalls[stage] += 1
+
+    ## @brief Fill the event size and number of errors histograms.
+    ## @param self
+    #  The class instance.
+    ## @param eventSize
+    #  The event size in bytes.
+    ## @param numErrors
+    #  The number of errors in the event.
+
+    def fillEvent(self, eventSize, numErrors):
+        sizeBin = eventSize/EVENT_SIZE_BIN_WIDTH
+        self.EventSizeHist[sizeBin] = self.EventSizeHist.get(sizeBin, 0) + 1
+        self.NumErrorsHist[numErrors] =\
+            self.NumErrorsHist.get(numErrors, 0) + 1
+
+    ## @brief Return the number of events filled in the histograms.
+    ## @param self
+    #  The class instance.
+
+    def getNumEvents(self):
+        return sum(self.EventSizeHist.values())
+
+    ## @brief Merge the content of another profiler (e.g. the one of a
+    #  shard of a parallel run) into this one.
+    ## @param self
+    #  The class instance.
+    ## @param profiler
+    #  The other pStageProfiler object.
+
+    def merge(self, profiler):
+        for stage in STAGES:
+            self.StageTimes[stage] += profiler.StageTimes[stage]
+            self.StageCalls[stage] += profiler.StageCalls[stage]
+        for (key, value) in profiler.EventSizeHist.items():
+            self.EventSizeHist[key] = self.EventSizeHist.get(key, 0) + value
+        for (key, value) in profiler.NumErrorsHist.items():
+            self.NumErrorsHist[key] = self.NumErrorsHist.get(key, 0) + value
+
+    ## @brief Write the profiling information into an (open) xml writer.
+    ## @param self
+    #  The class instance.
+    ## @param writer
+    #  The pXmlWriter object.
+
+    def writeXml(self, writer):
+        writer.openTag('profile')
+        writer.indent()
+        for stage in STAGES:
+            writer.writeTag('stage', {'name' : stage,
+                                      'time' : self.StageTimes[stage],
+                                      'calls': self.StageCalls[stage]})
+        writer.openTag('eventSizeHist', {'bin_width': EVENT_SIZE_BIN_WIDTH})
+        writer.indent()
+        for (sizeBin, entries) in sorted(self.EventSizeHist.items()):
+            writer.writeTag('bin', {'low': sizeBin*EVENT_SIZE_BIN_WIDTH,
+                                    'entries': entries})
+        writer.backup()
+        writer.closeTag('eventSizeHist')
+        writer.openTag('numErrorsHist')
+        writer.indent()
+        for (numErrors, entries) in sorted(self.NumErrorsHist.items()):
+            writer.writeTag('bin', {'low': numErrors, 'entries': entries})
+        writer.backup()
+        writer.closeTag('numErrorsHist')
+        writer.backup()
+        writer.closeTag('profile')
+
+    ## @brief Write the profiling information to a csv file.
+    #
+    #  Each line has the form "quantity,key,value", where quantity is one of
+    #  stage_time, stage_calls, event_size (key being the lower edge of the
+    #  bin in bytes) and num_errors.
+    ## @param self
+    #  The class instance.
+    ## @param filePath
+    #  The path to the output file.
+
+    def writeCsv(self, filePath):
+        logger.info('Writing profile csv file: %s.' % filePath)
+        outputFile = file(filePath, 'w')
+        outputFile.write('quantity,key,value\n')
+        for stage in STAGES:
+            outputFile.write('stage_time,%s,%f\n' %\
+                             (stage, self.StageTimes[stage]))
+            outputFile.write('stage_calls,%s,%d\n' %\
+                             (stage, self.StageCalls[stage]))
+        for (sizeBin, entries) in sorted(self.EventSizeHist.items()):
+            outputFile.write('event_size,%d,%d\n' %\
+                             (sizeBin*EVENT_SIZE_BIN_WIDTH, entries))
+        for (numErrors, entries) in sorted(self.NumErrorsHist.items()):
+            outputFile.write('num_errors,%d,%d\n' % (numErrors, entries))
+        outputFile.close()
+
+    ## @brief Class representation.
+    ## @param self
+    #  The class instance.
+
+    def __str__(self):
+        text = ''
+        for stage in STAGES:
+            text += '%-12s: %10.3f s (%d calls)\n' %\
+                    (stage, self.StageTimes[stage], self.StageCalls[stage])
+        return text
@@ -58,6 +58,31 @@ def getJ2000toTETEMatrix(julianDate):
     return getTETEtoJ2000Matrix(julianDate).transpose()
 
 
+# The J2000 to TETE matrices change by about 7e-7 (rad) per day, mostly
+# because of the precession (50.3 arcsec per year) plus the short-period
+# nutation terms. For arrays of dates they are only computed once per bucket
+# of TETE_MATRIX_BUCKET days (at the center of the bucket) and cached: with
+# one day buckets the rotation is off by at most ~3.5e-7 rad (0.07 arcsec),
+# i.e. ~2.5 m at the orbit radius, far below the accuracy of the magic7
+# positions the Earth coordinates are computed from.
+TETE_MATRIX_BUCKET = 1.0
+TETE_MATRIX_CACHE = {}
+
+def getBucketJ2000toTETEMatrix(bucket, bucketSize = TETE_MATRIX_BUCKET):
+    key = (bucket, bucketSize)
+    if key not in TETE_MATRIX_CACHE:
+        julianDate = (bucket + 0.5)*bucketSize
+        TETE_MATRIX_CACHE[key] = numpy.array(getJ2000toTETEMatrix(julianDate))
+    return TETE_MATRIX_CACHE[key]
+
+def getJ2000toTETEMatrices(julianDates, bucketSize = TETE_MATRIX_BUCKET):
+    buckets = numpy.floor(numpy.asarray(julianDates, 'd')/bucketSize)
+    (uniqueBuckets, inverse) = numpy.unique(buckets, return_inverse = True)
+    matrices = numpy.array([getBucketJ2000toTETEMatrix(bucket, bucketSize)\
+                            for bucket in uniqueBuckets])
+    return matrices.reshape((-1, 3, 3))[inverse.ravel()]
+
+
 
 if __name__ == '__main__':
     # This is from ejs: precession matrix for jd = 2454770.37
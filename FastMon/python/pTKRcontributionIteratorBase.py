@@ -6,6 +6,7 @@ import pSafeLogger
 logger = pSafeLogger.getLogger('pTKRcontributionIteratorBase')
 
 import LDF
+import numpy
 
 from copy      import copy
 from pGlobals  import *
@@ -38,11 +39,19 @@ class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
         ## @var ErrorHandler
         ## @brief The pErrorHandler object responsible for
         #  managing the errors.
+
+        ## @var StripLayerEnds
+        ## @brief The layer ends of the strips buffered by bufferStrip().
+
+        ## @var StripHits
+        ## @brief The strip ids of the strips buffered by bufferStrip().
         
         LDF.TKRcontributionIterator.__init__(self, event, contribution)
         self.TemId        = LDF.LATPcellHeader.source(contribution.header())
         self.TreeMaker    = treeMaker
         self.ErrorHandler = errorHandler
+        self.StripLayerEnds = []
+        self.StripHits      = []
 
     ## @brief Handle error function overload
     #  From Ric Claus
@@ -76,6 +85,9 @@ class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
 
     def iterate(self):
         rc     = self.iterateStrips()
+        if len(self.StripHits):
+            self.strips(numpy.array(self.StripLayerEnds),\
+                        numpy.array(self.StripHits))
         status = self.status()
         if status < 0:
 	    return rc             # Exit Tkr contribution iterator on error
@@ -96,6 +108,63 @@ class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
     def TOT(self, tower, layerEnd, tot):
         pass
 
+    ## @brief Function included by default by the corresponding method
+    #  of the derived iterator (the one which is actually run).
+    #
+    #  This is called once per contribution, at the end of the strip
+    #  iteration, with all the strips buffered by bufferStrip().
+    ## @param self
+    #  The class instance.
+    ## @param layerEnds
+    #  The numpy array of the TKR layer end ids (0 to 71).
+    ## @param hits
+    #  The numpy array of the TKR strip ids.
+
+    def strips(self, layerEnds, hits):
+        pass
+
+    ## @brief Buffer a strip for the vectorized (__strips__) functions.
+    #
+    #  Called in the strip() iterator method of the derived iterator when
+    #  at least one of the variables is filled through its __strips__
+    #  function.
+    ## @param self
+    #  The class instance.
+    ## @param tower
+    #  The TEM id (0 to 15).
+    ## @param layerEnd
+    #  The TKR layer end id (0 to 71). 
+    ## @param hit
+    #  The TKR strip id.
+
+    def bufferStrip(self, tower, layerEnd, hit):
+        self.StripLayerEnds.append(layerEnd)
+        self.StripHits.append(hit)
+
+    ## @brief Add to the tower slice of a variable the number of
+    #  occurrences of each set of indices, ignoring the ones out of range
+    #  (this is the vectorized equivalent of a loop of "+= 1").
+    ## @param self
+    #  The class instance.
+    ## @param name
+    #  The variable name.
+    ## @param indices
+    #  The numpy arrays of indices, one for each dimension of the tower slice.
+
+    def addCounts(self, name, *indices):
+        try:
+            counts = self.TreeMaker.getVariable(name)[self.TemId]
+        except IndexError:
+            return
+        mask = numpy.ones(len(indices[0]), bool)
+        for (index, size) in zip(indices, counts.shape):
+            mask &= (index < size)
+        flatIndices = 0
+        for (index, size) in zip(indices, counts.shape):
+            flatIndices = flatIndices*size + index[mask]
+        counts.reshape(-1)[:] += numpy.bincount(flatIndices,\
+                                                minlength = counts.size)
+
     ## @brief Function filling the TkrHits variable.
     ## @param self
     #  The class instance.
@@ -136,6 +205,19 @@ class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
         except IndexError:
             pass
 
+    ## @brief Function filling the TkrHitsTowerPlaneEnd variable in the
+    #  strips() iterator method (vectorized version of
+    #  TkrHitsTowerPlaneEnd__strip__).
+    ## @param self
+    #  The class instance.
+    ## @param layerEnds
+    #  The numpy array of the TKR layer end ids (0 to 71).
+    ## @param hits
+    #  The numpy array of the TKR strip ids.
+
+    def TkrHitsTowerPlaneEnd__strips__(self, layerEnds, hits):
+        self.addCounts("TkrHitsTowerPlaneEnd", layerEnds//2, layerEnds%2)
+
     ## @brief Function filling the TkrHitsGTFE variable in the
     #  strip() iterator method.
     #  Try/Except is probably not needed anymore
@@ -155,6 +237,18 @@ class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
         except IndexError:
             pass
 
+    ## @brief Function filling the TkrHitsGTFE variable in the
+    #  strips() iterator method (vectorized version of TkrHitsGTFE__strip__).
+    ## @param self
+    #  The class instance.
+    ## @param layerEnds
+    #  The numpy array of the TKR layer end ids (0 to 71).
+    ## @param hits
+    #  The numpy array of the TKR strip ids.
+
+    def TkrHitsGTFE__strips__(self, layerEnds, hits):
+        self.addCounts("TkrHitsGTFE", layerEnds//2, hits//64)
+
     ## @brief Function filling the ToT_con0_TowerPlane variable in the
     #  TOT() iterator method.
     #  Try/Except is probably not needed anymore
@@ -231,3 +325,16 @@ class pTKRcontributionIteratorBase(LDF.TKRcontributionIterator):
                         [self.TemId][layerEnd/2] += 1
         except IndexError:
             pass
+
+    ## @brief Function filling the TkrHitsTowerPlane variable in the
+    #  strips() iterator method (vectorized version of
+    #  TkrHitsTowerPlane__strip__).
+    ## @param self
+    #  The class instance.
+    ## @param layerEnds
+    #  The numpy array of the TKR layer end ids (0 to 71).
+    ## @param hits
+    #  The numpy array of the TKR strip ids.
+
+    def TkrHitsTowerPlane__strips__(self, layerEnds, hits):
+        self.addCounts("TkrHitsTowerPlane", layerEnds//2)
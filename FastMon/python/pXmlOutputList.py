@@ -203,26 +203,72 @@ class pPlotXmlRep(pXmlElement):
         return self.Cut.replace(self.getExpandedExpression(),\
                                 self.getExpandedExpression(tower, layer, end))
                         
+    ## @brief Return the list of (tower, layer) ids of the objects to be
+    #  created for the specified Level.
+    ## @param self
+    #  The class instance.
+
+    def getLevelIds(self):
+        if self.Level == LAT_LEVEL:
+            return [(None, None)]
+        elif self.Level == TOWER_LEVEL:
+            return [(tower, None) for tower in range(NUM_TOWERS)]
+        elif self.Level == TKR_LAYER_LEVEL:
+            return [(tower, layer) for tower in range(NUM_TOWERS)\
+                    for layer in range(NUM_TKR_LAYERS_PER_TOWER)]
+        return []
+
+    ## @brief Fill a histogram from the tree.
+    #
+    #  If a pMultiHistogramFiller is given the histogram is just registered
+    #  with it, and filled along with all the others in one pass over the
+    #  tree; otherwise it is filled right away.
+    ## @param self
+    #  The class instance.
+    ## @param rootTree
+    #  The ROOT tree.
+    ## @param histogram
+    #  The ROOT histogram.
+    ## @param expression
+    #  The expression to be projected.
+    ## @param cut
+    #  The cut.
+    ## @param filler
+    #  The pMultiHistogramFiller object (or None).
+
+    def projectTree(self, rootTree, histogram, expression, cut, filler=None):
+        if filler is None:
+            rootTree.Project(histogram.GetName(), expression, cut)
+        else:
+            filler.addHistogram(histogram, expression, cut)
+
+    ## @brief Add a ROOT object to the dictionary.
+    ## @param self
+    #  The class instance.
+    ## @param object
+    #  The ROOT object.
+
+    def addRootObject(self, object):
+        self.RootObjects[object.GetName()] = object
+
     ## @brief Create the actual ROOT objects.
+    #
+    #  Note that, if a pMultiHistogramFiller is given, the objects are
+    #  filled (and, when they are derived from other histograms, created)
+    #  only when the filler is run.
     ## @param self
     #  The class instance.
     ## @param rootTree
     #  The ROOT tree containing the (filled) branches from which the
     #  plots are created.
+    ## @param filler
+    #  The pMultiHistogramFiller object (or None).
     
-    def createRootObjects(self, rootTree):
-        if self.Level == LAT_LEVEL:
-            object = self.getRootObject(rootTree)
-            self.RootObjects[object.GetName()] = object
-        elif self.Level == TOWER_LEVEL:
-            for tower in range(NUM_TOWERS):
-                object = self.getRootObject(rootTree, tower)
-                self.RootObjects[object.GetName()] = object
-        elif self.Level == TKR_LAYER_LEVEL:
-            for tower in range(NUM_TOWERS):
-                for layer in range(NUM_TKR_LAYERS_PER_TOWER):
-                    object = self.getRootObject(rootTree, tower, layer)
-                    self.RootObjects[object.GetName()] = object
+    def createRootObjects(self, rootTree, filler=None):
+        for (tower, layer) in self.getLevelIds():
+            object = self.getRootObject(rootTree, tower, layer, filler)
+            if object is not None:
+                self.addRootObject(object)
 
     ## @brief Get the list of names of the ROOT objects, as they would be
     #  created by createRootObjects().
@@ -235,17 +281,8 @@ class pPlotXmlRep(pXmlElement):
     #  The class instance.   
 
     def getRootObjectsName(self):
-        namesList = []
-        if self.Level == LAT_LEVEL:
-            namesList.append(self.getExpandedName())
-        elif self.Level == TOWER_LEVEL:
-            for tower in range(NUM_TOWERS):
-                namesList.append(self.getExpandedName(tower))
-        elif self.Level == TKR_LAYER_LEVEL:
-            for tower in range(NUM_TOWERS):
-                for layer in range(NUM_TKR_LAYERS_PER_TOWER):
-                    namesList.append(self.getExpandedName(tower, layer))
-        return namesList
+        return [self.getExpandedName(tower, layer) for (tower, layer) in\
+                self.getLevelIds()]
 
     ## @brief Class representation.
     ## @param self
@@ -295,16 +332,18 @@ class pTH1FXmlRep(pPlotXmlRep):
     #  The tower ID for the specified Level.
     ## @param layer
     #  The TKR layer ID for the specified Level.
+    ## @param filler
+    #  The pMultiHistogramFiller object (or None).
 
-    def getRootObject(self, rootTree, tower=None, layer=None):
+    def getRootObject(self, rootTree, tower=None, layer=None, filler=None):
         histogram = ROOT.TH1F(self.getExpandedName(tower, layer),\
                               self.getExpandedTitle(tower, layer),\
                               self.NumXBins, self.XMin, self.XMax)
         histogram.GetXaxis().SetTitle(self.XLabel)
         histogram.GetYaxis().SetTitle(self.YLabel)
-        rootTree.Project(histogram.GetName(),\
+        self.projectTree(rootTree, histogram,\
                          self.getExpandedExpression(tower, layer),\
-                         self.getExpandedCut(tower, layer))
+                         self.getExpandedCut(tower, layer), filler)
         return histogram
 
     ## @brief Class representation.
@@ -354,17 +393,19 @@ class pTH2FXmlRep(pTH1FXmlRep):
     #  The tower ID for the specified Level.
     ## @param layer
     #  The TKR layer ID for the specified Level.
+    ## @param filler
+    #  The pMultiHistogramFiller object (or None).
 
-    def getRootObject(self, rootTree, tower=None, layer=None):
+    def getRootObject(self, rootTree, tower=None, layer=None, filler=None):
         histogram = ROOT.TH2F(self.getExpandedName(tower, layer),\
                               self.getExpandedTitle(tower, layer),\
                               self.NumXBins, self.XMin, self.XMax,\
                               self.NumYBins, self.YMin, self.YMax)
         histogram.GetXaxis().SetTitle(self.XLabel)
         histogram.GetYaxis().SetTitle(self.YLabel)
-        rootTree.Project(histogram.GetName(),\
+        self.projectTree(rootTree, histogram,\
                          self.getExpandedExpression(tower, layer),\
-                         self.getExpandedCut(tower, layer))
+                         self.getExpandedCut(tower, layer), filler)
         return histogram
 
     ## @brief Class representation.
@@ -415,35 +456,76 @@ class pStripChartXmlRep(pPlotXmlRep):
     #  The tower ID for the specified Level.
     ## @param layer
     #  The TKR layer ID for the specified Level.
+    ## @param filler
+    #  The pMultiHistogramFiller object (or None). If given, the profile is
+    #  only created (and added to the dictionary of the ROOT objects) when
+    #  the filler is run, and None is returned.
 
-    def getRootObject(self, rootTree, tower=None, layer=None):
-	tmin = rootTree.GetMinimum('event_timestamp')
-        tmax = rootTree.GetMaximum('event_timestamp')
+    def getRootObject(self, rootTree, tower=None, layer=None, filler=None):
+        (tmin, tmax) = self.getRange(rootTree, 'event_timestamp', filler)
 	# ymin and ymax may be passed in the xml if not try to get
         #them from the tree
         # GetMaximum works only on direct tree variable (e.g. not on
         #cal_log_count[i])
 	# Need to implement something better
-	expression = self.getExpandedExpression()
-        if self.YMin is None:
-	  self.YMin = rootTree.GetMinimum(expression)
-        if self.YMax is None:
-	  self.YMax = rootTree.GetMaximum(expression)
+        if self.YMin is None or self.YMax is None:
+            (ymin, ymax) = self.getRange(rootTree,\
+                                         self.getExpandedExpression(), filler)
+            if self.YMin is None:
+                self.YMin = ymin
+            if self.YMax is None:
+                self.YMax = ymax
         
         nTimeBin = int((tmax-tmin)/self.DTime)
-	htemp = ROOT.TH2F('htemp', 'htemp', nTimeBin, tmin, tmax, 100,\
+        htempName = '%s_htemp' % self.getExpandedName(tower, layer)
+	htemp = ROOT.TH2F(htempName, htempName, nTimeBin, tmin, tmax, 100,\
                           self.YMin,self.YMax)
 	#Cut is always on the variable itself now : should come from xml
         expression = self.getExpandedExpression(tower, layer)
         cut        = self.getExpandedCut(tower, layer)
-	rootTree.Project('htemp', '%s:event_timestamp'% expression, cut)
+        self.projectTree(rootTree, htemp, '%s:event_timestamp'% expression,\
+                         cut, filler)
+        if filler is not None:
+            filler.addPostFillAction(lambda: self.addRootObject(\
+                self.getProfile(htemp, tower, layer)))
+            return None
+	return self.getProfile(htemp, tower, layer)
+
+    ## @brief Return the tuple (minimum, maximum) of a tree variable.
+    #
+    #  The ranges are cached by the pMultiHistogramFiller (if any), so that
+    #  the tree is not read again for each strip chart.
+    ## @param self
+    #  The class instance.
+    ## @param rootTree
+    #  The ROOT tree.
+    ## @param varName
+    #  The variable name.
+    ## @param filler
+    #  The pMultiHistogramFiller object (or None).
+
+    def getRange(self, rootTree, varName, filler=None):
+        if filler is not None:
+            return filler.getRange(varName)
+        return (rootTree.GetMinimum(varName), rootTree.GetMaximum(varName))
+
+    ## @brief Return the profile of the (filled) temporary 2-D histogram.
+    ## @param self
+    #  The class instance.
+    ## @param htemp
+    #  The temporary 2-D histogram.
+    ## @param tower
+    #  The tower ID for the specified Level.
+    ## @param layer
+    #  The TKR layer ID for the specified Level.
+
+    def getProfile(self, htemp, tower=None, layer=None):
         profile = htemp.ProfileX()
         profile.SetNameTitle(self.getExpandedName(tower, layer),\
                              self.getExpandedTitle(tower, layer))
         profile.GetXaxis().SetTitle(self.XLabel)
         profile.GetYaxis().SetTitle(self.YLabel)
-        del htemp
-	return  profile
+        return profile
 
     def __str__(self):
         return pPlotXmlRep.__str__(self)
@@ -477,9 +559,24 @@ class pRateStripChartXmlRep(pStripChartXmlRep):
     ## @param layer
     #  The TKR layer ID for the specified Level.
     
-    def getRootObject(self, rootTree, tower=None, layer=None):
-        profileTemp = pStripChartXmlRep.getRootObject(self, rootTree,\
-                                                      tower=None, layer=None)
+    def getRootObject(self, rootTree, tower=None, layer=None, filler=None):
+        return pStripChartXmlRep.getRootObject(self, rootTree,\
+                                               tower=None, layer=None,\
+                                               filler=filler)
+
+    ## @brief Return the profile of the (filled) temporary 2-D histogram,
+    #  scaled to the width of the time bin.
+    ## @param self
+    #  The class instance.
+    ## @param htemp
+    #  The temporary 2-D histogram.
+    ## @param tower
+    #  The tower ID for the specified Level.
+    ## @param layer
+    #  The TKR layer ID for the specified Level.
+
+    def getProfile(self, htemp, tower=None, layer=None):
+        profileTemp = pStripChartXmlRep.getProfile(self, htemp, tower, layer)
         profileTemp.Scale(profileTemp.GetSumOfWeights()/self.DTime)
         return profileTemp
 
@@ -548,7 +645,7 @@ class pCUSTOMXmlRep(pPlotXmlRep):
     #  Note that the level must be defined in the xml file anyway, in order
     #  for the output lists to be properly populated.
 
-    def createRootObjects(self, rootTree):
+    def createRootObjects(self, rootTree, filler=None):
         objects = self.getRootObjects(rootTree)
         for object in objects:
             self.RootObjects[object.GetName()] = object
@@ -0,0 +1,180 @@
+import os
+import unittest
+import numpy
+
+from math import cos, sin, acos, atan2
+from xml.dom import minidom
+
+from pSAAGeometry import pSAAGeometry, EARTH_RADIUS, DEG_TO_RAD, RAD_TO_DEG
+
+SAA_XML_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 '..', '..', 'FastMonCfg', 'xml',
+                                 'saaDefinition.xml')
+
+
+def getVertices(xmlFilePath = SAA_XML_FILE_PATH):
+    doc = minidom.parse(xmlFilePath)
+    return [(float(element.getAttribute('longitude')),\
+             float(element.getAttribute('latitude'))) for element in\
+            doc.getElementsByTagName('vertex')]
+
+
+# The original per-point implementation (pSAAPolygon, before the geometry
+# was moved to numpy), without the ROOT objects. The only difference is
+# that a ray not crossing any segment on the side of the point is assigned
+# to the last one (the original code failed on a None segment there), as it
+# already happened on the opposite side.
+
+def getDistanceOnSphere(lon1, lat1, lon2, lat2):
+    b = DEG_TO_RAD*(90 - lat1)
+    c = DEG_TO_RAD*(90 - lat2)
+    A = DEG_TO_RAD*(lon1 - lon2)
+    return EARTH_RADIUS/1000.*acos(cos(b)*cos(c) + sin(b)*sin(c)*cos(A))
+
+
+class pReferencePolygon:
+
+    def __init__(self, vertices):
+        self.Vertices = vertices
+        self.Segments = list(zip(vertices, vertices[1:] + vertices[:1]))
+        self.CenterLon = sum([lon for (lon, lat) in vertices])/len(vertices)
+        self.CenterLat = sum([lat for (lon, lat) in vertices])/len(vertices)
+
+    def getAngleToCenter(self, lon, lat):
+        return RAD_TO_DEG*atan2(lon - self.CenterLon, lat - self.CenterLat)
+
+    def getCrossSegments(self, lon, lat):
+        s1 = None
+        s2 = None
+        angle = self.getAngleToCenter(lon, lat)
+        if angle > 0:
+            shift = -180
+        else:
+            shift = 180
+        for segment in self.Segments:
+            angle1 = self.getAngleToCenter(*segment[0])
+            angle2 = self.getAngleToCenter(*segment[1])
+            if (angle > angle1 and angle < angle2):
+                s1 = segment
+            if (angle + shift > angle1 and angle + shift < angle2):
+                s2 = segment
+        if s1 is None:
+            s1 = self.Segments[-1]
+        if s2 is None:
+            s2 = self.Segments[-1]
+        return (s1, s2)
+
+    def getIntersection(self, lon, lat, segment):
+        (x1, y1) = (self.CenterLon, self.CenterLat)
+        (x2, y2) = (lon, lat)
+        ((x3, y3), (x4, y4)) = segment
+        u = ((x4-x3)*(y1-y3) - (y4-y3)*(x1-x3))/\
+            ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1))
+        return (x1 + u*(x2-x1), y1 + u*(y2-y1))
+
+    def getRawDistanceToBorder(self, lon, lat):
+        (s1, s2) = self.getCrossSegments(lon, lat)
+        (x1, y1) = self.getIntersection(lon, lat, s1)
+        (x2, y2) = self.getIntersection(lon, lat, s2)
+        d = min(getDistanceOnSphere(lon, lat, x1, y1),
+                getDistanceOnSphere(lon, lat, x2, y2))
+        center = (self.CenterLon, self.CenterLat)
+        if getDistanceOnSphere(lon, lat, *center) <\
+           getDistanceOnSphere(x1, y1, *center):
+            d *= -1
+        return d
+
+    def getDistanceToBorder(self, lon, lat, lonPadding = 10.0):
+        pad = float(abs(abs(lon) - 180))
+        if pad > lonPadding:
+            return self.getRawDistanceToBorder(lon, lat)
+        d1 = self.getRawDistanceToBorder(lon, lat)
+        d2 = self.getRawDistanceToBorder(-lon, lat)
+        weight = 1 - abs(lonPadding - pad)/(2*lonPadding)
+        return d1*weight + d2*(1 - weight)
+
+    # Same as the __polygons__ LRS utility (the polygon is monotone in
+    # latitude, so that this is equivalent to the even-odd rule).
+    def isInside(self, lon, lat):
+        xIntercepts = []
+        for ((x1, y1), (x2, y2)) in self.Segments:
+            if (y1 < lat) == (y2 > lat):
+                xIntercepts.append((x2 - x1)*(lat - y1)/(y2 - y1) + x1)
+        if xIntercepts == []:
+            return False
+        return (lon > min(xIntercepts) and lon < max(xIntercepts))
+
+
+class pSAAGeometryTest(unittest.TestCase):
+
+    def setUp(self):
+        vertices = getVertices()
+        self.Geometry = pSAAGeometry(vertices)
+        self.Reference = pReferencePolygon(vertices)
+        random = numpy.random.RandomState(1)
+        # Points all over the orbit band, plus points around the SAA.
+        self.Lon = numpy.concatenate([random.uniform(-180, 180, 5000),
+                                      random.uniform(-110, 45, 5000)])
+        self.Lat = numpy.concatenate([random.uniform(-25.6, 25.6, 5000),
+                                      random.uniform(-32, 8, 5000)])
+
+    def testVertices(self):
+        self.assertEqual(self.Geometry.getNumVertices(), 8)
+        self.assertAlmostEqual(self.Geometry.CenterLon,\
+                               self.Reference.CenterLon, 10)
+        self.assertAlmostEqual(self.Geometry.CenterLat,\
+                               self.Reference.CenterLat, 10)
+
+    def testDistanceToBorder(self):
+        distance = self.Geometry.getDistanceToBorder(self.Lon, self.Lat)
+        expected = [self.Reference.getDistanceToBorder(lon, lat) for\
+                    (lon, lat) in zip(self.Lon, self.Lat)]
+        numpy.testing.assert_allclose(distance, expected, rtol = 1e-9,\
+                                      atol = 1e-6)
+        for padding in [0., 25.]:
+            distance = self.Geometry.getDistanceToBorder(self.Lon[:500],\
+                                                         self.Lat[:500],\
+                                                         padding)
+            expected = [self.Reference.getDistanceToBorder(lon, lat, padding)\
+                        for (lon, lat) in zip(self.Lon[:500], self.Lat[:500])]
+            numpy.testing.assert_allclose(distance, expected, rtol = 1e-9,\
+                                          atol = 1e-6)
+
+    def testInside(self):
+        inside = self.Geometry.isInside(self.Lon, self.Lat)
+        expected = [self.Reference.isInside(lon, lat) for (lon, lat) in\
+                    zip(self.Lon, self.Lat)]
+        numpy.testing.assert_array_equal(inside, expected)
+        self.assertTrue(inside.any() and not inside.all())
+        # Away from the +-180 degrees averaging, being inside the polygon
+        # is the same as having a negative distance to the border.
+        distance = self.Geometry.getDistanceToBorder(self.Lon, self.Lat)
+        mask = (abs(self.Lon) < 170) & (abs(distance) > 1e-6)
+        numpy.testing.assert_array_equal(inside[mask], distance[mask] < 0)
+
+    def testScalar(self):
+        for (lon, lat) in zip(self.Lon[:20], self.Lat[:20]):
+            (lon, lat) = (float(lon), float(lat))
+            distance = self.Geometry.getDistanceToBorder(lon, lat)
+            self.assertTrue(isinstance(distance, float))
+            self.assertAlmostEqual(distance,\
+                self.Reference.getDistanceToBorder(lon, lat), 6)
+            inside = self.Geometry.isInside(lon, lat)
+            self.assertTrue(isinstance(inside, bool))
+            self.assertEqual(inside, self.Reference.isInside(lon, lat))
+        center = (self.Geometry.CenterLon, self.Geometry.CenterLat)
+        self.assertTrue(self.Geometry.isInside(*center))
+        self.assertFalse(self.Geometry.isInside(100., 0.))
+
+    def testVertexRays(self):
+        # The rays through the vertices don't cross any segment strictly.
+        (lon, lat) = (self.Geometry.Lons, self.Geometry.Lats)
+        (lon, lat) = (lon + 0.5*(lon - self.Geometry.CenterLon),\
+                      lat + 0.5*(lat - self.Geometry.CenterLat))
+        distance = self.Geometry.getDistanceToBorder(lon, lat)
+        self.assertTrue(numpy.isfinite(distance).all())
+        self.assertFalse(self.Geometry.isInside(lon, lat).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,15 @@
 import igrf
 import os
+import numpy
 from math import acos,sqrt
 
 earth_radius=6371.2
 
+# Quantities returned by IGRF.computeArrays().
+ARRAY_QUANTITIES = ['BNorth', 'BEast', 'BDown', 'BAbs', 'BEquator', 'BB0',
+                    'McIlwainL', 'RigidityCutoff', 'InvariantLatitude',
+                    'InvariantLambda', 'InvariantRadius', 'DipoleMoment']
+
 class IGRF:
     
     def __init__(self):
@@ -52,6 +58,53 @@ class IGRF:
             if rl<=1: self.InvariantLambda = acos(sqrt(rl))
 	    else: self.InvariantLambda = 0
 
+    def computeArrays(self,lat,lon,alt,year):
+        """ Vectorized version of compute().
+
+        Takes arrays (or scalars, broadcast against each other) of latitude,
+        longitude, altitude and year and returns a dictionary of arrays
+        indexed by the names in ARRAY_QUANTITIES. The model coefficients
+        (and the dipole moment) are computed once per distinct year.
+        The instance members are not modified.
+        """
+        lat, lon, alt, year = [numpy.ravel(x) for x in numpy.broadcast_arrays(
+            numpy.asarray(lat, 'd'), numpy.asarray(lon, 'd'),
+            numpy.asarray(alt, 'd'), numpy.asarray(year, 'd'))]
+        if (year < 1990).any():
+            raise ValueError, 'This model is valid only after 1990.'
+        if (year >= 2025).any():
+            if 'IGNORE_IGRF_BOUNDARY' in os.environ.keys():
+                year = numpy.minimum(year, 2024.999)
+            else:
+                raise ValueError, 'This model is valid only until 2025.'
+        values = {}
+        for quantity in ARRAY_QUANTITIES:
+            values[quantity] = numpy.zeros(len(lat))
+        for epoch in numpy.unique(year):
+            igrf.initize()
+            dipoleMoment = igrf.feldcof(epoch)
+            for i in numpy.flatnonzero(year == epoch):
+                values['BNorth'][i], values['BEast'][i], values['BDown'][i],\
+                    values['BAbs'][i] = igrf.feldg(lat[i], lon[i], alt[i])
+                values['McIlwainL'][i], icode, bab1 =\
+                    igrf.shellg(lat[i], lon[i], alt[i], dipoleMoment)
+                val, values['BEquator'][i], rr0 = igrf.findb0(0.05, 0.001)
+                values['DipoleMoment'][i] = dipoleMoment
+        l = values['McIlwainL']
+        bb0 = values['BAbs']/values['BEquator']
+        values['BB0'] = bb0
+        values['RigidityCutoff'] =\
+            0.25*values['DipoleMoment']*earth_radius*3e-2/(l*l)
+        values['InvariantLatitude'] =\
+            numpy.where(l >= 1, numpy.arccos(numpy.sqrt(1./numpy.maximum(l, 1))), 0)
+        rl = pow(bb0, -0.215108)*(1. - 0.020551*(bb0 - 1.) +\
+                                  0.0008148*((bb0 - 1.)**2))
+        values['InvariantRadius'] = numpy.where(bb0 > 10, -1, rl*l)
+        values['InvariantLambda'] =\
+            numpy.where((bb0 > 10) | (rl > 1), 0,
+                        numpy.arccos(numpy.sqrt(numpy.clip(rl, 0, 1))))
+        return values
+
     def __str__(self):
         """ String formatting.
         """
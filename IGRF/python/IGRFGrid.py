@@ -0,0 +1,236 @@
+import os
+import numpy
+from itertools import product
+from IGRF import IGRF
+
+# Quantities tabulated in the grid (named after the IGRF class members).
+GRID_QUANTITIES = ['BAbs', 'BB0', 'McIlwainL', 'RigidityCutoff',
+                   'InvariantLatitude', 'InvariantLambda', 'InvariantRadius']
+
+# Grid axes, in the order of the table dimensions, as (min, max, step).
+# Latitudes and altitudes cover the Fermi orbit with some margin.
+DEFAULT_AXES = {'epoch'    : (2008.0, 2024.5, 0.5),
+                'altitude' : (450.0, 650.0, 25.0),
+                'latitude' : (-30.0, 30.0, 1.0),
+                'longitude': (-180.0, 180.0, 2.0)
+                }
+AXES_NAMES = ['epoch', 'altitude', 'latitude', 'longitude']
+
+# Validity range of the IGRF model (the upper bound is the same value the
+# model itself is clamped to when IGNORE_IGRF_BOUNDARY is set).
+MIN_MODEL_EPOCH = 1990.0
+MAX_MODEL_EPOCH = 2024.999
+
+# One grid cell center out of ERROR_SAMPLING (in each dimension) is
+# compared with the exact model when building the grid.
+ERROR_SAMPLING = 3
+
+
+def getMetaFilePath(filePath):
+    return '%s.meta.npz' % os.path.splitext(filePath)[0]
+
+
+def getAxis(axisMin, axisMax, step):
+    return numpy.arange(axisMin, axisMax + 0.5*step, step)
+
+
+class IGRFGrid:
+    """ Precomputed (epoch, altitude, latitude, longitude) grid of the
+    geomagnetic quantities of the IGRF model, with multilinear interpolation.
+
+    The table is a .npy file, which is memory-mapped, and the axes and error
+    bounds are stored in the companion .meta.npz file (see buildGrid()).
+    The compute() method has the same interface as IGRF.compute() and sets
+    the same members for the quantities in GRID_QUANTITIES; points outside
+    the grid are computed with the full model.
+    """
+
+    def __init__(self, filePath):
+        self.Table = numpy.load(filePath, mmap_mode = 'r')
+        meta = numpy.load(getMetaFilePath(filePath))
+        self.AxesMin = meta['axes_min']
+        self.AxesStep = meta['axes_step']
+        self.AxesSize = numpy.array(self.Table.shape[1:])
+        self.ErrorBounds = dict(zip(GRID_QUANTITIES, meta['max_errors']))
+        self.FieldModel = None
+        for quantity in GRID_QUANTITIES:
+            setattr(self, quantity, 0)
+
+    def getErrorBound(self, quantity):
+        """ Maximum absolute interpolation error measured on the grid.
+        """
+        return self.ErrorBounds[quantity]
+
+    def getGridCoordinates(self, lat, lon, alt, year):
+        """ Return the 1-d arrays of (epoch, altitude, latitude, longitude),
+        with the longitudes folded into [-180, 180).
+        """
+        lon = numpy.mod(numpy.asarray(lon, 'd') + 180.0, 360.0) - 180.0
+        coords = numpy.broadcast_arrays(numpy.asarray(year, 'd'),
+                                        numpy.asarray(alt, 'd'),
+                                        numpy.asarray(lat, 'd'), lon)
+        return [numpy.ravel(coord) for coord in coords]
+
+    def isInside(self, lat, lon, alt, year):
+        """ Mask of the points within the grid.
+        """
+        coords = self.getGridCoordinates(lat, lon, alt, year)
+        inside = numpy.ones(coords[0].shape, bool)
+        for (i, coord) in enumerate(coords):
+            x = (coord - self.AxesMin[i])/self.AxesStep[i]
+            inside &= (x >= 0) & (x <= self.AxesSize[i] - 1)
+        return inside
+
+    def interpolate(self, lat, lon, alt, year):
+        """ Interpolate all the grid quantities for arrays of points.
+
+        Return an array of shape (len(GRID_QUANTITIES), num_points).
+        """
+        coords = self.getGridCoordinates(lat, lon, alt, year)
+        indices = []
+        weights = []
+        inside = numpy.ones(coords[0].shape, bool)
+        for (i, coord) in enumerate(coords):
+            x = (coord - self.AxesMin[i])/self.AxesStep[i]
+            inside &= (x >= 0) & (x <= self.AxesSize[i] - 1)
+            index = numpy.clip(numpy.floor(x).astype(int), 0,
+                               self.AxesSize[i] - 2)
+            indices.append(index)
+            weights.append(x - index)
+        values = numpy.zeros((len(GRID_QUANTITIES),) + coords[0].shape)
+        for corner in product((0, 1), repeat = 4):
+            weight = 1.0
+            for (w, c) in zip(weights, corner):
+                weight = weight*(w if c else (1.0 - w))
+            values += weight*self.Table[:, indices[0] + corner[0],
+                                        indices[1] + corner[1],
+                                        indices[2] + corner[2],
+                                        indices[3] + corner[3]]
+        if not inside.all():
+            values[:, ~inside] = self.computeExact(coords[2][~inside],
+                                                   coords[3][~inside],
+                                                   coords[1][~inside],
+                                                   coords[0][~inside])
+        return values
+
+    def computeExact(self, lat, lon, alt, year):
+        """ Compute the grid quantities for arrays of points with the full
+        model.
+        """
+        if self.FieldModel is None:
+            self.FieldModel = IGRF()
+        values = self.FieldModel.computeArrays(lat, lon, alt, year)
+        return numpy.array([values[quantity] for quantity in GRID_QUANTITIES])
+
+    def compute(self, lat, lon, alt, year):
+        values = self.interpolate([lat], [lon], [alt], [year])
+        for (quantity, value) in zip(GRID_QUANTITIES, values[:, 0]):
+            setattr(self, quantity, value)
+
+    def __str__(self):
+        """ String formatting.
+        """
+        return '%s' % dict([(quantity, getattr(self, quantity))
+                            for quantity in GRID_QUANTITIES])
+
+
+def buildGrid(filePath, axes = DEFAULT_AXES):
+    """ Compute the grid with the full IGRF model and write it to filePath
+    (.npy), along with the axes and the interpolation error bounds
+    (.meta.npz). Epochs outside the validity range of the model are
+    computed at the nearest valid epoch.
+    """
+    model = IGRF()
+    axesValues = [getAxis(*axes[name]) for name in AXES_NAMES]
+    shape = (len(GRID_QUANTITIES),) + tuple(len(a) for a in axesValues)
+    print 'Building %s grid in %s...' % (shape, filePath)
+    table = numpy.lib.format.open_memmap(filePath, mode = 'w+',
+                                         dtype = 'float32', shape = shape)
+    alt, lat, lon = numpy.meshgrid(*axesValues[1:], indexing = 'ij')
+    for (i, year) in enumerate(axesValues[0]):
+        print 'Epoch %.2f...' % year
+        modelYear = min(max(year, MIN_MODEL_EPOCH), MAX_MODEL_EPOCH)
+        if modelYear != year:
+            print 'Outside the model validity range, using %.3f.' % modelYear
+        values = model.computeArrays(lat, lon, alt, modelYear)
+        for (j, quantity) in enumerate(GRID_QUANTITIES):
+            table[j, i] = values[quantity].reshape(alt.shape)
+    table.flush()
+    del table
+    axesMin = numpy.array([axes[name][0] for name in AXES_NAMES])
+    axesStep = numpy.array([axes[name][2] for name in AXES_NAMES])
+    numpy.savez(getMetaFilePath(filePath), axes_min = axesMin,
+                axes_step = axesStep,
+                max_errors = numpy.zeros(len(GRID_QUANTITIES)))
+    maxErrors = measureErrors(filePath, axesValues)
+    numpy.savez(getMetaFilePath(filePath), axes_min = axesMin,
+                axes_step = axesStep, max_errors = maxErrors)
+    for (quantity, error) in zip(GRID_QUANTITIES, maxErrors):
+        print '%s: max interpolation error %g' % (quantity, error)
+
+
+def measureErrors(filePath, axesValues):
+    """ Maximum absolute difference between the interpolated and the exact
+    quantities at a sample of grid cell centers.
+    """
+    grid = IGRFGrid(filePath)
+    centers = [(a[:-1] + 0.5*(a[1] - a[0]))[::ERROR_SAMPLING]
+               for a in axesValues]
+    year, alt, lat, lon = [c.ravel() for c in
+                           numpy.meshgrid(*centers, indexing = 'ij')]
+    year = numpy.clip(year, MIN_MODEL_EPOCH, MAX_MODEL_EPOCH)
+    interpolated = grid.interpolate(lat, lon, alt, year)
+    exact = grid.computeExact(lat, lon, alt, year)
+    return numpy.abs(interpolated - exact).max(axis = 1)
+
+
+def checkReferenceGrid(filePath, referenceFilePath):
+    """ Compare the interpolated field intensity with a reference grid file
+    (the reference_grid_*.dat files used by check_igrf_results.py).
+    """
+    grid = IGRFGrid(filePath)
+    f = open(referenceFilePath)
+    toks = f.readline().split()
+    if toks[0] != 'Date':
+        raise RuntimeError, 'File not understood'
+    year, alt = float(toks[2]), float(toks[5])
+    print 'Date:', year, 'Altitude:', alt
+    lats, lons, refs = [], [], []
+    for line in f:
+        toks = line.split()
+        if len(toks) != 9:
+            continue
+        try:
+            lat, lon, md, mi, mh, mx, my, mz, mf = [float(x) for x in toks]
+        except:
+            continue
+        lats.append(lat)
+        lons.append(lon)
+        refs.append(mf)
+    inside = grid.isInside(lats, lons, alt, year)
+    print 'Points within the grid: %d/%d' % (inside.sum(), len(inside))
+    lats = numpy.array(lats)[inside]
+    lons = numpy.array(lons)[inside]
+    refs = numpy.array(refs)[inside]
+    babs = grid.interpolate(lats, lons, alt, year)[0]*1e5
+    deltaf = numpy.abs(refs - babs)/refs
+    print 'Max deviation: '
+    print '  Df=', deltaf.max()
+    return deltaf.max()
+
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+    parser = OptionParser(usage = 'usage: %prog [options] grid_file.npy')
+    parser.add_option('-b', '--build', dest = 'b', default = False,
+                      action = 'store_true', help = 'build the grid')
+    parser.add_option('-c', '--check', dest = 'c', default = [],
+                      action = 'append', help = 'reference grid to check')
+    (options, args) = parser.parse_args()
+    if len(args) != 1:
+        parser.error('incorrect number of arguments')
+    if options.b:
+        buildGrid(args[0])
+    for referenceFilePath in options.c:
+        checkReferenceGrid(args[0], referenceFilePath)
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+
+from IGRFGrid import IGRFGrid, buildGrid, getAxis, getMetaFilePath,\
+     GRID_QUANTITIES, AXES_NAMES, MAX_MODEL_EPOCH
+
+# A small grid, whose epoch axis extends past the model validity range.
+TEST_AXES = {'epoch'    : (2024.0, 2025.0, 0.5),
+             'altitude' : (500.0, 550.0, 25.0),
+             'latitude' : (-4.0, 4.0, 2.0),
+             'longitude': (-10.0, 10.0, 5.0)
+             }
+
+
+class IGRFGridTest(unittest.TestCase):
+
+    def setUp(self):
+        self.DirPath = tempfile.mkdtemp()
+        self.FilePath = os.path.join(self.DirPath, 'grid.npy')
+        buildGrid(self.FilePath, TEST_AXES)
+        self.Grid = IGRFGrid(self.FilePath)
+
+    def tearDown(self):
+        shutil.rmtree(self.DirPath)
+
+    def testFiles(self):
+        self.assertTrue(os.path.exists(self.FilePath))
+        self.assertTrue(os.path.exists(getMetaFilePath(self.FilePath)))
+        shape = tuple([len(getAxis(*TEST_AXES[name])) for name in AXES_NAMES])
+        self.assertEqual(self.Grid.Table.shape, (len(GRID_QUANTITIES),) + shape)
+        for quantity in GRID_QUANTITIES:
+            self.assertTrue(numpy.isfinite(self.Grid.getErrorBound(quantity)))
+
+    def testNodes(self):
+        year, alt, lat, lon = [c.ravel() for c in numpy.meshgrid(\
+            *[getAxis(*TEST_AXES[name]) for name in AXES_NAMES],\
+            indexing = 'ij')]
+        self.assertTrue(self.Grid.isInside(lat, lon, alt, year).all())
+        interpolated = self.Grid.interpolate(lat, lon, alt, year)
+        exact = self.Grid.computeExact(lat, lon, alt,\
+                                       numpy.minimum(year, MAX_MODEL_EPOCH))
+        numpy.testing.assert_allclose(interpolated, exact, rtol = 1e-6,\
+                                      atol = 1e-6)
+
+    def testCompute(self):
+        self.Grid.compute(1.0, 2.5, 510.0, 2024.2)
+        values = self.Grid.interpolate([1.0], [2.5], [510.0], [2024.2])
+        for (quantity, value) in zip(GRID_QUANTITIES, values[:, 0]):
+            self.assertEqual(getattr(self.Grid, quantity), value)
+
+    def testOutside(self):
+        self.assertFalse(self.Grid.isInside([20.0], [0.0], [525.0],\
+                                            [2024.2]).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import ROOT
 import os
 import sys
+import numpy
 
 
 ORIGINAL_POLYGON = [(-92.0, -30.0),
@@ -77,6 +78,25 @@ class polygon:
         else:
             return (x0 > min(xIntercepts) and x0 < max(xIntercepts))
 
+    # Same as isInside(), for arrays of points.
+    def isInsideArray(self, x0, y0):
+        x0 = numpy.asarray(x0, 'd')
+        y0 = numpy.asarray(y0, 'd')
+        minIntercepts = numpy.empty(x0.shape)
+        minIntercepts.fill(numpy.inf)
+        maxIntercepts = -minIntercepts
+        for i in range(len(self.VertexList) - 1):
+            (x1, y1) = self.VertexList[i]
+            (x2, y2) = self.VertexList[i + 1]
+            mask = (y1 < y0) == (y2 > y0)
+            with numpy.errstate(all = 'ignore'):
+                xIntercepts = (x2 - x1)*(y0 - y1)/(y2 - y1) + x1
+            minIntercepts[mask] = numpy.minimum(minIntercepts[mask],
+                                                xIntercepts[mask])
+            maxIntercepts[mask] = numpy.maximum(maxIntercepts[mask],
+                                                xIntercepts[mask])
+        return (x0 > minIntercepts) & (x0 < maxIntercepts)
+
     def draw(self, superimpose = False, lineWidth = 2, lineColor = ROOT.kBlack):
         if not superimpose:
             self.BaseHistogram.Draw()
@@ -8,7 +8,8 @@ import numpy
 import os
 import sys
 
-from lrsConverter import lrsConverter
+from lrsConverter import lrsConverter, DEFAULT_CHUNK_SIZE
+from lrsUtils import met2utc
 
 NUM_ACD_TILES = 108
 
@@ -25,33 +26,36 @@ class lrsAcdConverter(lrsConverter):
 
     def convert(self):
         logging.info('Converting...')
+        numLines = self.DATA_BLOCK_SIZE - 1
         while 1:
-            timestamp = self.timestamp()
-            if timestamp is None:
+            lines = self.readChunk()
+            if not len(lines):
                 break
-            for i in range(self.DATA_BLOCK_SIZE - 1):
-                averageRate = 0
-                line = self.line()
-                try:
-                    (id, tile1, tile2, cnt1, cnt2, dur) = line.split(',')
-                except ValueError:
-                    logging.error('Could not parse line %d.' % self.LineNumber)
-                    logging.error('Line looks like: "%s".' % line)
-                    sys.exit('Abort.')
-                (id, tile1, tile2, cnt1, cnt2) =\
-                    [int(x) for x in (id, tile1, tile2, cnt1, cnt2)]
-                dur = float(dur)
-                (rate1, rate2) = (cnt1/dur, cnt2/dur)
-                averageRate += rate1
-                averageRate += rate2
-                self.getArray('Time')[0] = timestamp + i*dur
-                self.getArray('LrsCounts')[tile1] = cnt1
-                self.getArray('LrsRate')[tile1] = rate1
-                self.getArray('LrsCounts')[tile2] = cnt2
-                self.getArray('LrsRate')[tile2] = rate2
-                self.getArray('CountDuration')[0] = dur
-                self.getArray('LrsAverageRate')[0] = averageRate/2.
-                self.fillTelemetryInformation(timestamp + i*dur)
+            timestamps = met2utc(self.parseChunk(lines, 0, 1, 1)[:, 0, 0])
+            # Each line is (id, tile1, tile2, cnt1, cnt2, dur), and makes an
+            # entry of the output tree.
+            data = self.parseChunk(lines, 1, self.DATA_BLOCK_SIZE, 6)
+            data = data.reshape((len(timestamps)*numLines, 6))
+            tiles = data[:, 1:3].astype('int')
+            counts = data[:, 3:5].astype('int')
+            durations = data[:, 5]
+            rates = counts/durations[:, numpy.newaxis]
+            averageRates = (rates[:, 0] + rates[:, 1])/2.
+            times = (timestamps[:, numpy.newaxis] +\
+                         numpy.arange(numLines)*\
+                         durations.reshape((len(timestamps), numLines)))
+            times = times.ravel()
+            telemetryDict = self.getTelemetryArrays(times)
+            for j in xrange(len(times)):
+                (tile1, tile2) = tiles[j]
+                self.getArray('Time')[0] = times[j]
+                self.getArray('LrsCounts')[tile1] = counts[j, 0]
+                self.getArray('LrsRate')[tile1] = rates[j, 0]
+                self.getArray('LrsCounts')[tile2] = counts[j, 1]
+                self.getArray('LrsRate')[tile2] = rates[j, 1]
+                self.getArray('CountDuration')[0] = durations[j]
+                self.getArray('LrsAverageRate')[0] = averageRates[j]
+                self.fillTelemetryArrays(telemetryDict, j)
                 self.fillTree()
         logging.info('Done.')
 
@@ -65,5 +69,8 @@ if __name__ == '__main__':
     parser.add_option('-t', '--telemetry-dir', dest = 't',
                       default = None, type = str,
                       help = 'path to output telemetry folder')
+    parser.add_option('-c', '--chunk-size', dest = 'c',
+                      default = DEFAULT_CHUNK_SIZE, type = int,
+                      help = 'number of data blocks read at a time')
     (opts, args) = parser.parse_args()
-    converter = lrsAcdConverter(args[0], opts.r, opts.t)
+    converter = lrsAcdConverter(args[0], opts.r, opts.t, opts.c)
@@ -8,7 +8,8 @@ import numpy
 import os
 import sys
 
-from lrsConverter import lrsConverter
+from lrsConverter import lrsConverter, DEFAULT_CHUNK_SIZE
+from lrsUtils import met2utc
 
 
 class lrsCalConverter(lrsConverter):
@@ -27,31 +28,35 @@ class lrsCalConverter(lrsConverter):
     def convert(self):
         logging.info('Coverting...')
         while 1:
-            timestamp = self.timestamp()
-            if timestamp is None:
+            lines = self.readChunk()
+            if not len(lines):
                 break
-            self.getArray('Time')[0] = timestamp
-            self.getArray('TowerMask')[0] = int(self.line())
-            self.getArray('CounterMask')[0] = int(self.line())
+            timestamps = met2utc(self.parseChunk(lines, 0, 1, 1)[:, 0, 0])
+            masks = self.parseChunk(lines, 1, 3, 1)[:, :, 0].astype('int')
+            data = self.parseChunk(lines, 3, 19, 4)
+            self.checkTowers(lines, data[:, :, 0], numpy.arange(16), 3)
+            counts = data[:, :, 1:3].astype('int')
+            durations = data[:, :, 3]
+            rates = counts/durations[:, :, numpy.newaxis]
             averageLoRate = 0
             averageHiRate = 0
             for i in range(16):
-                (tower, cnt0, cnt1, dur0) = self.line().split(',')
-                if int(tower) != i:
-                    self.exit('Tower mismatch (expected %d, found %d).' %\
-                                  (i, int(tower)))
-                (cnt0, cnt1) = [int(x) for x in (cnt0, cnt1)]
-                (dur0, dur1) = (float(dur0), float(dur0))
-                self.getArray('LrsCounts')[i] = (cnt0, cnt1)
-                self.getArray('CountDuration')[:] = (dur0, dur1)
-                rates = (cnt0/dur0, cnt1/dur1)
-                self.getArray('LrsRate')[i] = rates
-                averageLoRate += rates[0]
-                averageHiRate += rates[1]
-            self.getArray('LrsLoAverageRate')[0] = averageLoRate/16    
-            self.getArray('LrsHiAverageRate')[0] = averageHiRate/16
-            self.fillTelemetryInformation(timestamp)
-            self.fillTree()
+                averageLoRate = averageLoRate + rates[:, i, 0]
+                averageHiRate = averageHiRate + rates[:, i, 1]
+            averageLoRate /= 16
+            averageHiRate /= 16
+            telemetryDict = self.getTelemetryArrays(timestamps)
+            for j in xrange(len(timestamps)):
+                self.getArray('Time')[0] = timestamps[j]
+                self.getArray('TowerMask')[0] = masks[j, 0]
+                self.getArray('CounterMask')[0] = masks[j, 1]
+                self.getArray('LrsCounts')[:] = counts[j]
+                self.getArray('CountDuration')[:] = durations[j, -1]
+                self.getArray('LrsRate')[:] = rates[j]
+                self.getArray('LrsLoAverageRate')[0] = averageLoRate[j]
+                self.getArray('LrsHiAverageRate')[0] = averageHiRate[j]
+                self.fillTelemetryArrays(telemetryDict, j)
+                self.fillTree()
         logging.info('Done.')
 
 
@@ -64,6 +69,9 @@ if __name__ == '__main__':
     parser.add_option('-t', '--telemetry-dir', dest = 't',
                       default = None, type = str,
                       help = 'path to output telemetry folder')
+    parser.add_option('-c', '--chunk-size', dest = 'c',
+                      default = DEFAULT_CHUNK_SIZE, type = int,
+                      help = 'number of data blocks read at a time')
     (opts, args) = parser.parse_args()
-    converter = lrsCalConverter(args[0], opts.r, opts.t)
+    converter = lrsCalConverter(args[0], opts.r, opts.t, opts.c)
 
@@ -20,36 +20,11 @@ class lrsCalProcessor(lrsProcessor):
                         'LrsHiRateAverage:d:(1)',
                         'LrsHiRateError:d:(1)'
                         ]
-
-    def process(self):
-        self.InputTree.SetBranchStatus('*', 0)
-        self.InputTree.SetBranchStatus('Time', 1)
-        self.InputTree.SetBranchStatus('LrsLoAverageRate', 1)
-        self.InputTree.SetBranchStatus('LrsHiAverageRate', 1)
-        ROOT.gROOT.SetBatch(1)
-        for (tMin, tMax) in self.Bins:
-            self.getArray('Time')[0] = (tMax + tMin)/2
-            cut = 'Time > %f && Time < %f' % (tMin, tMax)
-            self.InputTree.Draw('LrsLoAverageRate>>h', cut)
-            histogram = ROOT.gDirectory.Get('h')
-            average = histogram.GetMean()
-            error = histogram.GetRMS()
-            numEntries = histogram.GetEntries()
-            error /= math.sqrt(numEntries)
-            self.getArray('LrsLoRateAverage')[0] = average
-            self.getArray('LrsLoRateError')[0] = error
-            histogram.Delete()
-            self.InputTree.Draw('LrsHiAverageRate>>h', cut)
-            histogram = ROOT.gDirectory.Get('h')
-            average = histogram.GetMean()
-            error = histogram.GetRMS()
-            numEntries = histogram.GetEntries()
-            error /= math.sqrt(numEntries)
-            self.getArray('LrsHiRateAverage')[0] = average
-            self.getArray('LrsHiRateError')[0] = error
-            histogram.Delete()
-            self.fillTree()
-        ROOT.gROOT.SetBatch(0)
+    RATES_LIST       = [('LrsLoAverageRate', 'LrsLoRateAverage',
+                         'LrsLoRateError'),
+                        ('LrsHiAverageRate', 'LrsHiRateAverage',
+                         'LrsHiRateError')
+                        ]
 
 
 if __name__ == '__main__':
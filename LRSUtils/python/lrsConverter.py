@@ -3,15 +3,62 @@ import logging
 logging.basicConfig(level = logging.DEBUG)
 
 import os
+import re
 import sys
 import time
 import ROOT
+import numpy
+import itertools
 from lrsUtils import *
 
 from lrsTreeWriter import lrsTreeWriter
 from copy import copy
 
 
+# Default number of data blocks (i.e. records) read and parsed at a time.
+DEFAULT_CHUNK_SIZE = 10000
+
+# Field separator in the csv files (the blanks around the commas are
+# ignored, as int() and float() do when the lines are parsed one by one).
+FIELD_SEPARATOR_REGEX = re.compile(r'[ \t]*,[ \t]*')
+
+
+# Vectorized equivalent of TGraph::Eval() (i.e. linear interpolation
+# between the neighbouring points, and linear extrapolation outside the
+# graph) for points sorted in x, the points with the same x being in the
+# order they were added to the graph. As TGraph::Eval(), of the points with
+# the same x the first one is used and the extrapolation is done with the
+# first two points (below the graph) or with the first points of the last
+# two distinct x (above the graph), which are the ones TGraph::Eval() picks
+# for graphs filled in increasing x order.
+def evalGraph(x, xPoints, yPoints):
+    x = numpy.asarray(x, 'd')
+    numPoints = len(xPoints)
+    if numPoints == 0:
+        return numpy.zeros(x.shape)
+    if numPoints == 1:
+        return numpy.ones(x.shape)*yPoints[0]
+    first = numpy.searchsorted(xPoints, xPoints, 'left')
+    left = numpy.searchsorted(xPoints, x, 'left')
+    exact = numpy.searchsorted(xPoints, x, 'right') > left
+    up = numpy.clip(left, 1, numPoints - 1)
+    low = first[up - 1]
+    lastUp = first[-1]
+    if lastUp > 0:
+        lastLow = first[lastUp - 1]
+    else:
+        lastLow = 1
+    (low, up) = (numpy.where(left == 0, 0, low), numpy.where(left == 0, 1, up))
+    (low, up) = (numpy.where(left == numPoints, lastLow, low),\
+                 numpy.where(left == numPoints, lastUp, up))
+    (xLow, xUp, yLow, yUp) = (xPoints[low], xPoints[up], yPoints[low],\
+                                  yPoints[up])
+    with numpy.errstate(all = 'ignore'):
+        y = yUp + (x - xUp)*(yLow - yUp)/(xLow - xUp)
+    y = numpy.where(xLow == xUp, yLow, y)
+    return numpy.where(exact, yPoints[numpy.minimum(left, numPoints - 1)], y)
+
+
 class lrsConverter(lrsTreeWriter):
 
     TREE_NAME     = 'LrsTree'
@@ -34,13 +81,15 @@ class lrsConverter(lrsTreeWriter):
                       'SACFLAGLATINSAA'
                       ]
 
-    def __init__(self, inputCsvFilePath, outputRootFolder, telemetryFolder):
+    def __init__(self, inputCsvFilePath, outputRootFolder, telemetryFolder,
+                 chunkSize = DEFAULT_CHUNK_SIZE):
         if not os.path.exists(inputCsvFilePath):
             logging.warning('Could not find %s. Abort.' % inputCsvFilePath)
             return
         self.InputCsvFilePath = inputCsvFilePath
         self.InputCsvFile = file(inputCsvFilePath)
         self.LineNumber = 0
+        self.ChunkSize = chunkSize
         try:
             self.FirstTimestamp = getFirstTimestamp(inputCsvFilePath)
             self.LastTimestamp = getLastTimestamp(inputCsvFilePath,\
@@ -99,6 +148,8 @@ class lrsConverter(lrsTreeWriter):
             graph.SetNameTitle(label, label)
             self.NavigationGraphList.append(graph)
             self.NavigationMnemonicsDict[label] = i
+        times = []
+        values = []
         for (lineNumber, line) in enumerate(navigationFile.readlines()):
             data = line.strip('\n').split(',')
             time = string2utc(data[0], NAVIGATION_TIME_FORMAT)
@@ -106,6 +157,13 @@ class lrsConverter(lrsTreeWriter):
             for i in range(len(self.NavigationMnemonics)):
                 self.NavigationGraphList[i].SetPoint(lineNumber,\
                                                          time, data[i + 2])
+            times.append(time)
+            values.append(data[2:len(self.NavigationMnemonics) + 2])
+        # Same points as the graphs, sorted in time (for evalGraph()).
+        order = numpy.argsort(times, kind = 'mergesort')
+        self.NavigationTimes = numpy.array(times, 'd')[order]
+        self.NavigationValues = numpy.array(values, 'd').reshape(\
+            (len(times), len(self.NavigationMnemonics)))[order]
         logging.info('Done.')
 
     def getNavigationData(self, timestamp, mnemonic):
@@ -127,10 +185,17 @@ class lrsConverter(lrsTreeWriter):
         self.SAAGraph.SetNameTitle('SACFLAGLATINSAA', 'SACFLAGLATINSAA')
         saaFile = file(saaFilePath)
         saaFile.readline()
+        times = []
+        flags = []
         for (lineNumber, line) in enumerate(saaFile.readlines()):
             data = line.strip('\n').split(',')
             data[1:] = [float(x) for x in data[1:]]
             self.SAAGraph.SetPoint(lineNumber, data[1], data[2])
+            times.append(data[1])
+            flags.append(data[2])
+        order = numpy.argsort(times, kind = 'mergesort')
+        self.SAATimes = numpy.array(times, 'd')[order]
+        self.SAAFlags = numpy.array(flags, 'd')[order]
         logging.info('Done.')
 
     def getSAAFlag(self, timestamp):
@@ -153,6 +218,22 @@ class lrsConverter(lrsTreeWriter):
                 self.getNavigationData(timestamp, mnemonic)
         self.getArray('SACFLAGLATINSAA')[0] = self.getSAAFlag(timestamp)
 
+    # Interpolate the navigation and SAA information at all the given times
+    # at once (same as fillTelemetryInformation() for a single time).
+    def getTelemetryArrays(self, timestamps):
+        telemetryDict = {}
+        for (i, mnemonic) in enumerate(self.NavigationMnemonics):
+            telemetryDict[mnemonic] = evalGraph(timestamps,\
+                self.NavigationTimes, self.NavigationValues[:, i])
+        telemetryDict['SACFLAGLATINSAA'] = evalGraph(timestamps,\
+                                                         self.SAATimes,\
+                                                         self.SAAFlags)
+        return telemetryDict
+
+    def fillTelemetryArrays(self, telemetryDict, index):
+        for (mnemonic, array) in telemetryDict.items():
+            self.getArray(mnemonic)[0] = array[index]
+
     def close(self):
         logging.info('Closing files...')
         self.closeTree()
@@ -164,6 +245,63 @@ class lrsConverter(lrsTreeWriter):
             logging.debug('%d lines read.' % self.LineNumber)
         return self.InputCsvFile.readline()
     
+    # Read the lines of (up to) ChunkSize data blocks at once.
+    def readChunk(self):
+        numLines = self.ChunkSize*self.DATA_BLOCK_SIZE
+        lines = list(itertools.islice(self.InputCsvFile, numLines))
+        self.LineNumber += len(lines)
+        if len(lines) % self.DATA_BLOCK_SIZE != 0:
+            self.exit('Incomplete data block at the end of the file.')
+        if len(lines):
+            logging.debug('%d lines read.' % self.LineNumber)
+        return lines
+
+    # Parse the lines from firstLine to lastLine (excluded) of all the data
+    # blocks in a chunk, each line being made of numFields comma-separated
+    # numbers, into an array of shape (numBlocks, numLines, numFields).
+    def parseChunk(self, lines, firstLine, lastLine, numFields):
+        numBlocks = len(lines)/self.DATA_BLOCK_SIZE
+        selection = []
+        for i in xrange(numBlocks):
+            offset = i*self.DATA_BLOCK_SIZE
+            selection += lines[offset + firstLine:offset + lastLine]
+        text = FIELD_SEPARATOR_REGEX.sub(',', ''.join(selection))
+        text = ','.join(text.split())
+        shape = (numBlocks, lastLine - firstLine, numFields)
+        try:
+            values = numpy.fromstring(text, 'd', sep = ',')
+        except ValueError:
+            values = numpy.zeros(0)
+        if values.size != numBlocks*(lastLine - firstLine)*numFields:
+            self.checkChunk(lines, firstLine, lastLine, numFields)
+        return values.reshape(shape)
+
+    # Find the first line of a chunk which cannot be parsed and exit.
+    def checkChunk(self, lines, firstLine, lastLine, numFields):
+        chunkLineNumber = self.LineNumber - len(lines)
+        for (i, line) in enumerate(lines):
+            if firstLine <= i % self.DATA_BLOCK_SIZE < lastLine:
+                try:
+                    values = [float(x) for x in line.split(',')]
+                except ValueError:
+                    values = []
+                if len(values) != numFields:
+                    self.LineNumber = chunkLineNumber + i + 1
+                    logging.error('Line looks like: "%s".' % line.strip())
+                    self.exit('Could not parse line %d.' % self.LineNumber)
+        self.exit('Could not parse data block.')
+
+    # Exit if the tower numbers (an array of shape (numBlocks, numLines) for
+    # the lines starting at firstLine) are not the expected ones.
+    def checkTowers(self, lines, towers, expected, firstLine):
+        mismatch = towers != expected
+        if mismatch.any():
+            (i, j) = [index[0] for index in numpy.nonzero(mismatch)]
+            self.LineNumber += i*self.DATA_BLOCK_SIZE + firstLine + j + 1 -\
+                len(lines)
+            self.exit('Tower mismatch (expected %d, found %d).' %\
+                          (expected[j], int(towers[i, j])))
+
     def exit(self, message = None):
         if message is not None:
             logging.error(message)
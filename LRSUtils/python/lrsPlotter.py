@@ -22,24 +22,33 @@ class lrsPlotter:
         self.RootFile = ROOT.TFile(rootFilePath)
         self.RootTree = self.RootFile.Get(ROOT_TREE_NAME)
         self.CounterName = counterName
-        self.createArrays()
+        self.readArrays()
         self.createHistograms()
         self.OriginalPolygon = polygon(ORIGINAL_POLYGON)
         self.NewPolygon = polygon(ROB_POLYGON)
         self.loop()
 
-    def createArrays(self):
-        logging.info('Creating arrays...')
-        self.Time = numpy.zeros((1), 'd')
-        self.Longitude = numpy.zeros((1), 'd')
-        self.Latitude = numpy.zeros((1), 'd')
-        self.Rate = numpy.zeros((1), 'd')
-        self.SAAFlag = numpy.zeros((1), 'd')
-        self.RootTree.SetBranchAddress('Time', self.Time)
-        self.RootTree.SetBranchAddress('LSPGEOLON', self.Longitude)
-        self.RootTree.SetBranchAddress('LSPGEOLAT', self.Latitude)
-        self.RootTree.SetBranchAddress(self.CounterName, self.Rate)
-        self.RootTree.SetBranchAddress('SACFLAGLATINSAA', self.SAAFlag)
+    # Read the Time, position, rate and SAA flag branches once, through
+    # TTree::Draw() (at most four variables at a time).
+    def readArrays(self):
+        logging.info('Reading arrays...')
+        branchNames = ['Time', 'LSPGEOLON', 'LSPGEOLAT', self.CounterName,
+                       'SACFLAGLATINSAA']
+        arraysDict = {}
+        self.RootTree.SetEstimate(self.RootTree.GetEntries() + 1)
+        for i in range(0, len(branchNames), 4):
+            group = branchNames[i:i + 4]
+            numEntries = self.RootTree.Draw(':'.join(group), '', 'goff')
+            for (j, branchName) in enumerate(group):
+                buffer = self.RootTree.GetVal(j)
+                buffer.SetSize(numEntries)
+                arraysDict[branchName] =\
+                    numpy.array(numpy.frombuffer(buffer, 'd', numEntries))
+        self.Time = arraysDict['Time']
+        self.Longitude = arraysDict['LSPGEOLON']
+        self.Latitude = arraysDict['LSPGEOLAT']
+        self.Rate = arraysDict[self.CounterName]
+        self.SAAFlag = arraysDict['SACFLAGLATINSAA']
 
     def createHistograms(self):
         logging.info('Creating histograms...')
@@ -56,34 +65,34 @@ class lrsPlotter:
         self.RateHistogram.GetXaxis().SetTitle('Latitude')
         self.RateHistogram.GetYaxis().SetTitle('Longitude')
 
+    # Time spent within the masks (accumulated in the order of the entries).
+    def getTime(self, dt, mask):
+        dt = dt[mask]
+        if not len(dt):
+            return 0
+        return numpy.cumsum(dt)[-1]
+
     def loop(self):
-        numEntries = self.RootTree.GetEntries()
-        totalTime = 0
-        timeInSaaOriginal = 0
-        timeInSaaNew = 0
-        timeInBetween = 0
-        self.RootTree.GetEntry(0)
-        previousTime = self.Time[0]
-        logging.info('Starting event loop...')
-        for i in xrange(numEntries):
-            if (i%100000) == 0:
-                logging.debug('%d events scanned.' % i)
-            self.RootTree.GetEntry(i)
-            (x, y) = (self.Longitude, self.Latitude)
-            dt = self.Time[0] - previousTime
-            if dt < 0:
-                print 'Error: dt = %f' % dt
-            else:
-                totalTime += dt
-                if self.SAAFlag > 0:
-                    timeInSaaOriginal += dt
-                    if self.NewPolygon.isInside(x, y):
-                        timeInSaaNew += dt
-                    else:
-                        timeInBetween += dt
-            self.RateHistogram.Fill(x, y, self.Rate)
-            self.ExposureHistogram.Fill(x, y, 1)
-            previousTime = self.Time[0]
+        numEntries = len(self.Time)
+        logging.info('Processing %d entries...' % numEntries)
+        dt = numpy.zeros(numEntries)
+        dt[1:] = self.Time[1:] - self.Time[:-1]
+        for value in dt[dt < 0]:
+            print 'Error: dt = %f' % value
+        valid = dt >= 0
+        inSaa = valid & (self.SAAFlag > 0)
+        self.NewInsideMask = self.NewPolygon.isInsideArray(self.Longitude,
+                                                           self.Latitude)
+        totalTime = self.getTime(dt, valid)
+        timeInSaaOriginal = self.getTime(dt, inSaa)
+        timeInSaaNew = self.getTime(dt, inSaa & self.NewInsideMask)
+        timeInBetween = self.getTime(dt, inSaa & ~self.NewInsideMask)
+        if numEntries:
+            self.RateHistogram.FillN(numEntries, self.Longitude,
+                                     self.Latitude, self.Rate, 1)
+            self.ExposureHistogram.FillN(numEntries, self.Longitude,
+                                         self.Latitude, numpy.ones(numEntries),
+                                         1)
         self.RateHistogram.Divide(self.ExposureHistogram)
         print 'Total time: %f s' % totalTime
         print 'Time in original SAA: %f s (%f)' % (timeInSaaOriginal,
@@ -8,6 +8,7 @@ import sys
 import time
 import ROOT
 import math
+import numpy
 
 from lrsTreeWriter import lrsTreeWriter
 
@@ -16,6 +17,9 @@ class lrsProcessor(lrsTreeWriter):
 
     INPUT_TREE_NAME  = 'LrsTree'
     OUTPUT_TREE_NAME = 'LrsSummaryTree'
+    # List of (input branch, output average branch, output error branch)
+    # to be filled by the derived classes.
+    RATES_LIST       = []
 
     def __init__(self, inputRootFilePath, binWidth = 10):
         if not os.path.exists(inputRootFilePath):
@@ -37,6 +41,82 @@ class lrsProcessor(lrsTreeWriter):
         self.Bins = [(self.StartTime + i*binWidth,\
                           self.StartTime + (i + 1)*binWidth)\
                          for i in range(numBins)]
+
+    # Read the Time branch along with the given branches, all in a single
+    # pass over the input tree.
+    def readArrays(self, branchNames):
+        branchNames = ['Time'] + branchNames
+        self.InputTree.SetBranchStatus('*', 0)
+        for branchName in branchNames:
+            self.InputTree.SetBranchStatus(branchName, 1)
+        self.InputTree.SetEstimate(self.NumEntries + 1)
+        numEntries = self.InputTree.Draw(':'.join(branchNames), '', 'goff')
+        arraysDict = {}
+        for (i, branchName) in enumerate(branchNames):
+            buffer = self.InputTree.GetVal(i)
+            buffer.SetSize(numEntries)
+            arraysDict[branchName] = numpy.array(numpy.frombuffer(buffer, 'd',\
+                                                                  numEntries))
+        self.InputTree.SetBranchStatus('*', 1)
+        return arraysDict
+
+    # Return the time bin index for each of the given times (-1 for the
+    # times out of the bins). As with the 'Time > tMin && Time < tMax' cut,
+    # the times on the bin edges belong to no bin.
+    def getBinIndexes(self, times):
+        numBins = len(self.Bins)
+        if numBins == 0:
+            return -numpy.ones(len(times), 'int')
+        edges = numpy.array([tMin for (tMin, tMax) in self.Bins] +\
+                                [self.Bins[-1][1]])
+        indexes = numpy.searchsorted(edges, times, 'right') - 1
+        inside = (indexes >= 0) & (indexes < numBins)
+        inside[inside] = times[inside] > edges[indexes[inside]]
+        indexes[~inside] = -1
+        return indexes
+
+    # Return the arrays of the average, the error on the average (i.e. the
+    # RMS over the square root of the number of entries) and the number of
+    # entries of the values in each time bin. Empty bins get zero average
+    # and error.
+    def getBinnedStats(self, indexes, values):
+        numBins = len(self.Bins)
+        inside = indexes >= 0
+        indexes = indexes[inside]
+        values = values[inside]
+        numEntries = numpy.bincount(indexes, minlength = numBins)
+        sumValues = numpy.bincount(indexes, values, numBins)
+        sumSquares = numpy.bincount(indexes, values*values, numBins)
+        averages = numpy.zeros(numBins)
+        errors = numpy.zeros(numBins)
+        full = numEntries > 0
+        averages[full] = sumValues[full]/numEntries[full]
+        rms = numpy.sqrt(abs(sumSquares[full]/numEntries[full] -\
+                                 averages[full]**2))
+        errors[full] = rms/numpy.sqrt(numEntries[full])
+        return (averages, errors, numEntries)
+
+    # Fill the summary tree, with one entry per time bin, reading the input
+    # tree once.
+    def process(self):
+        inputBranchNames = [rate[0] for rate in self.RATES_LIST]
+        logging.info('Reading %s from %d entries...' %\
+                         (inputBranchNames, self.NumEntries))
+        arraysDict = self.readArrays(inputBranchNames)
+        indexes = self.getBinIndexes(arraysDict['Time'])
+        statsList = []
+        for (inputBranchName, averageBranchName, errorBranchName) in\
+                self.RATES_LIST:
+            (averages, errors, numEntries) =\
+                self.getBinnedStats(indexes, arraysDict[inputBranchName])
+            statsList.append((averageBranchName, averages))
+            statsList.append((errorBranchName, errors))
+        logging.info('Filling %d time intervals...' % len(self.Bins))
+        for (i, (tMin, tMax)) in enumerate(self.Bins):
+            self.getArray('Time')[0] = (tMax + tMin)/2
+            for (branchName, array) in statsList:
+                self.getArray(branchName)[0] = array[i]
+            self.fillTree()
         
     def close(self):
         logging.info('Closing files...')
@@ -9,7 +9,8 @@ import os
 import sys
 
 
-from lrsConverter import lrsConverter
+from lrsConverter import lrsConverter, DEFAULT_CHUNK_SIZE
+from lrsUtils import met2utc
 
 
 class lrsTkrConverter(lrsConverter):
@@ -26,34 +27,37 @@ class lrsTkrConverter(lrsConverter):
 
     def convert(self):
         while 1:
-            timestamp = self.timestamp()
-            if timestamp is None:
+            lines = self.readChunk()
+            if not len(lines):
                 break
-            self.getArray('Time')[0] = timestamp
-            self.getArray('TowerMask')[0] = int(self.line())
-            self.getArray('CounterMask')[0] = int(self.line())
+            timestamps = met2utc(self.parseChunk(lines, 0, 1, 1)[:, 0, 0])
+            masks = self.parseChunk(lines, 1, 3, 1)[:, :, 0].astype('int')
+            data = self.parseChunk(lines, 3, 35, 4)
+            self.checkTowers(lines, data[:, :, 0],\
+                                 numpy.repeat(numpy.arange(16), 2), 3)
+            # Two lines per tower: (tower, cnt0, cnt1, dur0) and
+            # (tower, cnt2, cnt3, dur2).
+            data = data.reshape((len(timestamps), 16, 2, 4))
+            counts = data[:, :, :, 1:3].reshape((len(timestamps), 16, 4))
+            counts = counts.astype('int')
+            durations = numpy.repeat(data[:, :, :, 3], 2, axis = 2)
+            rates = counts/durations
             averageRate = 0
             for i in range(16):
-                (tower, cnt0, cnt1, dur0) = self.line().split(',')
-                if int(tower) != i:
-                    self.exit('Tower mismatch (expected %d, found %d).' %\
-                                  (i, int(tower)))
-                (tower, cnt2, cnt3, dur2) = self.line().split(',')
-                if int(tower) != i:
-                    self.exit('Tower mismatch (expected %d, found %d).' %\
-                                  (i, int(tower)))
-                (cnt0, cnt1, cnt2, cnt3) =\
-                    [int(x) for x in (cnt0, cnt1, cnt2, cnt3)]
-                (dur0, dur2) = [float(x) for x in (dur0, dur2)]
-                (dur1, dur3) = (dur0, dur2)
-                self.getArray('LrsCounts')[i] = (cnt0, cnt1, cnt2, cnt3)
-                self.getArray('CountDuration')[:] = (dur0, dur1, dur2, dur3)
-                rates = (cnt0/dur0, cnt1/dur1, cnt2/dur2, cnt3/dur3)
-                self.getArray('LrsRate')[i] = rates
-                averageRate += sum(rates)
-            self.getArray('LrsAverageRate')[0] = averageRate/64
-            self.fillTelemetryInformation(timestamp)
-            self.fillTree()
+                averageRate = averageRate + (rates[:, i, 0] + rates[:, i, 1] +\
+                                                 rates[:, i, 2] + rates[:, i, 3])
+            averageRate /= 64
+            telemetryDict = self.getTelemetryArrays(timestamps)
+            for j in xrange(len(timestamps)):
+                self.getArray('Time')[0] = timestamps[j]
+                self.getArray('TowerMask')[0] = masks[j, 0]
+                self.getArray('CounterMask')[0] = masks[j, 1]
+                self.getArray('LrsCounts')[:] = counts[j]
+                self.getArray('CountDuration')[:] = durations[j, -1]
+                self.getArray('LrsRate')[:] = rates[j]
+                self.getArray('LrsAverageRate')[0] = averageRate[j]
+                self.fillTelemetryArrays(telemetryDict, j)
+                self.fillTree()
 
 
 if __name__ == '__main__':
@@ -65,6 +69,9 @@ if __name__ == '__main__':
     parser.add_option('-t', '--telemetry-dir', dest = 't',
                       default = None, type = str,
                       help = 'path to output telemetry folder')
+    parser.add_option('-c', '--chunk-size', dest = 'c',
+                      default = DEFAULT_CHUNK_SIZE, type = int,
+                      help = 'number of data blocks read at a time')
     (opts, args) = parser.parse_args()
-    converter = lrsTkrConverter(args[0], opts.r, opts.t)
+    converter = lrsTkrConverter(args[0], opts.r, opts.t, opts.c)
 
@@ -38,20 +38,39 @@ def getFirstTimestamp(filePath):
     fileObject.close()
     return timestamp
 
-def getLastTimestamp(filePath, dataBlockSize):
-    fileObject = file(filePath)
-    fileSize = getFileSize(filePath)
-    numLinesFound = 0
-    filePosition = fileSize
-    while numLinesFound <= dataBlockSize:
+# Size of the blocks read (backwards) from the end of a file.
+TAIL_BLOCK_SIZE = 1048576
+
+def getLastLines(filePath, numLines, blockSize = TAIL_BLOCK_SIZE):
+    fileObject = file(filePath, 'rb')
+    fileObject.seek(0, os.SEEK_END)
+    filePosition = fileObject.tell()
+    data = ''
+    # One more newline than the number of lines is needed (the one
+    # terminating the line before), unless the beginning of the file is
+    # reached.
+    while filePosition > 0 and data.count('\n') <= numLines:
+        readSize = min(blockSize, filePosition)
+        filePosition -= readSize
         fileObject.seek(filePosition)
-        item = fileObject.read(1)
-        if item == '\n':
-            numLinesFound += 1
-        filePosition -= 1
-    timestamp = met2utc(float(fileObject.readline()))
+        data = fileObject.read(readSize) + data
     fileObject.close()
-    return timestamp
+    lines = data.splitlines(True)
+    if filePosition > 0:
+        lines = lines[1:]
+    return lines[max(len(lines) - numLines, 0):]
+
+def getLastRecords(filePath, dataBlockSize, numRecords = 1,
+                   blockSize = TAIL_BLOCK_SIZE):
+    lines = getLastLines(filePath, numRecords*dataBlockSize, blockSize)
+    numRecords = len(lines)/dataBlockSize
+    lines = lines[len(lines) - numRecords*dataBlockSize:]
+    return [lines[i*dataBlockSize:(i + 1)*dataBlockSize] for i in\
+                range(numRecords)]
+
+def getLastTimestamp(filePath, dataBlockSize):
+    record = getLastRecords(filePath, dataBlockSize)[0]
+    return met2utc(float(record[0]))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,182 @@
+import sys
+import types
+import unittest
+import numpy
+
+try:
+    import ROOT
+except ImportError:
+    # Only evalGraph() and the csv parsing are tested, which don't need
+    # ROOT: TGraph::Eval() is replaced by a port of its implementation.
+    ROOT = None
+    sys.modules['ROOT'] = types.ModuleType('ROOT')
+
+from lrsConverter import lrsConverter, evalGraph
+
+
+# Port of TGraph::Eval() (linear interpolation, graph not flagged as sorted),
+# for the points in the order they are added to the graph.
+def evalTGraphPort(x, xPoints, yPoints):
+    numPoints = len(xPoints)
+    if numPoints == 0:
+        return 0.
+    if numPoints == 1:
+        return yPoints[0]
+    (low, up, low2, up2) = (-1, -1, -1, -1)
+    for i in range(numPoints):
+        if xPoints[i] < x:
+            if low == -1 or xPoints[i] > xPoints[low]:
+                low2 = low
+                low = i
+            elif low2 == -1:
+                low2 = i
+        elif xPoints[i] > x:
+            if up == -1 or xPoints[i] < xPoints[up]:
+                up2 = up
+                up = i
+            elif up2 == -1:
+                up2 = i
+        else:
+            return yPoints[i]
+    if up == -1:
+        (up, low) = (low, low2)
+    if low == -1:
+        (low, up) = (up, up2)
+    if xPoints[low] == xPoints[up]:
+        return yPoints[low]
+    return yPoints[up] + (x - xPoints[up])*(yPoints[low] - yPoints[up])/\
+        (xPoints[low] - xPoints[up])
+
+def evalTGraph(x, xPoints, yPoints):
+    if ROOT is None:
+        return [evalTGraphPort(value, xPoints, yPoints) for value in x]
+    graph = ROOT.TGraph()
+    for (i, (xPoint, yPoint)) in enumerate(zip(xPoints, yPoints)):
+        graph.SetPoint(i, xPoint, yPoint)
+    return [graph.Eval(value) for value in x]
+
+
+# Converter with 4 lines per data block (a timestamp, a mask and two lines
+# of 3 fields), not reading any file.
+class lrsTestConverter(lrsConverter):
+
+    DATA_BLOCK_SIZE = 4
+
+    def __init__(self, lines):
+        self.LineNumber = len(lines)
+
+
+# The original line by line parser.
+def parseLines(lines, firstLine, lastLine, blockSize):
+    values = []
+    for offset in range(0, len(lines), blockSize):
+        block = []
+        for line in lines[offset + firstLine:offset + lastLine]:
+            block.append([float(x) for x in line.split(',')])
+        values.append(block)
+    return numpy.array(values, 'd')
+
+
+class lrsConverterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.Random = numpy.random.RandomState(5)
+
+    def checkEvalGraph(self, xPoints, yPoints, x):
+        (xPoints, yPoints) = (numpy.array(xPoints, 'd'),\
+                              numpy.array(yPoints, 'd'))
+        expected = evalTGraph(x, xPoints, yPoints)
+        order = numpy.argsort(xPoints, kind = 'mergesort')
+        values = evalGraph(x, xPoints[order], yPoints[order])
+        numpy.testing.assert_array_equal(values, expected)
+
+    def testEvalGraph(self):
+        xPoints = numpy.cumsum(self.Random.uniform(0.5, 2, 50))
+        yPoints = self.Random.normal(0, 10, 50)
+        x = numpy.concatenate([self.Random.uniform(-10, 110, 500), xPoints,\
+                               [xPoints[0] - 1, xPoints[-1] + 1]])
+        self.checkEvalGraph(xPoints, yPoints, x)
+
+    def testEvalGraphEnds(self):
+        (xPoints, yPoints) = ([1., 2., 4.], [3., -1., 5.])
+        self.checkEvalGraph(xPoints, yPoints, [-5., 0., 1., 4., 4.5, 10.])
+        self.assertEqual(list(evalGraph([0., 5.], numpy.array(xPoints),\
+                                        numpy.array(yPoints))), [7., 8.])
+        self.checkEvalGraph([1., 2.], [3., 4.], [-1., 1., 1.5, 2., 3.])
+        self.checkEvalGraph([1.], [3.], [-1., 1., 2.])
+        self.checkEvalGraph([], [], [-1., 1., 2.])
+
+    def testEvalGraphDuplicates(self):
+        x = numpy.arange(-1., 6.5, 0.25)
+        for (xPoints, yPoints) in [([1., 2., 2., 3.], [0., 1., 5., 2.]),
+                                   ([1., 1., 2., 3.], [0., 4., 1., 2.]),
+                                   ([1., 2., 3., 3.], [0., 1., 2., 7.]),
+                                   ([1., 2., 3., 3., 3.],
+                                    [0., 1., 2., 7., 9.]),
+                                   ([1., 1., 1., 2., 2., 3., 3.],
+                                    [0., 4., 5., 1., 6., 2., 7.]),
+                                   ([2., 2.], [1., 3.]),
+                                   ([2., 2., 2.], [1., 3., 5.])]:
+            self.checkEvalGraph(xPoints, yPoints, x)
+        # Random points with many ties.
+        xPoints = numpy.sort(self.Random.randint(0, 20, 60)).astype('d')
+        yPoints = self.Random.normal(0, 1, 60)
+        self.checkEvalGraph(xPoints, yPoints, numpy.arange(-3, 23, 0.5))
+
+    def testEvalGraphUnsorted(self):
+        # Inside the graph range the point order does not matter.
+        xPoints = self.Random.permutation(30).astype('d')
+        yPoints = self.Random.normal(0, 1, 30)
+        self.checkEvalGraph(xPoints, yPoints,\
+                            self.Random.uniform(0, 29, 100).tolist() +\
+                            xPoints.tolist())
+
+    def getLines(self, numBlocks, separators):
+        lines = []
+        for i in range(numBlocks):
+            lines.append('%d\n' % self.Random.randint(100000000, 1000000000))
+            lines.append('%d\r\n' % self.Random.randint(0, 0xffff))
+            for j in range(2):
+                fields = ['%d' % j, '%d' % self.Random.randint(0, 10000),\
+                          '%.6e' % self.Random.uniform(-5, 5)]
+                line = fields[0]
+                for field in fields[1:]:
+                    line += separators[self.Random.randint(len(separators))] +\
+                            field
+                lines.append('%s\n' % line)
+        return lines
+
+    def checkParseChunk(self, lines):
+        converter = lrsTestConverter(lines)
+        for (firstLine, lastLine, numFields) in [(0, 1, 1), (1, 2, 1),\
+                                                 (0, 2, 1), (2, 4, 3)]:
+            values = converter.parseChunk(lines, firstLine, lastLine,\
+                                          numFields)
+            numpy.testing.assert_array_equal(values, parseLines(lines,\
+                firstLine, lastLine, converter.DATA_BLOCK_SIZE))
+
+    def testParseChunk(self):
+        self.checkParseChunk(self.getLines(50, [',']))
+        self.checkParseChunk(self.getLines(1, [',']))
+
+    def testParseChunkBlanks(self):
+        self.checkParseChunk(self.getLines(50, [', ', ' ,', ' , ', ',\t',\
+                                                ',  ', ',']))
+        lines = ['  1\n', '2 \n', ' 0 ,1,  2.5\n', '1,\t-1 , 1e3 \r\n']
+        self.checkParseChunk(lines)
+        self.assertEqual(lrsTestConverter(lines).parseChunk(lines, 2, 4, 3)\
+                         .tolist(), [[[0., 1., 2.5], [1., -1., 1000.]]])
+
+    def testParseChunkErrors(self):
+        lines = self.getLines(5, [','])
+        for (index, line) in [(10, '0,12,,3\n'), (11, '1,2\n'),
+                              (14, '0,1,2,3\n'), (18, '0,x,1\n')]:
+            badLines = lines[:index] + [line] + lines[index + 1:]
+            converter = lrsTestConverter(badLines)
+            self.assertRaises(SystemExit, converter.parseChunk, badLines,\
+                              2, 4, 3)
+            self.assertEqual(converter.LineNumber, index + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lrsUtils import getLastLines, getLastRecords, getLastTimestamp,\
+     getFirstTimestamp, met2utc
+
+
+# Same as readlines()[-numLines:], reading the whole file.
+def readLastLines(filePath, numLines):
+    lines = open(filePath, 'rb').readlines()
+    return lines[max(len(lines) - numLines, 0):]
+
+
+class lrsUtilsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.DirPath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.DirPath)
+
+    def writeFile(self, data, fileName = 'test.csv'):
+        filePath = os.path.join(self.DirPath, fileName)
+        outputFile = open(filePath, 'wb')
+        outputFile.write(data)
+        outputFile.close()
+        return filePath
+
+    # Compare getLastLines() with readlines() for all the numbers of lines
+    # (and a few more) and block sizes from 1 byte to more than the file.
+    def checkLastLines(self, filePath, blockSizes = None):
+        numFileLines = len(open(filePath, 'rb').readlines())
+        if blockSizes is None:
+            blockSizes = list(range(1, os.path.getsize(filePath) + 2)) +\
+                         [1048576]
+        for blockSize in blockSizes:
+            for numLines in range(numFileLines + 3):
+                self.assertEqual(getLastLines(filePath, numLines, blockSize),
+                                 readLastLines(filePath, numLines))
+
+    def testSmallFile(self):
+        # A file smaller than one block.
+        filePath = self.writeFile(b'1\n22\n333\n')
+        self.assertEqual(getLastLines(filePath, 2), [b'22\n', b'333\n'])
+        self.assertEqual(getLastLines(filePath, 5), [b'1\n', b'22\n',\
+                                                     b'333\n'])
+        self.checkLastLines(filePath)
+
+    def testBlockBoundary(self):
+        # Lines spanning one or more block boundaries, with the boundaries
+        # falling everywhere (including right before and after a newline).
+        data = b''.join([b'%d,%d\n' % (i, 10**(i % 7)) for i in range(40)])
+        filePath = self.writeFile(data)
+        self.assertEqual(getLastLines(filePath, 3, 4),
+                         [b'37,100\n', b'38,1000\n', b'39,10000\n'])
+        blockSizes = list(range(1, 40)) + [len(data) - 1, len(data)]
+        self.checkLastLines(filePath, blockSizes)
+
+    def testNoTrailingNewline(self):
+        filePath = self.writeFile(b'1\n22\n333')
+        self.assertEqual(getLastLines(filePath, 1, 2), [b'333'])
+        self.assertEqual(getLastLines(filePath, 2, 2), [b'22\n', b'333'])
+        self.checkLastLines(filePath)
+        self.checkLastLines(self.writeFile(b'single line'))
+
+    def testEmptyFile(self):
+        filePath = self.writeFile(b'')
+        for blockSize in [1, 2, 1048576]:
+            self.assertEqual(getLastLines(filePath, 1, blockSize), [])
+            self.assertEqual(getLastLines(filePath, 10, blockSize), [])
+            self.assertEqual(getLastRecords(filePath, 3, 2, blockSize), [])
+
+    def testBlankLines(self):
+        self.checkLastLines(self.writeFile(b'\n'))
+        self.checkLastLines(self.writeFile(b'\n\n\n'))
+        self.checkLastLines(self.writeFile(b'1\n\n22\n\n'))
+        self.checkLastLines(self.writeFile(b'1\r\n22\r\n333\r\n'))
+
+    def testLastRecords(self):
+        # 4 records of 3 lines, preceded by an incomplete one.
+        records = [[b'%d\n' % (1000 + i), b'%d,%d\n' % (i, i), b'x\n']\
+                   for i in range(4)]
+        data = b'2,2\nx\n' + b''.join([b''.join(record) for record in\
+                                       records])
+        filePath = self.writeFile(data)
+        for blockSize in [1, 5, 16, 1048576]:
+            self.assertEqual(getLastRecords(filePath, 3, 1, blockSize),
+                             records[-1:])
+            self.assertEqual(getLastRecords(filePath, 3, 3, blockSize),
+                             records[-3:])
+            self.assertEqual(getLastRecords(filePath, 3, 10, blockSize),
+                             records)
+            self.assertEqual(getLastRecords(filePath, 3, 0, blockSize), [])
+        self.assertEqual(getLastTimestamp(filePath, 3), met2utc(1003.))
+        # Same without the trailing newline.
+        filePath = self.writeFile(data[:-1])
+        self.assertEqual(getLastRecords(filePath, 3, 2, 7),
+                         records[-2:-1] + [records[-1][:2] + [b'x']])
+        self.assertEqual(getLastTimestamp(filePath, 3), met2utc(1003.))
+
+    def testFirstTimestamp(self):
+        filePath = self.writeFile(b'1000\n1,1\nx\n')
+        self.assertEqual(getFirstTimestamp(filePath), met2utc(1000.))
+        self.assertEqual(getLastTimestamp(filePath, 3), met2utc(1000.))
+
+
+if __name__ == '__main__':
+    unittest.main()
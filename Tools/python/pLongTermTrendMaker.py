@@ -3,7 +3,9 @@
 import os
 import sys
 import ROOT
+import json
 import array
+import multiprocessing
 
 sys.path.append('../../Report/python')
 
@@ -13,6 +15,12 @@ BASE_PATH = '/afs/slac.stanford.edu/u/gl/glast/datacatalog/prod/datacat'
 BASE_COMMAND = 'find'
 DEFAULT_SITE = 'SLAC_XROOT /Data/Flight/Level1/LPA'
 DEFAULT_SORT = 'nRun'
+CHECKPOINT_FILE_SUFFIX = '.checkpoint'
+
+
+def analyzeFile(args):
+    (analyzer, filePath) = args
+    return analyzer.analyzeFile(filePath)
 
 
 class pDataCatalogQuery:
@@ -65,44 +73,145 @@ class pBaseFileAnalyzer:
         self.FileList = file(fileListPath, 'r').readlines()
         for (i, filePath) in enumerate(self.FileList):
             self.FileList[i] = filePath.strip('\n')
+        self.CheckpointFilePath = '%s%s' % (outputFilePath,
+                                            CHECKPOINT_FILE_SUFFIX)
         self.OutputFile = ROOT.TFile(outputFilePath, 'RECREATE')
         self.OutputTree = ROOT.TTree('Output', 'Output')
-        self.createArrays()
 
-    def createArrays(self):
-        print 'Creating the arrays...'
-        self.Arrays = {}
-        self.Arrays['RunId'] = array.array('i', [0])
-        self.OutputTree.Branch('RunId', self.Arrays['RunId'], 'RunId/I')
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ['FileList', 'OutputFile', 'OutputTree', 'InputFile',
+                    'Arrays']:
+            state.pop(key, None)
+        return state
+
+    def getKeys(self):
+        keys = []
         for label in self.LabelList:
             for quantity in self.QuantityList:
                 if quantity == '':
                     key = label
                 else:
                     key = '%s_%s' % (label, quantity)
-                self.Arrays[key] = array.array('d', [0.0])
-                self.OutputTree.Branch(key, self.Arrays[key], '%s/D' % key)
-
-    def run(self):
-        for filePath in self.FileList:
-            print 'Analyzing %s...' % filePath
-            fileName = os.path.basename(filePath)
-            self.Arrays['RunId'][0] = int(fileName.split('_')[0].strip('r'))
-            print 'Opening file...'
-            self.InputFile = ROOT.TXNetFile(filePath)
-            print 'Grabbing the numbers...'
+                keys.append(key)
+        return keys
+
+    def createArrays(self):
+        print 'Creating the arrays...'
+        self.Arrays = {}
+        self.Arrays['RunId'] = array.array('i', [0])
+        self.OutputTree.Branch('RunId', self.Arrays['RunId'], 'RunId/I')
+        for key in self.getKeys():
+            self.Arrays[key] = array.array('d', [0.0])
+            self.OutputTree.Branch(key, self.Arrays[key], '%s/D' % key)
+
+    def getRunId(self, filePath):
+        fileName = os.path.basename(filePath)
+        return int(fileName.split('_')[0].strip('r'))
+
+    def openFile(self, filePath):
+        if filePath.startswith('root://'):
+            return ROOT.TXNetFile(filePath)
+        return ROOT.TFile(filePath)
+
+    # Analyze a single file (possibly in a worker process) and return the
+    # tuple (RunId, dictionary of the values), the dictionary being None if
+    # the file could not be analyzed.
+    def analyzeFile(self, filePath):
+        runId = self.getRunId(filePath)
+        print 'Analyzing %s...' % filePath
+        self.Arrays = {}
+        for key in self.getKeys():
+            self.Arrays[key] = array.array('d', [0.0])
+        self.InputFile = None
+        try:
+            self.InputFile = self.openFile(filePath)
+            if self.InputFile.IsZombie():
+                raise IOError, 'could not open the file'
             self.analyze()
-            print 'Closing the file...'
-            self.InputFile.Close()
-            print 'Filling the tree...'
-            self.OutputFile.cd()
+        except Exception, e:
+            print 'Could not analyze %s (%s).' % (filePath, e)
+            return (runId, None)
+        finally:
+            if self.InputFile is not None:
+                self.InputFile.Close()
+        valuesDict = {}
+        for key in self.getKeys():
+            valuesDict[key] = self.Arrays[key][0]
+        return (runId, valuesDict)
+
+    # Read the results of the runs analyzed so far, if any, from the
+    # checkpoint file (one line per run, with the RunId and the json
+    # dictionary of the values).
+    def readCheckpoint(self):
+        results = {}
+        if not os.path.exists(self.CheckpointFilePath):
+            return results
+        print 'Reading the checkpoint file %s...' % self.CheckpointFilePath
+        keys = self.getKeys()
+        keys.sort()
+        for line in file(self.CheckpointFilePath, 'r'):
+            try:
+                (runId, valuesDict) = line.split(' ', 1)
+                valuesDict = json.loads(valuesDict)
+                if sorted(valuesDict.keys()) == keys:
+                    results[int(runId)] = dict([(str(key), value) for\
+                                                (key, value) in\
+                                                valuesDict.items()])
+            except Exception:
+                print 'Skipping line "%s" of the checkpoint file.' %\
+                      line.strip()
+        return results
+
+    # Analyze the files (in numJobs worker processes), skipping the runs
+    # which are already in the checkpoint file. Each run is added to the
+    # checkpoint file as soon as it's done, and the output tree is written
+    # at the end, sorted by RunId.
+    def run(self, numJobs = 1):
+        results = self.readCheckpoint()
+        filePaths = [filePath for filePath in self.FileList if\
+                     self.getRunId(filePath) not in results]
+        print '%d run(s) already analyzed, %d file(s) to go.' %\
+              (len(self.FileList) - len(filePaths), len(filePaths))
+        numJobs = min(numJobs, len(filePaths))
+        if numJobs > 1:
+            print 'Analyzing the files in %d processes...' % numJobs
+            pool = multiprocessing.Pool(numJobs)
+            iterator = pool.imap_unordered(analyzeFile, [(self, filePath)\
+                                           for filePath in filePaths])
+        else:
+            pool = None
+            iterator = (self.analyzeFile(filePath) for filePath in filePaths)
+        checkpointFile = file(self.CheckpointFilePath, 'a')
+        for (runId, valuesDict) in iterator:
+            if valuesDict is not None:
+                results[runId] = valuesDict
+                checkpointFile.write('%d %s\n' % (runId,\
+                                                   json.dumps(valuesDict)))
+                checkpointFile.flush()
+        checkpointFile.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+        self.writeOutputTree(results)
+
+    def writeOutputTree(self, results):
+        self.createArrays()
+        runIds = set([self.getRunId(filePath) for filePath in self.FileList])
+        runIds = [runId for runId in results.keys() if runId in runIds]
+        runIds.sort()
+        print 'Filling the tree with %d run(s)...' % len(runIds)
+        self.OutputFile.cd()
+        for runId in runIds:
+            self.Arrays['RunId'][0] = runId
+            for (key, value) in results[runId].items():
+                self.Arrays[key][0] = value
             self.OutputTree.Fill()
         self.OutputFile.cd()
         self.OutputTree.Write()
         self.OutputFile.Close()
 
 
-
 class pRECONHISTALARMDISTAnalyzer(pBaseFileAnalyzer):
 
     def __init__(self, fileListPath, outputFilePath, minStartTime,
@@ -183,6 +292,7 @@ class pCALPEDSANALYZERAnalyzer(pBaseFileAnalyzer):
 if __name__ == '__main__':
     MIN_START_TIME = utc2met(convert2sec('Jun/20/2008 00:00:00'))
     MAX_START_TIME = None
+    NUM_JOBS = 4
     #q = pDataCatalogQuery('ACDPEDSANALYZER', MIN_START_TIME)
     #print q.Command
     #q = pDataCatalogQuery('ACDPEDSANALYZER', MIN_START_TIME,
@@ -197,7 +307,7 @@ if __name__ == '__main__':
                                             'RECONHISTALARMDIST.root',
                                             MIN_START_TIME,
                                             MAX_START_TIME)
-    analyzer2.run()
+    analyzer2.run(NUM_JOBS)
     #analyzer3 = pCALPEDSANALYZERAnalyzer('CALPEDSANALYZER.txt',
     #                                     'CALPEDSANALYZER.root',
     #                                     MIN_START_TIME,
@@ -33,32 +33,28 @@ m7FilePath = '/home/bregeon/glast/isoc/bigM7.txt'
 p = pM7Parser(m7FilePath)
 
 print p.TimePoints[0]
-i=0
-for met in p.TimePoints:
+sc = p.processCoordinates()
+for (i, met) in enumerate(p.TimePoints):
     if not (i%10000): print '\revent %d'%i,
-    sc = p.getSCPosition((met,0))
-    sc.processCoordinates()
-    glat.SetPoint(i, sc.GMSTime, sc.getLatitude())
-    glon.SetPoint(i, sc.GMSTime, sc.getLongitude())
-    galt.SetPoint(i, met, sc.getAltitude())
-    gjda.SetPoint(i, met, sc.JulianDate)
-    ggms.SetPoint(i, met, sc.GMSTime)
-    grol.SetPoint(i, met, sc.getRoll())
-    gra.SetPoint(i,  met, sc.getZRa())
-    gdec.SetPoint(i, met, sc.getZDec())
-    gxra.SetPoint(i, met, sc.getXRa())
-    gxdec.SetPoint(i,met, sc.getXDec())
-    gyra.SetPoint(i, met, sc.getYRa())
-    gydec.SetPoint(i,met, sc.getYDec())
-    grol.SetPoint(i, met, sc.getRoll())
-    gpitch.SetPoint(i, met, sc.getPitch())
-    gyaw.SetPoint(i, met, sc.getYaw())
-    grock.SetPoint(i,met, sc.getRockAngle())
-    glimb.SetPoint(i,met, sc.getArcAngleEarthLimb())
-    ghor.SetPoint(i, met, sc.getLimbAngle())
-    gzl.SetPoint(i,  sc.GMSTime, sc.getZGalL())
-    gzb.SetPoint(i,  sc.GMSTime, sc.getZGalB())
-    i+=1
+    glat.SetPoint(i, sc['GMSTime'][i], sc['Latitude'][i])
+    glon.SetPoint(i, sc['GMSTime'][i], sc['Longitude'][i])
+    galt.SetPoint(i, met, sc['Altitude'][i])
+    gjda.SetPoint(i, met, sc['JulianDate'][i])
+    ggms.SetPoint(i, met, sc['GMSTime'][i])
+    grol.SetPoint(i, met, sc['Roll'][i])
+    gra.SetPoint(i,  met, sc['ZRa'][i])
+    gdec.SetPoint(i, met, sc['ZDec'][i])
+    gxra.SetPoint(i, met, sc['XRa'][i])
+    gxdec.SetPoint(i,met, sc['XDec'][i])
+    gyra.SetPoint(i, met, sc['YRa'][i])
+    gydec.SetPoint(i,met, sc['YDec'][i])
+    gpitch.SetPoint(i, met, sc['Pitch'][i])
+    gyaw.SetPoint(i, met, sc['Yaw'][i])
+    grock.SetPoint(i,met, sc['RockAngle'][i])
+    glimb.SetPoint(i,met, sc['ArcAngleEarthLimb'][i])
+    ghor.SetPoint(i, met, sc['HorizonAngle'][i])
+    gzl.SetPoint(i,  sc['GMSTime'][i], sc['ZGalL'][i])
+    gzb.SetPoint(i,  sc['GMSTime'][i], sc['ZGalB'][i])
 
 c = ROOT.TCanvas('Nav','Nav',30,50,1050,850)
 c.Divide(2,2)